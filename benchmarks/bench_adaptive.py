@@ -0,0 +1,59 @@
+"""Benchmark of fixed and adaptive concurrency of batched requests.
+
+The stand-in server handles a fixed number of requests at once, each
+one takes 20 ms like in a service with a pool of workers.
+RESTAPIClient.get_many sends the same batch by a fixed number of threads
+and by threads limited by AdaptiveLimiter. Run from the project root
+directory:
+
+    python -m benchmarks.bench_adaptive
+"""
+import time
+
+from src.client import RESTAPIClient
+from src.limiter import AdaptiveLimiter
+from src.server import LocalServer
+from src.utils import percentile
+
+CAPACITY = 8
+DELAY = 0.02
+REQUESTS = 1000
+MAX_WORKERS = 64
+
+
+def _run(url, workers, limiter=None):
+    endpoints = ['/posts/{}'.format(post_id % 100 + 1)
+                 for post_id in range(REQUESTS)]
+    client = RESTAPIClient(url, pool_maxsize=workers, max_workers=workers,
+                           limiter=limiter, coalesce=False)
+    latencies = []
+    client.add_timing_listener(lambda timing: latencies.append(timing.total))
+    try:
+        start = time.perf_counter()
+        codes = [code for code, _ in client.get_many(endpoints)]
+        elapsed = time.perf_counter() - start
+    finally:
+        client.close()
+    assert codes == [200] * len(endpoints), 'Unexpected response codes'
+    latencies.sort()
+    return len(endpoints) / elapsed, percentile(latencies, 95) * 1000
+
+
+def main():
+    print('Server handles {} requests at once, {:.0f} ms each'.format(
+        CAPACITY, DELAY * 1000))
+    print('{:<22} {:>10} {:>10} {:>10}'.format('client', 'req/s', 'p95 ms',
+                                               'limit'))
+    with LocalServer(delay=DELAY, capacity=CAPACITY) as server:
+        for workers in (1, CAPACITY, MAX_WORKERS):
+            throughput, p95 = _run(server.url, workers)
+            print('{:<22} {:>10.0f} {:>10.2f} {:>10}'.format(
+                '{} threads'.format(workers), throughput, p95, workers))
+        limiter = AdaptiveLimiter(max_limit=MAX_WORKERS)
+        throughput, p95 = _run(server.url, MAX_WORKERS, limiter)
+        print('{:<22} {:>10.0f} {:>10.2f} {:>10}'.format(
+            'adaptive', throughput, p95, limiter.stats()['limit']))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,47 @@
+"""Benchmark of one by one and bulk writes.
+
+The same batch of created posts is sent to the local stand-in server one
+request after another and by RESTAPIClient.post_many over a pool of
+connections. The server answers each write in 5 ms like a service
+storing it. Run from the project root directory:
+
+    python -m benchmarks.bench_bulk
+"""
+import time
+
+from src.client import RESTAPIClient
+from src.server import LocalServer
+
+DELAY = 0.005
+REQUESTS = 1000
+POST = {'title': 'foo', 'body': 'bar', 'userId': 1}
+
+
+def main():
+    writes = [('/posts', POST)] * REQUESTS
+    print('{:<16} {:>10} {:>10} {:>10}'.format('client', 'req/s', 'p50 ms',
+                                               'p95 ms'))
+    with LocalServer(delay=DELAY) as server:
+        client = RESTAPIClient(server.url)
+        try:
+            start = time.perf_counter()
+            for endpoint, body in writes:
+                client.post(endpoint, json=body, status_only=True)
+            print('{:<16} {:>10.0f}'.format(
+                'one by one', REQUESTS / (time.perf_counter() - start)))
+            for workers in (4, 16):
+                client.close()
+                client = RESTAPIClient(server.url, pool_maxsize=workers)
+                bulk = client.post_many(writes, status_only=True)
+                bulk.results()
+                summary = bulk.summary()
+                assert not summary['failed'], bulk.report()
+                print('{:<16} {:>10.0f} {:>10.2f} {:>10.2f}'.format(
+                    'post_many x{}'.format(workers), summary['throughput'],
+                    summary['p50'], summary['p95']))
+        finally:
+            client.close()
+
+
+if __name__ == '__main__':
+    main()
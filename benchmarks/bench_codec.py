@@ -0,0 +1,49 @@
+"""Benchmark of JSON codecs over jsonplaceholder payloads.
+
+Run from the project root directory:
+
+    python -m benchmarks.bench_codec
+"""
+import json
+import timeit
+
+from src.codec import CODECS
+from src.dataset import make_dataset
+
+
+def _requests_loads(data):
+    # NOTE: What requests.Response.json() does: bytes -> text -> object
+    return json.loads(data.decode('utf-8'))
+
+
+def main():
+    dataset = make_dataset()
+    payloads = [
+        ('users', dataset['users']),
+        ('users/1', dataset['users'][0]),
+        ('photos', dataset['photos']),
+        ('photos/1', dataset['photos'][0])
+    ]
+    codecs = []
+    for codec_cls in CODECS:
+        try:
+            codecs.append(codec_cls())
+        except ImportError:
+            print('{} is not installed'.format(codec_cls.name))
+    for name, obj in payloads:
+        data = json.dumps(obj, indent=2).encode('utf-8')
+        print('{} ({} bytes)'.format(name, len(data)))
+        cases = [('requests json loads', lambda: _requests_loads(data))]
+        for codec in codecs:
+            cases.append(('{} loads'.format(codec.name),
+                          lambda codec=codec: codec.loads(data)))
+            cases.append(('{} dumps'.format(codec.name),
+                          lambda codec=codec: codec.dumps(obj)))
+        for case, func in cases:
+            number, seconds = timeit.Timer(func).autorange()
+            print('  {:<24} {:>10.2f} us'.format(case,
+                                                 seconds / number * 1e6))
+
+
+if __name__ == '__main__':
+    main()
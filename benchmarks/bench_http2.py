@@ -0,0 +1,56 @@
+"""Benchmark of HTTP/1.1 pooled and HTTP/2 multiplexed fan-out.
+
+Every resource is requested by ten ids concurrently with
+RESTAPIClient.get_many against the local stand-in server speaking
+HTTP/1.1 and cleartext HTTP/2, without and with emulated network
+latency. Run from the project root directory:
+
+    python -m benchmarks.bench_http2
+"""
+import time
+
+from src.client import RESTAPIClient
+from src.server import H2Server, LocalServer
+
+RESOURCES = ('posts', 'comments', 'albums', 'photos', 'users', 'todos')
+IDS = 10
+REPEAT = 5
+# NOTE: Response delays in seconds, 0.02 is a typical round trip time
+DELAYS = (0, 0.02)
+
+
+def _fan_out(url, http2, workers):
+    endpoints = ['/{}/{}'.format(resource, resource_id)
+                 for resource in RESOURCES
+                 for resource_id in range(1, IDS + 1)]
+    # NOTE: HTTP/1.1 client keeps its default pool of 10 connections
+    client = RESTAPIClient(url, max_workers=workers, http2=http2)
+    try:
+        start = time.perf_counter()
+        for _ in range(REPEAT):
+            codes = [code for code, _ in client.get_many(endpoints)]
+        elapsed = time.perf_counter() - start
+        stats = client.connection_stats()
+    finally:
+        client.close()
+    assert codes == [200] * len(endpoints), 'Unexpected response codes'
+    return stats['connections'], len(endpoints) * REPEAT / elapsed
+
+
+def main():
+    print('{:<10} {:>9} {:>8} {:>12} {:>10}'.format(
+        'transport', 'delay ms', 'threads', 'connections', 'req/s'))
+    for delay in DELAYS:
+        for name, server_cls, http2 in (('HTTP/1.1', LocalServer, False),
+                                        ('HTTP/2', H2Server, True)):
+            with server_cls(delay=delay) as server:
+                for workers in (1, 10, 50):
+                    connections, throughput = _fan_out(server.url, http2,
+                                                       workers)
+                    print('{:<10} {:>9.0f} {:>8} {:>12} {:>10.0f}'.format(
+                        name, delay * 1000, workers, connections,
+                        throughput))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,36 @@
+"""Benchmark of status-only and lazy calls against full ones.
+
+Collections and single resources are requested from the local stand-in
+server with the body decoded, with a lazy result whose body is never
+read and with status_only. Run from the project root directory:
+
+    python -m benchmarks.bench_lazy
+"""
+import timeit
+
+from src.client import RESTAPIClient
+from src.server import LocalServer
+
+ENDPOINTS = ('/photos', '/comments', '/posts/1', '/photos/5001')
+
+
+def main():
+    print('{:<14} {:>10} {:>10} {:>10}'.format(
+        'endpoint', 'full us', 'lazy us', 'status us'))
+    with LocalServer() as server:
+        for endpoint in ENDPOINTS:
+            client = RESTAPIClient(server.url)
+            try:
+                timings = []
+                for kwargs in ({}, {'lazy': True}, {'status_only': True}):
+                    number, seconds = timeit.Timer(
+                        lambda: client.get(endpoint, **kwargs)).autorange()
+                    timings.append(seconds / number * 1e6)
+            finally:
+                client.close()
+            print('{:<14} {:>10.0f} {:>10.0f} {:>10.0f}'.format(
+                endpoint, *timings))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,53 @@
+"""Benchmark of getting a whole collection and getting it page by page.
+
+/photos is requested from the local stand-in server answering in 20 ms
+like a remote service, in one response and by RESTAPIClient.paginate
+with and without pages fetched ahead. Run from the project root
+directory:
+
+    python -m benchmarks.bench_paginate
+"""
+import time
+
+from src.client import RESTAPIClient
+from src.server import LocalServer
+
+DELAY = 0.02
+ENDPOINT = '/photos'
+PAGE_SIZE = 250
+
+
+def _run(client, prefetch):
+    start = time.perf_counter()
+    first = None
+    count = 0
+    for _ in client.paginate(ENDPOINT, page_size=PAGE_SIZE,
+                             prefetch=prefetch):
+        if first is None:
+            first = time.perf_counter() - start
+        count += 1
+    return count, first, time.perf_counter() - start
+
+
+def main():
+    print('{:<16} {:>8} {:>14} {:>10}'.format(
+        'client', 'items', 'first item ms', 'total ms'))
+    with LocalServer(delay=DELAY) as server:
+        client = RESTAPIClient(server.url)
+        try:
+            start = time.perf_counter()
+            _, items = client.get(ENDPOINT)
+            elapsed = (time.perf_counter() - start) * 1000
+            print('{:<16} {:>8} {:>14.1f} {:>10.1f}'.format(
+                'whole', len(items), elapsed, elapsed))
+            for prefetch in (0, 1, 4, 8):
+                count, first, total = _run(client, prefetch)
+                print('{:<16} {:>8} {:>14.1f} {:>10.1f}'.format(
+                    'prefetch {}'.format(prefetch), count, first * 1000,
+                    total * 1000))
+        finally:
+            client.close()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,41 @@
+"""Microbenchmark of Snapshot lookups.
+
+Run from the project root directory:
+
+    python -m benchmarks.bench_snapshot
+"""
+import timeit
+
+from src.dataset import make_dataset
+from src.snapshot import Snapshot
+
+
+def _scan(items, field, values):
+    return [item for item in items if item[field] in values]
+
+
+def bench(scale):
+    dataset = make_dataset(scale=scale)
+    snapshot = Snapshot(dataset)
+    photos = snapshot['photos']
+    last_id = len(photos)
+    album_id = len(snapshot['albums']) // 2
+    cases = [
+        ('get /photos/{id}', lambda: photos.get(last_id)),
+        ('filter ?albumId=a', lambda: photos.filter(albumId=[album_id])),
+        ('filter ?albumId=a&albumId=b',
+         lambda: photos.filter(albumId=[album_id, album_id + 1])),
+        ('expected /albums/{id}/photos',
+         lambda: snapshot.expected('/albums/{}/photos'.format(album_id))),
+        ('linear scan ?albumId=a',
+         lambda: _scan(dataset['photos'], 'albumId', {album_id}))
+    ]
+    print('{} photos'.format(last_id))
+    for name, func in cases:
+        number, seconds = timeit.Timer(func).autorange()
+        print('  {:<32} {:>10.2f} us'.format(name, seconds / number * 1e6))
+
+
+if __name__ == '__main__':
+    for scale in (1, 100):
+        bench(scale)
@@ -0,0 +1,46 @@
+"""Benchmark of compiled bulk validation of resource lists.
+
+Every collection is validated by the compiled Validator in one pass and,
+for comparison, resource by resource with the recursive walk that
+reports mismatches, then integrity of all collections is checked.
+Run from the project root directory:
+
+    python -m benchmarks.bench_validation
+"""
+import timeit
+
+from src.contract import check_integrity
+from src.dataset import RESOURCES, make_dataset
+from src.snapshot import Snapshot
+from src.validation import get_validator
+
+
+def _walk(validator, items):
+    return [mismatch for pos, item in enumerate(items)
+            for mismatch in validator._explain(
+                validator.schema, item, '$[{}]'.format(pos))]
+
+
+def main():
+    dataset = make_dataset()
+    print('{:<10} {:>7} {:>14} {:>14} {:>8}'.format(
+        'resource', 'items', 'per-item us', 'compiled us', 'speedup'))
+    for resource, items in dataset.items():
+        validator = get_validator(resource)
+        timings = []
+        for func in (lambda: _walk(validator, items),
+                     lambda: validator.validate_many(items)):
+            number, seconds = timeit.Timer(func).autorange()
+            timings.append(seconds / number * 1e6)
+        print('{:<10} {:>7} {:>14.1f} {:>14.1f} {:>7.1f}x'.format(
+            resource, len(items), timings[0], timings[1],
+            timings[0] / timings[1]))
+    snapshot = Snapshot(dataset)
+    number, seconds = timeit.Timer(
+        lambda: check_integrity(snapshot, RESOURCES)).autorange()
+    print('Integrity of all collections: {:.2f} ms'.format(
+        seconds / number * 1e3))
+
+
+if __name__ == '__main__':
+    main()
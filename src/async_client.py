@@ -0,0 +1,179 @@
+import asyncio
+from urllib.parse import urljoin
+
+import aiohttp
+
+from src.codec import get_codec
+from src.singleflight import COALESCED_METHODS, AsyncSingleFlight, make_key
+from src.utils import relation_params
+
+
+class AsyncRESTAPIClient(object):
+
+    def __init__(self, url, concurrency=100, limit_per_host=0, codec=None,
+                 coalesce=True):
+        """Asyncio REST API client with bounded concurrency.
+
+        :param url: str, base url of the REST API
+        :param concurrency: int, max number of requests in flight
+        :param limit_per_host: int, max number of connections per host,
+        0 means no limit
+        :param codec: JSONCodec, codec of JSON bodies, the fastest
+        installed one by default
+        :param coalesce: boolean, send one request for concurrent
+        identical GET, HEAD and OPTIONS requests of several tasks,
+        every caller gets its own copy of the decoded body
+        """
+        self.url = url
+        self.concurrency = concurrency
+        self.limit_per_host = limit_per_host
+        self.codec = codec or get_codec()
+        self.singleflight = AsyncSingleFlight() if coalesce else None
+        self._session = None
+        self._semaphore = None
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *exc_info):
+        await self.close()
+
+    def _make_url(self, endpoint=None):
+        """Make full url for given resource endpoint.
+
+        :param endpoint: str, resource endpoint
+        :return: str, full url
+        """
+        if endpoint:
+            return urljoin(self.url, endpoint)
+        return self.url
+
+    def _get_session(self):
+        # NOTE: aiohttp session and semaphore are bound to the running
+        #  loop, so they are created on first request
+        if self._session is None:
+            connector = aiohttp.TCPConnector(
+                limit=self.concurrency, limit_per_host=self.limit_per_host)
+            self._session = aiohttp.ClientSession(connector=connector)
+            self._semaphore = asyncio.Semaphore(self.concurrency)
+        return self._session
+
+    async def close(self):
+        """Close the session and all its connections."""
+        if self._session is not None:
+            await self._session.close()
+            self._session = None
+            self._semaphore = None
+
+    async def _request(self, method, endpoint=None, **kwargs):
+        """Send request and decode its body.
+
+        :param method: str, HTTP method
+        :param endpoint: str, resource endpoint
+        :param kwargs: additional params to the request, embed and
+        expand take names of related resources, see relation_params
+        :return: tuple, status code and decoded json or None
+        """
+        url = self._make_url(endpoint)
+        embed, expand = kwargs.pop('embed', None), kwargs.pop('expand', None)
+        if embed or expand:
+            kwargs['params'] = relation_params(kwargs.get('params'), embed,
+                                               expand)
+        if self.singleflight is not None and \
+                method in COALESCED_METHODS and \
+                not kwargs.get('data') and kwargs.get('json') is None:
+            key = make_key(method, url, kwargs.get('params'),
+                           kwargs.get('headers'))
+            status, body = await self.singleflight.do(
+                key, self._fetch, method, url, **kwargs)
+        else:
+            status, body = await self._fetch(method, url, **kwargs)
+        try:
+            decoded_json = self.codec.loads(body)
+        except ValueError:
+            decoded_json = None
+        return status, decoded_json
+
+    async def _fetch(self, method, url, **kwargs):
+        session = self._get_session()
+        async with self._semaphore:
+            async with session.request(method, url, **kwargs) as resp:
+                return resp.status, await resp.read()
+
+    def coalesce_stats(self):
+        """Get number of sent and coalesced requests.
+
+        :return: dict or None if requests are not coalesced
+        """
+        if self.singleflight is None:
+            return None
+        return self.singleflight.stats()
+
+    async def get_allowed_methods(self, endpoint, **kwargs):
+        """Get allowed methods for resource.
+
+        :param endpoint: str, resource endpoint
+        :param kwargs: additional params to OPTIONS method
+        :return: list, list of allowed methods
+        or empty if status code is not 204
+        """
+        session = self._get_session()
+        async with self._semaphore:
+            async with session.options(self._make_url(endpoint),
+                                       **kwargs) as resp:
+                if resp.status != 204:
+                    return []
+                return resp.headers['Access-Control-Allow-Methods'].split(
+                    ',')
+
+    async def get(self, endpoint=None, **kwargs):
+        return await self._request('GET', endpoint, **kwargs)
+
+    async def post(self, endpoint=None, **kwargs):
+        return await self._request('POST', endpoint, **kwargs)
+
+    async def put(self, endpoint=None, **kwargs):
+        return await self._request('PUT', endpoint, **kwargs)
+
+    async def patch(self, endpoint=None, **kwargs):
+        return await self._request('PATCH', endpoint, **kwargs)
+
+    async def delete(self, endpoint=None, **kwargs):
+        return await self._request('DELETE', endpoint, **kwargs)
+
+    async def gather_many(self, requests):
+        """Send many requests concurrently.
+
+        :param requests: iterable, endpoints to GET or tuples of
+        (method, endpoint) or (method, endpoint, kwargs)
+        :return: list, tuples of status code and decoded json
+        in the order of given requests
+        """
+        coros = []
+        for request in requests:
+            if isinstance(request, str):
+                request = ('GET', request)
+            method, endpoint = request[:2]
+            kwargs = request[2] if len(request) > 2 else {}
+            coros.append(self._request(method, endpoint, **kwargs))
+        return await asyncio.gather(*coros)
+
+
+def run_many(url, requests, concurrency=100):
+    """Send many requests concurrently from synchronous code.
+
+    :param url: str, base url of the REST API
+    :param requests: iterable, requests in format of
+    AsyncRESTAPIClient.gather_many
+    :param concurrency: int, max number of requests in flight
+    :return: list, tuples of status code and decoded json
+    """
+    async def _run():
+        async with AsyncRESTAPIClient(url, concurrency) as client:
+            return await client.gather_many(requests)
+
+    loop = asyncio.new_event_loop()
+    try:
+        return loop.run_until_complete(_run())
+    finally:
+        loop.close()
@@ -0,0 +1,193 @@
+"""Latency budgets of tests and regressions against a baseline.
+
+Every client call made by a test is timed. A test fails (or is reported
+as xfailed) if p95 latency of its calls exceeds its budget declared by
+@pytest.mark.latency_budget(ms=150).
+
+The baseline file keeps p50/p95/p99 latency per test group and endpoint
+template and is written by --update-latency-baseline. Most tests make
+one call of an endpoint, so latencies are compared with the baseline at
+the end of the run, over all calls of an endpoint template of a group,
+and only if there are enough of them. A regression fails the run.
+"""
+import json
+import os
+import threading
+from collections import defaultdict
+
+import pytest
+
+from src.distribute import _is_worker, get_group
+from src.utils import endpoint_template, percentile
+
+SAMPLES_KEY = 'latency_samples'
+
+
+def _template(timing):
+    return '{} {}'.format(timing.method,
+                          endpoint_template(timing.endpoint or '/'))
+
+
+def summarize(latencies):
+    """Get percentiles of latencies.
+
+    :param latencies: list, latencies in seconds
+    :return: dict, count and p50, p95, p99 in milliseconds
+    """
+    latencies = sorted(latencies)
+    summary = {'count': len(latencies)}
+    for percent in (50, 95, 99):
+        summary['p{}'.format(percent)] = round(
+            percentile(latencies, percent) * 1000, 3)
+    return summary
+
+
+class LatencyBudgetPlugin(object):
+
+    def __init__(self, config):
+        self.config = config
+        self.baseline_path = config.getoption('latency_baseline')
+        self.update_baseline = config.getoption('update_latency_baseline')
+        self.tolerance = config.getoption('latency_tolerance')
+        self.tolerance_ms = config.getoption('latency_tolerance_ms')
+        self.mode = config.getoption('latency_budget_mode')
+        self.min_samples = config.getoption('latency_min_samples')
+        self.baseline = {}
+        if self.baseline_path and os.path.exists(self.baseline_path) and \
+                not self.update_baseline:
+            with open(self.baseline_path) as baseline:
+                self.baseline = json.load(baseline)
+        # NOTE: Latencies per test group and endpoint template
+        self.samples = defaultdict(lambda: defaultdict(list))
+        self._calls = None
+        self._lock = threading.Lock()
+
+    def record(self, timing):
+        """Add timing of a call made by the test being run.
+
+        :param timing: src.timing.Timing
+        """
+        calls = self._calls
+        if calls is not None:
+            with self._lock:
+                calls.append((_template(timing), timing.total))
+
+    @pytest.hookimpl(hookwrapper=True)
+    def pytest_runtest_call(self, item):
+        # NOTE: Only calls made by the test itself are timed, not ones of
+        #  shared fixtures like snapshot
+        self._calls = []
+        try:
+            yield
+        finally:
+            item._latency_calls, self._calls = self._calls, None
+        group = get_group(item)
+        with self._lock:
+            for template, latency in item._latency_calls:
+                self.samples[group][template].append(latency)
+
+    def allowed(self, baseline_p95):
+        """Get max allowed p95 latency in milliseconds."""
+        return baseline_p95 * (1 + self.tolerance) + self.tolerance_ms
+
+    def _check(self, item):
+        """Check latencies of the test calls against its budget.
+
+        :param item: pytest.Item, test item
+        :return: list, messages about exceeded budgets
+        """
+        calls = getattr(item, '_latency_calls', None)
+        marker = item.get_closest_marker('latency_budget')
+        if not calls or marker is None:
+            return []
+        budget = marker.kwargs['ms'] if 'ms' in marker.kwargs \
+            else marker.args[0]
+        p95 = summarize([latency for _, latency in calls])['p95']
+        if p95 > budget:
+            return ['p95 latency {:.2f} ms exceeds budget of {} ms'.format(
+                p95, budget)]
+        return []
+
+    @pytest.hookimpl(hookwrapper=True)
+    def pytest_runtest_makereport(self, item, call):
+        outcome = yield
+        report = outcome.get_result()
+        if report.when != 'call' or not report.passed:
+            return
+        errors = self._check(item)
+        if not errors:
+            return
+        message = 'Latency budget exceeded: {}'.format('; '.join(errors))
+        if self.mode == 'xfail':
+            report.outcome = 'skipped'
+            report.wasxfail = message
+        else:
+            report.outcome = 'failed'
+            report.longrepr = message
+
+    @pytest.hookimpl(optionalhook=True)
+    def pytest_testnodedown(self, node, error):
+        samples = getattr(node, 'workeroutput', {}).get(SAMPLES_KEY, {})
+        for group, templates in samples.items():
+            for template, latencies in templates.items():
+                self.samples[group][template].extend(latencies)
+
+    def make_baseline(self):
+        """Make baseline from latencies of this run.
+
+        :return: dict, test group -> endpoint template -> percentiles
+        """
+        return {group: {template: summarize(latencies)
+                        for template, latencies in sorted(templates.items())}
+                for group, templates in sorted(self.samples.items())}
+
+    def regressions(self):
+        """Compare latencies of this run with the baseline.
+
+        Endpoint templates with less than min_samples calls in this run
+        are not compared, p95 of a few calls is too noisy.
+
+        :return: list, tuples of test group, endpoint template, baseline
+        and current p95 latency in milliseconds
+        """
+        regressions = []
+        for group, templates in sorted(self.samples.items()):
+            baseline = self.baseline.get(group, {})
+            for template, latencies in sorted(templates.items()):
+                if template not in baseline or \
+                        len(latencies) < self.min_samples:
+                    continue
+                base = baseline[template]['p95']
+                p95 = summarize(latencies)['p95']
+                if p95 > self.allowed(base):
+                    regressions.append((group, template, base, p95))
+        return regressions
+
+    def pytest_sessionfinish(self, session):
+        if _is_worker(self.config):
+            self.config.workeroutput[SAMPLES_KEY] = {
+                group: dict(templates)
+                for group, templates in self.samples.items()}
+            return
+        if self.update_baseline and self.baseline_path:
+            with open(self.baseline_path, 'w') as baseline:
+                json.dump(self.make_baseline(), baseline, indent=2,
+                          sort_keys=True)
+        elif self.mode == 'fail' and session.exitstatus == 0 and \
+                self.regressions():
+            session.exitstatus = pytest.ExitCode.TESTS_FAILED
+
+    def pytest_terminal_summary(self, terminalreporter):
+        if self.update_baseline and self.baseline_path:
+            terminalreporter.write_line(
+                'Latency baseline is written to {}'.format(
+                    self.baseline_path))
+        regressions = self.regressions()
+        for group, template, base, p95 in regressions:
+            terminalreporter.write_line(
+                'Latency regression in {}: {} p95 {:.2f} ms, baseline '
+                '{:.2f} ms'.format(group, template, p95, base))
+        if regressions and self.mode == 'fail':
+            terminalreporter.write_line(
+                'The run fails because latencies exceed the baseline',
+                red=True)
@@ -0,0 +1,181 @@
+import threading
+import time
+from collections import OrderedDict
+from contextlib import contextmanager
+from urllib.parse import parse_qsl, urlencode, urlsplit, urlunsplit
+
+from src.dataset import PARENTS
+
+CACHEABLE_METHODS = ('GET', 'OPTIONS')
+CACHEABLE_CODES = (200, 203, 204)
+
+
+def normalize_url(url, params=None):
+    """Normalize url to use it as a cache key.
+
+    :param url: str, full url
+    :param params: dict or list, additional query params
+    :return: str, url with lowercase scheme and host, without trailing
+    slash and with sorted query params
+    """
+    parts = urlsplit(url)
+    query = parse_qsl(parts.query, keep_blank_values=True)
+    if params:
+        query.extend(params.items() if isinstance(params, dict) else params)
+    path = parts.path.rstrip('/') or '/'
+    return urlunsplit((parts.scheme.lower(), parts.netloc.lower(), path,
+                       urlencode(sorted(query)), ''))
+
+
+class _Entry(object):
+
+    __slots__ = ('response', 'expires', 'etag')
+
+    def __init__(self, response, expires):
+        self.response = response
+        self.expires = expires
+        self.etag = response.headers.get('ETag')
+
+
+class ResponseCache(object):
+    """LRU cache of responses to idempotent requests.
+
+    A stale response which has an ETag is revalidated by If-None-Match
+    instead of being fetched again.
+    """
+
+    def __init__(self, maxsize=256, ttl=60.0, clock=time.monotonic):
+        """Make cache.
+
+        :param maxsize: int, max number of cached responses
+        :param ttl: float, seconds a cached response stays fresh
+        :param clock: callable, source of current time in seconds
+        """
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self.clock = clock
+        self.enabled = True
+        self.hits = self.misses = self.revalidations = 0
+        self.invalidations = 0
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        return len(self._entries)
+
+    @staticmethod
+    def make_key(method, url, params=None):
+        return method, normalize_url(url, params)
+
+    def lookup(self, key):
+        """Get cached response.
+
+        :param key: tuple, cache key
+        :return: tuple, fresh response or None and ETag of a stale one
+        """
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                self.misses += 1
+                return None, None
+            if entry.expires > self.clock():
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return entry.response, None
+            if entry.etag is None:
+                del self._entries[key]
+            self.misses += 1
+            return None, entry.etag
+
+    def revalidated(self, key):
+        """Refresh stale response confirmed by 304 Not Modified.
+
+        :param key: tuple, cache key
+        :return: requests.Response or None if it was evicted meanwhile
+        """
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            entry.expires = self.clock() + self.ttl
+            self._entries.move_to_end(key)
+            self.revalidations += 1
+            return entry.response
+
+    def store(self, key, response):
+        """Cache response if it is cacheable.
+
+        :param key: tuple, cache key
+        :param response: requests.Response
+        """
+        if response.status_code not in CACHEABLE_CODES:
+            return
+        with self._lock:
+            self._entries[key] = _Entry(response, self.clock() + self.ttl)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.maxsize:
+                self._entries.popitem(last=False)
+
+    def invalidate(self, url):
+        """Drop cached responses of written resource.
+
+        Responses of the resource itself, of its collection (with any
+        filters) and of its nested resources are dropped, and so are
+        responses which contain the resource through src.dataset.PARENTS:
+        its collections nested in any parent (a write to /comments/1
+        drops /posts/1/comments) and collections which embed or expand
+        it (/posts?_embed=comments, /comments?_expand=post).
+
+        :param url: str, full url of written resource
+        """
+        written = urlsplit(normalize_url(url))
+        segments = [segment for segment in written.path.split('/')
+                    if segment]
+        if len(segments) > 1 and segments[-1].isdigit():
+            segments.pop()
+        resource = segments[-1] if segments else None
+        related = set([('_embed', resource)])
+        related.update(('_expand', key[:-2])
+                       for parent, key in PARENTS.values()
+                       if parent == resource)
+        with self._lock:
+            for key in list(self._entries):
+                cached = urlsplit(key[1])
+                if cached.netloc != written.netloc:
+                    continue
+                paths = sorted((cached.path, written.path), key=len)
+                cached_segments = cached.path.strip('/').split('/')
+                if paths[1] == paths[0] or \
+                        paths[1].startswith(paths[0].rstrip('/') + '/') or \
+                        (len(cached_segments) == 3 and
+                         cached_segments[2] == resource) or \
+                        related.intersection(parse_qsl(cached.query)):
+                    del self._entries[key]
+                    self.invalidations += 1
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    @contextmanager
+    def disabled(self):
+        """Bypass cache within the context."""
+        enabled, self.enabled = self.enabled, False
+        try:
+            yield self
+        finally:
+            self.enabled = enabled
+
+    def stats(self):
+        """Get cache statistics.
+
+        :return: dict, numbers of hits, misses, revalidations,
+        invalidations and cached responses
+        """
+        return {
+            'hits': self.hits,
+            'misses': self.misses,
+            'revalidations': self.revalidations,
+            'invalidations': self.invalidations,
+            'size': len(self._entries)
+        }
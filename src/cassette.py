@@ -0,0 +1,232 @@
+"""Record and replay of HTTP exchanges.
+
+A cassette is a single file: bodies of all responses one after another,
+then the index and 8 bytes of the index offset. The index maps a request
+key to status, reason, headers and the body position, so a cassette is
+memory-mapped on load and only the index is decoded, a body is copied
+out of the mapping when its request is replayed.
+"""
+import hashlib
+import io
+import mmap
+import os
+import struct
+import threading
+from urllib.parse import urlsplit
+
+from requests import ConnectionError, Response
+from requests.adapters import BaseAdapter
+from requests.structures import CaseInsensitiveDict
+from requests.utils import get_encoding_from_headers
+
+from src.cache import normalize_url
+from src.codec import get_codec
+
+MODES = ('record', 'replay', 'auto')
+FOOTER = struct.Struct('>Q')
+
+# NOTE: Recorded bodies are already decoded, so headers describing
+#  the transfer encoding are not replayed
+SKIPPED_HEADERS = ('content-encoding', 'content-length', 'transfer-encoding',
+                   'connection', 'keep-alive')
+
+
+class CassetteMiss(ConnectionError):
+    """Request is not recorded in the cassette being replayed."""
+
+
+def make_key(method, url, body=None):
+    """Make key of request.
+
+    Host is not a part of the key, so requests to the stand-in server
+    are replayed whatever port it has got.
+
+    :param method: str, HTTP method
+    :param url: str, full url
+    :param body: bytes or str, request body
+    :return: str, hex digest of method, path with sorted query and body
+    """
+    parts = urlsplit(normalize_url(url))
+    digest = hashlib.sha1('{} {}?{}\n'.format(
+        method, parts.path, parts.query).encode('utf-8'))
+    if body:
+        digest.update(body.encode('utf-8') if isinstance(body, str)
+                      else body)
+    return digest.hexdigest()
+
+
+class Cassette(object):
+
+    def __init__(self, path, mode='auto', codec=None):
+        """Open cassette.
+
+        :param path: str, path of cassette file
+        :param mode: str, "record" to send every request and record it,
+        "replay" to answer only from the cassette, "auto" to replay
+        recorded requests and record the others
+        :param codec: JSONCodec, codec of the index
+        """
+        if mode not in MODES:
+            raise ValueError('Unknown cassette mode {!r}'.format(mode))
+        self.path = path
+        self.mode = mode
+        self.codec = codec or get_codec()
+        self._index = {}
+        self._recorded = {}
+        self._file = self._mmap = None
+        self._lock = threading.Lock()
+        if mode != 'record':
+            self._load()
+
+    def _load(self):
+        if not os.path.exists(self.path):
+            if self.mode == 'replay':
+                raise IOError('Cassette {} does not exist'.format(self.path))
+            return
+        self._file = open(self.path, 'rb')
+        if os.fstat(self._file.fileno()).st_size < FOOTER.size:
+            return
+        self._mmap = mmap.mmap(self._file.fileno(), 0,
+                               access=mmap.ACCESS_READ)
+        index_offset, = FOOTER.unpack(self._mmap[-FOOTER.size:])
+        self._index = self.codec.loads(
+            self._mmap[index_offset:-FOOTER.size])
+
+    def __len__(self):
+        return len(set(self._index) | set(self._recorded))
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+    def get(self, key):
+        """Get recorded exchange.
+
+        :param key: str, request key
+        :return: tuple, status, reason, headers and body or None
+        """
+        with self._lock:
+            if key in self._recorded:
+                return self._recorded[key]
+        if key not in self._index:
+            return None
+        return self._get_indexed(key)
+
+    def _get_indexed(self, key):
+        status, reason, headers, offset, length = self._index[key]
+        return status, reason, headers, self._mmap[offset:offset + length]
+
+    def put(self, key, status, reason, headers, body):
+        """Record exchange, it is written to the file on save.
+
+        :param key: str, request key
+        :param status: int, response code
+        :param reason: str, response reason
+        :param headers: dict, response headers
+        :param body: bytes, decoded response body
+        :return: tuple, recorded status, reason, headers and body
+        """
+        headers = {name: value for name, value in headers.items()
+                   if name.lower() not in SKIPPED_HEADERS}
+        entry = status, reason, headers, body
+        with self._lock:
+            self._recorded[key] = entry
+        return entry
+
+    def save(self):
+        """Write recorded exchanges together with replayed ones."""
+        with self._lock:
+            if not self._recorded:
+                return
+            entries = {key: self._get_indexed(key) for key in self._index}
+            entries.update(self._recorded)
+            index = {}
+            tmp_path = self.path + '.tmp'
+            with open(tmp_path, 'wb') as cassette:
+                for key, (status, reason, headers, body) in sorted(
+                        entries.items()):
+                    index[key] = (status, reason, headers, cassette.tell(),
+                                  len(body))
+                    cassette.write(body)
+                index_offset = cassette.tell()
+                cassette.write(self.codec.dumps(index))
+                cassette.write(FOOTER.pack(index_offset))
+            self._close_file()
+            os.replace(tmp_path, self.path)
+            self._recorded.clear()
+        self._load()
+
+    def _close_file(self):
+        if self._mmap is not None:
+            self._mmap.close()
+            self._mmap = None
+        if self._file is not None:
+            self._file.close()
+            self._file = None
+        self._index = {}
+
+    def close(self):
+        """Save recorded exchanges and unmap the file."""
+        self.save()
+        self._close_file()
+
+
+class CassetteAdapter(BaseAdapter):
+    """Transport adapter answering from a cassette.
+
+    Responses of sent requests are recorded and returned from the
+    recording as well, so a recorded run and a replayed one get the same
+    responses.
+    """
+
+    def __init__(self, cassette, adapter=None):
+        """Make adapter.
+
+        :param cassette: Cassette
+        :param adapter: requests.adapters.BaseAdapter, adapter sending
+        requests which are not replayed, required unless cassette is
+        replayed only
+        """
+        super(CassetteAdapter, self).__init__()
+        self.cassette = cassette
+        self.adapter = adapter
+
+    def connection_stats(self):
+        """Get number of connections and requests of the wrapped adapter."""
+        if self.adapter is None:
+            return {'connections': 0, 'requests': 0}
+        return self.adapter.connection_stats()
+
+    def send(self, request, **kwargs):
+        key = make_key(request.method, request.url, request.body)
+        entry = None
+        if self.cassette.mode != 'record':
+            entry = self.cassette.get(key)
+        if entry is None:
+            if self.cassette.mode == 'replay' or self.adapter is None:
+                raise CassetteMiss(
+                    '{} {} is not recorded in cassette {}'.format(
+                        request.method, request.url, self.cassette.path),
+                    request=request)
+            resp = self.adapter.send(request, **kwargs)
+            entry = self.cassette.put(key, resp.status_code, resp.reason,
+                                      dict(resp.headers), resp.content)
+        return self.build_response(request, *entry)
+
+    def build_response(self, request, status, reason, headers, body):
+        resp = Response()
+        resp.status_code = status
+        resp.reason = reason
+        resp.headers = CaseInsensitiveDict(headers)
+        resp.encoding = get_encoding_from_headers(resp.headers)
+        resp.raw = io.BytesIO(body)
+        resp.url = request.url
+        resp.request = request
+        resp.connection = self
+        return resp
+
+    def close(self):
+        if self.adapter is not None:
+            self.adapter.close()
@@ -1,22 +1,299 @@
+import math
+import time
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+
 import requests
-from urllib.parse import urljoin
+from urllib.parse import parse_qs, urljoin, urlsplit
+
+from src.cache import CACHEABLE_METHODS
+from src.codec import get_codec
+from src.jsonstream import iter_items
+from src.singleflight import COALESCED_METHODS, SingleFlight, make_key
+from src.timing import TimedHTTPAdapter, current_timing, timed
+from src.utils import endpoint_template, percentile, relation_params
+
+
+# NOTE: Unread bodies up to this size are read out to reuse their
+#  connection, the connection of a longer one is closed instead
+DRAIN_LIMIT = 65536
+
+
+def release_response(resp):
+    """Return connection of a streamed response to the pool.
+
+    :param resp: requests.Response, response which body may be unread
+    """
+    length = resp.headers.get('Content-Length', '')
+    if length.isdigit() and int(length) <= DRAIN_LIMIT:
+        resp.content
+    resp.close()
+
+
+class LazyResult(object):
+    """Result of a call whose body is read and decoded on first access.
+
+    Unpacks like the tuple of status code and decoded json returned by
+    default. The connection is released when the body is read, when the
+    result is closed or garbage collected.
+    """
+
+    __slots__ = ('status', 'headers', '_resp', '_codec', '_body',
+                 '_decoded')
+
+    def __init__(self, resp, codec):
+        self.status = resp.status_code
+        self.headers = resp.headers
+        self._resp = resp
+        self._codec = codec
+        self._body = None
+        self._decoded = False
+
+    @property
+    def body(self):
+        """Decoded json or None if body is not JSON."""
+        if not self._decoded:
+            try:
+                self._body = self._codec.loads(self._resp.content)
+            except ValueError:
+                self._body = None
+            finally:
+                self._decoded = True
+                self._resp.close()
+        return self._body
+
+    def close(self):
+        """Release the connection without reading the body."""
+        if not self._decoded:
+            release_response(self._resp)
+
+    def __del__(self):
+        self.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+    def __iter__(self):
+        return iter((self.status, self.body))
+
+    def __getitem__(self, index):
+        return (self.status, self.body)[index]
+
+    def __len__(self):
+        return 2
+
+    def __repr__(self):
+        return 'LazyResult(status={})'.format(self.status)
 
 
 def parse_response(func):
-    def wrapper(*args, **kwargs):
-        resp = func(*args, **kwargs)
-        try:
-            decoded_json = resp.json()
-        except Exception:
-            decoded_json = None
+    """Make client call return status code and decoded json.
+
+    The call takes two more keyword arguments:
+    lazy - boolean, return LazyResult reading the body on first access,
+    status_only - boolean, return status code and None without reading
+    the body. Both are not timed beyond the response headers.
+    """
+    def wrapper(self, *args, **kwargs):
+        lazy = kwargs.pop('lazy', False)
+        status_only = kwargs.pop('status_only', False)
+        # NOTE: Cached responses are read whole to be stored
+        if (lazy or status_only) and \
+                (self.cache is None or not self.cache.enabled):
+            kwargs['stream'] = True
+        with timed(self.timing_listeners) as timing:
+            resp = func(self, *args, **kwargs)
+            if status_only or lazy:
+                if timing is not None:
+                    timing.status = resp.status_code
+                if lazy:
+                    return LazyResult(resp, self.codec)
+                release_response(resp)
+                return resp.status_code, None
+            start = time.perf_counter()
+            try:
+                decoded_json = self.codec.loads(resp.content)
+            except ValueError:
+                decoded_json = None
+            if timing is not None:
+                timing.decode = time.perf_counter() - start
+                timing.status = resp.status_code
         return resp.status_code, decoded_json
     return wrapper
 
 
+class BulkWrite(object):
+    """Writes of a batch streamed back in the order of their requests.
+
+    Iterating over it sends the requests, at most window of them are
+    in flight or done but not yet iterated over. A failed write (an
+    error response or a connection error) does not stop the others,
+    it is recorded in failures.
+    """
+
+    def __init__(self, client, func, writes, window, kwargs):
+        """Make batch of writes.
+
+        :param client: RESTAPIClient, client sending the requests
+        :param func: callable, client method returning status code and
+        decoded json
+        :param writes: iterable, tuples of endpoint and json body or
+        None to send no body
+        :param window: int, max number of requests submitted ahead
+        :param kwargs: additional params to every request
+        """
+        self.client = client
+        self.func = func
+        self.window = window
+        self.kwargs = kwargs
+        self.failures = []
+        self.latencies = []
+        self.started = self.finished = None
+        self._results = self._run(iter(writes))
+
+    def __iter__(self):
+        return self._results
+
+    def _call(self, endpoint, body):
+        kwargs = self.kwargs if body is None \
+            else dict(self.kwargs, json=body)
+        start = time.perf_counter()
+        try:
+            code, decoded_json = self.func(endpoint, **kwargs)
+        except requests.RequestException as exc:
+            code, decoded_json = None, exc
+        return code, decoded_json, time.perf_counter() - start
+
+    def _done(self, index, endpoint, future):
+        code, decoded_json, latency = future.result()
+        self.latencies.append(latency)
+        if code is None:
+            self.failures.append((index, endpoint, None, decoded_json))
+            return None, None
+        if code >= 400:
+            self.failures.append((index, endpoint, code, decoded_json))
+        return code, decoded_json
+
+    def _run(self, writes):
+        executor = self.client._get_executor()
+        pending = deque()
+        self.started = time.perf_counter()
+        try:
+            for index, (endpoint, body) in enumerate(writes):
+                pending.append((index, endpoint, executor.submit(
+                    self.client._limited, self._call, endpoint, body)))
+                if len(pending) >= self.window:
+                    yield self._done(*pending.popleft())
+            while pending:
+                yield self._done(*pending.popleft())
+        finally:
+            # NOTE: Requests not sent yet are dropped when iteration
+            #  stops early
+            for _, _, future in pending:
+                future.cancel()
+            self.finished = time.perf_counter()
+
+    def results(self):
+        """Send all remaining requests.
+
+        :return: list, tuples of status code and decoded json, None
+        and None for a connection error, in the order of requests
+        """
+        return list(self)
+
+    def summary(self):
+        """Get throughput and latency of the writes done so far.
+
+        :return: dict, number of requests and failures, seconds,
+        requests per second and latency percentiles in ms
+        """
+        end = self.finished or time.perf_counter()
+        elapsed = (end - self.started) if self.started else 0.0
+        latencies = sorted(self.latencies)
+        summary = {
+            'requests': len(latencies),
+            'failed': len(self.failures),
+            'seconds': round(elapsed, 3),
+            'throughput': round(len(latencies) / (elapsed or 1e-9), 1)
+        }
+        for name, percent in (('p50', 50), ('p95', 95), ('max', 100)):
+            value = percentile(latencies, percent)
+            summary[name] = None if value is None else round(value * 1000,
+                                                             2)
+        return summary
+
+    def report(self, max_failures=10):
+        """Make report of the writes done so far.
+
+        :param max_failures: int, max number of listed failures
+        :return: str, summary line followed by failed requests
+        """
+        lines = [
+            '{requests} requests, {failed} failed in {seconds} s: '
+            '{throughput} req/s, p50 {p50} ms, p95 {p95} ms, '
+            'max {max} ms'.format(**self.summary())]
+        for index, endpoint, code, detail in self.failures[:max_failures]:
+            lines.append('  #{} {} {}: {}'.format(
+                index, endpoint, code or 'error', detail))
+        if len(self.failures) > max_failures:
+            lines.append('  ... {} more'.format(
+                len(self.failures) - max_failures))
+        return '\n'.join(lines)
+
+
 class RESTAPIClient(object):
 
-    def __init__(self, url):
+    def __init__(self, url, pool_connections=10, pool_maxsize=10,
+                 max_retries=0, keep_alive=True, pool_block=True,
+                 max_workers=None, cache=None, codec=None, http2=False,
+                 limiter=None, coalesce=True):
+        """REST API client sharing one pooled keep-alive session.
+
+        :param url: str, base url of the REST API
+        :param pool_connections: int, number of per-host pools to cache
+        :param pool_maxsize: int, max number of connections kept per host
+        :param max_retries: int, max connection retries of the transport
+        :param keep_alive: boolean, reuse connections between requests
+        :param pool_block: boolean, wait for a free connection instead of
+        opening more than pool_maxsize connections to one host
+        :param max_workers: int, number of threads sending batched
+        requests, pool_maxsize by default
+        :param cache: ResponseCache, cache of GET and OPTIONS responses,
+        no caching by default
+        :param codec: JSONCodec, codec of JSON bodies, the fastest
+        installed one by default
+        :param http2: boolean, multiplex requests over one HTTP/2
+        connection per host instead of the pool of HTTP/1.1 ones,
+        requires httpx with h2
+        :param limiter: AdaptiveLimiter, limiter of requests in flight
+        of batches adjusted by their latency and errors, max_workers and
+        pool_maxsize should not be below its max_limit
+        :param coalesce: boolean, send one request for concurrent
+        identical GET, HEAD and OPTIONS requests of several threads,
+        every caller gets its own copy of the decoded body
+        """
         self.url = url
+        self.session = requests.Session()
+        if http2:
+            from src.http2 import HTTP2Adapter
+            self.mount(HTTP2Adapter())
+        else:
+            self.mount(TimedHTTPAdapter(pool_connections=pool_connections,
+                                        pool_maxsize=pool_maxsize,
+                                        max_retries=max_retries,
+                                        pool_block=pool_block))
+        if not keep_alive:
+            self.session.headers['Connection'] = 'close'
+        self.max_workers = max_workers or pool_maxsize
+        self._executor = None
+        self.cache = cache
+        self.codec = codec or get_codec()
+        self.timing_listeners = []
+        self.limiter = limiter
+        self.singleflight = SingleFlight() if coalesce else None
 
     def _make_url(self, endpoint=None):
         """Make full url for given resource endpoint.
@@ -28,6 +305,160 @@ class RESTAPIClient(object):
             return urljoin(self.url, endpoint)
         return self.url
 
+    def mount(self, adapter):
+        """Send requests through given transport adapter.
+
+        :param adapter: requests.adapters.BaseAdapter, adapter of both
+        http and https urls, e.g. one wrapping the current self.adapter
+        """
+        self.adapter = adapter
+        self.session.mount('http://', adapter)
+        self.session.mount('https://', adapter)
+
+    def add_timing_listener(self, listener):
+        """Subscribe to timings of calls.
+
+        Calls of get, post, put, patch, delete and get_allowed_methods
+        are timed only while there is a listener.
+
+        :param listener: callable, called with src.timing.Timing after
+        every successful call, possibly from a batch thread
+        """
+        self.timing_listeners.append(listener)
+
+    def remove_timing_listener(self, listener):
+        self.timing_listeners.remove(listener)
+
+    def _send(self, method, url, **kwargs):
+        timing = current_timing()
+        if timing is None or kwargs.get('stream'):
+            return self.session.request(method, url, **kwargs)
+        # NOTE: Body is read here instead of by the session to time it
+        #  apart from the response headers
+        kwargs['stream'] = True
+        resp = self.session.request(method, url, **kwargs)
+        start = time.perf_counter()
+        resp.content
+        timing.add('download', time.perf_counter() - start)
+        return resp
+
+    def _request(self, method, endpoint=None, **kwargs):
+        """Send request through the pooled session.
+
+        :param method: str, HTTP method
+        :param endpoint: str, resource endpoint
+        :param kwargs: additional params to the request, embed and
+        expand take names of related resources, see relation_params
+        :return: requests.Response
+        """
+        url = self._make_url(endpoint)
+        embed, expand = kwargs.pop('embed', None), kwargs.pop('expand', None)
+        if embed or expand:
+            kwargs['params'] = relation_params(kwargs.get('params'), embed,
+                                               expand)
+        timing = current_timing()
+        if timing is not None:
+            timing.method, timing.endpoint = method, endpoint
+        if kwargs.get('json') is not None:
+            kwargs['data'] = self.codec.dumps(kwargs.pop('json'))
+            kwargs['headers'] = dict(kwargs.get('headers') or {},
+                                     **{'Content-Type': 'application/json'})
+        # NOTE: A streamed response can be read only once, so it is not
+        #  shared
+        if self.singleflight is not None and \
+                method in COALESCED_METHODS and \
+                not kwargs.get('stream') and not kwargs.get('data'):
+            key = make_key(method, url, kwargs.get('params'),
+                           kwargs.get('headers'))
+            return self.singleflight.do(key, self._fetch, method, url,
+                                        **kwargs)
+        return self._fetch(method, url, **kwargs)
+
+    def _fetch(self, method, url, **kwargs):
+        """Get response from the cache or send request.
+
+        :param method: str, HTTP method
+        :param url: str, full url
+        :param kwargs: additional params to the request
+        :return: requests.Response
+        """
+        # NOTE: Writes invalidate the cache even while it is bypassed,
+        #  e.g. by a no_cache test
+        if self.cache is not None and method not in CACHEABLE_METHODS:
+            resp = self._send(method, url, **kwargs)
+            self.cache.invalidate(url)
+            return resp
+        if self.cache is None or not self.cache.enabled or \
+                kwargs.get('stream'):
+            return self._send(method, url, **kwargs)
+        key = self.cache.make_key(method, url, kwargs.get('params'))
+        resp, etag = self.cache.lookup(key)
+        if resp is not None:
+            return resp
+        if etag is not None:
+            kwargs['headers'] = dict(kwargs.get('headers') or {},
+                                     **{'If-None-Match': etag})
+        resp = self._send(method, url, **kwargs)
+        if resp.status_code == 304:
+            cached = self.cache.revalidated(key)
+            if cached is not None:
+                return cached
+            # NOTE: Cached response was evicted meanwhile, get it again
+            del kwargs['headers']['If-None-Match']
+            resp = self._send(method, url, **kwargs)
+        self.cache.store(key, resp)
+        return resp
+
+    def connection_stats(self):
+        """Get connection reuse statistics of the session pools.
+
+        :return: dict, number of opened connections, sent requests
+        and requests served by an already opened connection
+        """
+        connections = requests_count = 0
+        for adapter in set(self.session.adapters.values()):
+            stats = adapter.connection_stats()
+            connections += stats['connections']
+            requests_count += stats['requests']
+        return {
+            'connections': connections,
+            'requests': requests_count,
+            'reused': max(requests_count - connections, 0)
+        }
+
+    def coalesce_stats(self):
+        """Get number of sent and coalesced requests.
+
+        :return: dict, number of requests sent on behalf of concurrent
+        identical ones and number of requests which waited for them,
+        or None if requests are not coalesced
+        """
+        if self.singleflight is None:
+            return None
+        return self.singleflight.stats()
+
+    def concurrency_stats(self):
+        """Get current limit of requests in flight and throughput.
+
+        :return: dict, see AdaptiveLimiter.stats, or None if requests
+        are not limited
+        """
+        if self.limiter is None:
+            return None
+        return self.limiter.stats()
+
+    def close(self):
+        """Close all pooled connections and batch threads."""
+        if self._executor is not None:
+            self._executor.shutdown()
+            self._executor = None
+        self.session.close()
+
+    def _get_executor(self):
+        if self._executor is None:
+            self._executor = ThreadPoolExecutor(self.max_workers)
+        return self._executor
+
     def get_allowed_methods(self, endpoint, **kwargs):
         """Get allowed methods for resource.
 
@@ -36,27 +467,192 @@ class RESTAPIClient(object):
         :return: list, list of allowed methods
         or empty if status code is not 204
         """
-        resp = requests.options(self._make_url(endpoint), **kwargs)
+        with timed(self.timing_listeners) as timing:
+            resp = self._request('OPTIONS', endpoint, **kwargs)
+            if timing is not None:
+                timing.status = resp.status_code
         if resp.status_code != 204:
             return []
         return resp.headers['Access-Control-Allow-Methods'].split(',')
 
     @parse_response
     def get(self, endpoint=None, **kwargs):
-        return requests.get(self._make_url(endpoint), **kwargs)
+        return self._request('GET', endpoint, **kwargs)
 
     @parse_response
     def post(self, endpoint=None, **kwargs):
-        return requests.post(self._make_url(endpoint), **kwargs)
+        return self._request('POST', endpoint, **kwargs)
 
     @parse_response
     def put(self, endpoint=None, **kwargs):
-        return requests.put(self._make_url(endpoint), **kwargs)
+        return self._request('PUT', endpoint, **kwargs)
 
     @parse_response
     def patch(self, endpoint=None, **kwargs):
-        return requests.patch(self._make_url(endpoint), **kwargs)
+        return self._request('PATCH', endpoint, **kwargs)
 
     @parse_response
     def delete(self, endpoint=None, **kwargs):
-        return requests.delete(self._make_url(endpoint), **kwargs)
+        return self._request('DELETE', endpoint, **kwargs)
+
+    def iter_get(self, endpoint=None, chunk_size=65536, **kwargs):
+        """Get resource collection item by item.
+
+        Items are decoded while the body is being downloaded, so the first
+        item is available before the whole body has arrived.
+
+        :param endpoint: str, resource endpoint
+        :param chunk_size: int, max number of bytes read at once
+        :param kwargs: additional params to GET method
+        :return: generator, decoded items of the collection
+        :raises: requests.HTTPError if response code is not 2xx
+        """
+        resp = self._request('GET', endpoint, stream=True, **kwargs)
+        try:
+            resp.raise_for_status()
+            for item in iter_items(resp.iter_content(chunk_size)):
+                yield item
+        finally:
+            resp.close()
+
+    def _get_page(self, endpoint, page, page_size, kwargs):
+        """Get one page of a collection.
+
+        :return: tuple, status code, decoded items and number of pages
+        told by X-Total-Count or the last link or None if not told
+        :raises: requests.HTTPError if response code is not 2xx
+        """
+        params = dict(kwargs.pop('params', None) or {},
+                      _page=page, _limit=page_size)
+        with timed(self.timing_listeners) as timing:
+            resp = self._request('GET', endpoint, params=params, **kwargs)
+            if timing is not None:
+                timing.status = resp.status_code
+            resp.raise_for_status()
+            items = self.codec.loads(resp.content)
+        pages = None
+        if 'X-Total-Count' in resp.headers:
+            pages = int(math.ceil(
+                int(resp.headers['X-Total-Count']) / float(page_size)))
+        elif 'last' in resp.links:
+            query = parse_qs(urlsplit(resp.links['last']['url']).query)
+            pages = int(query['_page'][0])
+        return resp.status_code, items, pages
+
+    def paginate(self, endpoint=None, page_size=100, prefetch=4, **kwargs):
+        """Get resource collection page by page.
+
+        Items of a page are yielded while the next pages are being
+        fetched by the batch threads, at most prefetch pages are kept
+        in memory. The number of pages is told by the X-Total-Count
+        or Link header of the first page, without them pages are
+        fetched until a short one.
+
+        :param endpoint: str, resource endpoint
+        :param page_size: int, number of items per page
+        :param prefetch: int, number of pages fetched ahead
+        :param kwargs: additional params to every GET request
+        :return: generator, decoded items of the collection
+        :raises: requests.HTTPError if response code is not 2xx
+        """
+        _, items, pages = self._get_page(endpoint, 1, page_size,
+                                         dict(kwargs))
+        executor = self._get_executor()
+        pending = deque()
+        page = 1
+        try:
+            while True:
+                # NOTE: Without the number of pages the next ones are
+                #  fetched while the last fetched page is full, pages
+                #  after the end of the collection come back empty
+                while len(pending) < prefetch and \
+                        (page + len(pending) < pages if pages is not None
+                         else len(items) == page_size):
+                    pending.append(executor.submit(
+                        self._limited, self._get_page, endpoint,
+                        page + len(pending) + 1, page_size, dict(kwargs)))
+                for item in items:
+                    yield item
+                if (page >= pages if pages is not None
+                        else len(items) < page_size):
+                    break
+                page += 1
+                if pending:
+                    _, items, _ = pending.popleft().result()
+                else:
+                    _, items, _ = self._get_page(endpoint, page, page_size,
+                                                 dict(kwargs))
+        finally:
+            for future in pending:
+                future.cancel()
+
+    def _limited(self, func, *args, **kwargs):
+        """Call func of a batch when the limiter lets it through.
+
+        :param func: callable, returns tuple of status code or None
+        and body
+        :return: result of func
+        """
+        if self.limiter is None:
+            return func(*args, **kwargs)
+        # NOTE: Batched calls take the endpoint first, latency is tracked
+        #  per endpoint template
+        key = endpoint_template(args[0]) if args and \
+            isinstance(args[0], str) else None
+        start = self.limiter.acquire()
+        failed = True
+        try:
+            result = func(*args, **kwargs)
+            # NOTE: Bulk writes return no status code on connection errors
+            failed = result[0] is None or result[0] == 429 or \
+                result[0] >= 500
+            return result
+        finally:
+            self.limiter.release(start, failed, key)
+
+    def get_many(self, endpoints, **kwargs):
+        """Get many resources concurrently.
+
+        :param endpoints: iterable, resource endpoints
+        :param kwargs: additional params to every GET request
+        :return: list, tuples of status code and decoded json
+        in the order of given endpoints
+        """
+        executor = self._get_executor()
+        futures = [executor.submit(self._limited, self.get, endpoint,
+                                   **kwargs)
+                   for endpoint in endpoints]
+        return [future.result() for future in futures]
+
+    def _write_many(self, func, writes, window, kwargs):
+        return BulkWrite(self, func, writes,
+                         window or self.max_workers * 2, kwargs)
+
+    def post_many(self, writes, window=None, **kwargs):
+        """Create many resources concurrently.
+
+        :param writes: iterable, tuples of endpoint and json body
+        :param window: int, max number of requests submitted ahead of
+        the iterated results, twice max_workers by default
+        :param kwargs: additional params to every POST request
+        :return: BulkWrite, iterable over tuples of status code and
+        decoded json in the order of requests
+        """
+        return self._write_many(self.post, writes, window, kwargs)
+
+    def put_many(self, writes, window=None, **kwargs):
+        """Replace many resources concurrently, see post_many."""
+        return self._write_many(self.put, writes, window, kwargs)
+
+    def patch_many(self, writes, window=None, **kwargs):
+        """Update many resources concurrently, see post_many."""
+        return self._write_many(self.patch, writes, window, kwargs)
+
+    def delete_many(self, endpoints, window=None, **kwargs):
+        """Delete many resources concurrently, see post_many.
+
+        :param endpoints: iterable, resource endpoints
+        """
+        return self._write_many(
+            self.delete, ((endpoint, None) for endpoint in endpoints),
+            window, kwargs)
@@ -0,0 +1,99 @@
+import importlib
+import json
+
+
+class JSONCodec(object):
+    """Standard library JSON codec, used when no faster one is installed.
+
+    Every codec decodes bytes directly, without converting them to text
+    first, and raises ValueError if data is not valid JSON.
+    """
+
+    name = 'json'
+
+    def loads(self, data):
+        """Decode JSON document.
+
+        :param data: bytes or str, JSON document
+        :return: decoded object
+        """
+        return json.loads(data)
+
+    def dumps(self, obj):
+        """Encode object to JSON.
+
+        :param obj: object to encode
+        :return: bytes, UTF-8 encoded JSON document
+        """
+        return json.dumps(obj, separators=(',', ':')).encode('utf-8')
+
+
+class OrjsonCodec(JSONCodec):
+
+    name = 'orjson'
+
+    def __init__(self):
+        self._orjson = importlib.import_module('orjson')
+
+    def loads(self, data):
+        # NOTE: orjson.JSONDecodeError is a subclass of ValueError
+        return self._orjson.loads(data)
+
+    def dumps(self, obj):
+        return self._orjson.dumps(obj)
+
+
+class UjsonCodec(JSONCodec):
+
+    name = 'ujson'
+
+    def __init__(self):
+        self._ujson = importlib.import_module('ujson')
+
+    def loads(self, data):
+        # NOTE: ujson.JSONDecodeError of ujson 5 is a subclass of ValueError
+        return self._ujson.loads(data)
+
+    def dumps(self, obj):
+        return self._ujson.dumps(obj, ensure_ascii=False).encode('utf-8')
+
+
+class SimdjsonCodec(JSONCodec):
+
+    name = 'simdjson'
+
+    def __init__(self):
+        self._simdjson = importlib.import_module('simdjson')
+
+    def loads(self, data):
+        try:
+            return self._simdjson.loads(data)
+        except RuntimeError as e:
+            # NOTE: simdjson raises ValueError for invalid JSON but
+            #  RuntimeError for parser errors it has no mapping of
+            raise ValueError(str(e))
+
+
+# NOTE: Codecs from the fastest one
+CODECS = (OrjsonCodec, UjsonCodec, SimdjsonCodec, JSONCodec)
+
+
+def get_codec(name=None):
+    """Get JSON codec.
+
+    :param name: str, codec name: orjson, ujson, simdjson or json,
+    the fastest installed one by default
+    :return: JSONCodec
+    :raises: ImportError if requested codec is not installed
+    """
+    for codec_cls in CODECS:
+        if name is not None and codec_cls.name != name:
+            continue
+        try:
+            return codec_cls()
+        except ImportError:
+            if name is not None:
+                raise
+    if name is not None:
+        raise ValueError('Unknown JSON codec {!r}'.format(name))
+    return JSONCodec()
@@ -1,8 +1,289 @@
 import pytest
 
+from src.budget import LatencyBudgetPlugin
+from src.cache import ResponseCache
+from src.cassette import MODES, Cassette, CassetteAdapter
 from src.client import RESTAPIClient
+from src.dataset import REMOTE_URL
+from src.distribute import GROUP_MARKERS, DistributePlugin
+from src.limiter import AdaptiveLimiter
+from src.resilience import ResilientAdapter, RetryBudget
+from src.server import H2Server, LocalApp, LocalServer
+from src.snapshot import Snapshot
+from src.timing_report import TimingReportPlugin
+
+
+def pytest_addoption(parser):
+    group = parser.getgroup('jsonplaceholder')
+    group.addoption('--pool-size', type=int, default=10,
+                    help='max number of kept-alive connections per host')
+    group.addoption('--target', default='remote',
+                    help='tested service: "local" for the bundled '
+                         'stand-in server, "remote" for {} or any other '
+                         'base url'.format(REMOTE_URL))
+    group.addoption('--http2', action='store_true',
+                    help='multiplex requests over HTTP/2 connections, '
+                         'with --target local the stand-in server speaks '
+                         'cleartext HTTP/2')
+    group.addoption('--shard-by', choices=('marker', 'cost', 'case'),
+                    default=None,
+                    help='with -n NUM, send tests to workers by test group '
+                         'marker, by test function or by test case, the '
+                         'ones failed or the longest in previous runs first')
+    group.addoption('--order', choices=('file', 'cost'), default='file',
+                    help='run tests in file order or the ones failed in '
+                         'the previous run first, then the longest ones')
+    group.addoption('--cache-ttl', type=float, default=None,
+                    help='cache GET and OPTIONS responses for given number '
+                         'of seconds, disabled by default')
+    group.addoption('--cache-size', type=int, default=256,
+                    help='max number of cached responses')
+    group.addoption('--timing-report', default=None, metavar='PATH',
+                    help='time phases of every request and write their '
+                         'histograms per test and per endpoint to JSON '
+                         'report and junit XML properties')
+    group.addoption('--cassette', choices=MODES, default=None,
+                    help='"record" responses to the cassette file, '
+                         '"replay" them without sending requests or "auto" '
+                         'to replay recorded and record the others')
+    group.addoption('--cassette-file', default='jsonplaceholder.cassette',
+                    metavar='PATH', help='path of the cassette file')
+    group.addoption('--latency-baseline', default=None, metavar='PATH',
+                    help='file of p50/p95/p99 latency per test group and '
+                         'endpoint, tests slower than it fail')
+    group.addoption('--update-latency-baseline', action='store_true',
+                    help='write latencies of this run to the baseline file '
+                         'instead of comparing with it')
+    group.addoption('--latency-tolerance', type=float, default=0.5,
+                    help='allowed relative growth of p95 latency over the '
+                         'baseline (default 0.5)')
+    group.addoption('--latency-tolerance-ms', type=float, default=5.0,
+                    help='allowed absolute growth of p95 latency over the '
+                         'baseline in ms (default 5)')
+    group.addoption('--adaptive-concurrency', action='store_true',
+                    help='adjust the number of concurrent requests of '
+                         'batches by their latency and errors, up to '
+                         '--pool-size')
+    group.addoption('--retries', type=int, default=0,
+                    help='max number of retries of an idempotent request '
+                         'failed by a connection error or 5xx response, '
+                         'disabled by default')
+    group.addoption('--retry-backoff', type=float, default=0.05,
+                    help='seconds of the first retry backoff, every next '
+                         'one is up to twice as long (default 0.05)')
+    group.addoption('--retry-budget', type=float, default=0.2,
+                    help='max retries per sent request (default 0.2)')
+    group.addoption('--breaker-threshold', type=int, default=0,
+                    help='number of consecutive failures of a host after '
+                         'which its requests fail at once, disabled by '
+                         'default')
+    group.addoption('--breaker-reset', type=float, default=30.0,
+                    help='seconds requests fail at once before the host '
+                         'is probed again (default 30)')
+    group.addoption('--latency-min-samples', type=int, default=10,
+                    help='min number of calls of an endpoint template in '
+                         'a test group compared with the latency baseline '
+                         '(default 10)')
+    group.addoption('--latency-budget-mode', choices=('fail', 'xfail'),
+                    default='fail',
+                    help='report a test exceeding its latency budget as '
+                         'failed or as xfailed, a run exceeding the '
+                         'baseline fails only in the fail mode')
+
+
+def pytest_configure(config):
+    if config.getoption('cassette') in ('record', 'auto') and \
+            config.getoption('numprocesses', None):
+        raise pytest.UsageError(
+            'A cassette can not be recorded by several processes, '
+            'record it without -n')
+    for marker in GROUP_MARKERS:
+        config.addinivalue_line(
+            'markers', '{}: test group, groups are sharded across workers '
+                       'and kept in the latency baseline'.format(marker))
+    config.addinivalue_line(
+        'markers', 'no_cache: do not use cached responses in the test')
+    config.addinivalue_line(
+        'markers', 'latency_budget(ms): max p95 latency of client calls '
+                   'made by the test')
+    config.pluginmanager.register(DistributePlugin(config),
+                                  'jsonplaceholder-distribute')
+    if config.getoption('latency_baseline') or \
+            config.getoption('update_latency_baseline'):
+        config.pluginmanager.register(LatencyBudgetPlugin(config),
+                                      'jsonplaceholder-budget')
+    if config.getoption('timing_report'):
+        config.pluginmanager.register(
+            TimingReportPlugin(config, config.getoption('timing_report')),
+            'jsonplaceholder-timing')
+
+
+def pytest_collection_modifyitems(config, items):
+    # NOTE: Calls are timed only if needed, timing streams responses and
+    #  resolves host names by itself
+    if config.pluginmanager.has_plugin('jsonplaceholder-budget'):
+        return
+    if any(item.get_closest_marker('latency_budget') for item in items):
+        config.pluginmanager.register(LatencyBudgetPlugin(config),
+                                      'jsonplaceholder-budget')
+
+
+@pytest.fixture(scope='session')
+def base_url(request):
+    target = request.config.getoption('target')
+    if target == 'local' and \
+            request.config.getoption('cassette') == 'replay':
+        # NOTE: Host is not a part of a request key, so the stand-in
+        #  server is not needed to replay its responses
+        yield 'http://localhost/'
+    elif target == 'remote':
+        yield REMOTE_URL
+    elif target == 'local':
+        server_cls = H2Server if request.config.getoption('http2') \
+            else LocalServer
+        with server_cls() as server:
+            yield server.url
+    else:
+        yield target
+
+
+@pytest.fixture(scope='session')
+def local_url():
+    # NOTE: Stand-in server for tests of the client whatever --target is
+    with LocalServer() as server:
+        yield server.url
+
+
+@pytest.fixture(scope='session')
+def h2c_url():
+    with H2Server() as server:
+        yield server.url
 
 
 @pytest.fixture(scope='session')
-def client():
-    return RESTAPIClient('https://jsonplaceholder.typicode.com/')
+def flaky_url():
+    # NOTE: Stand-in server answering every third request by 503
+    with LocalServer(app=LocalApp(error_rate=0.3, seed=0)) as server:
+        yield server.url
+
+
+@pytest.fixture(scope='session')
+def slow_url():
+    # NOTE: Stand-in server answering in 50 ms, so requests overlap
+    with LocalServer(delay=0.05) as server:
+        yield server.url
+
+
+@pytest.fixture(scope='session')
+def client(request, base_url):
+    config = request.config
+    cache = None
+    if config.getoption('cache_ttl') is not None:
+        cache = ResponseCache(maxsize=config.getoption('cache_size'),
+                              ttl=config.getoption('cache_ttl'))
+    limiter = None
+    if config.getoption('adaptive_concurrency'):
+        limiter = AdaptiveLimiter(max_limit=config.getoption('pool_size'))
+    api_client = RESTAPIClient(base_url,
+                               pool_maxsize=config.getoption('pool_size'),
+                               cache=cache,
+                               http2=config.getoption('http2'),
+                               limiter=limiter)
+    resilience = None
+    if config.getoption('retries') or config.getoption('breaker_threshold'):
+        # NOTE: Retries are made below the cassette, so only the final
+        #  response of a request is recorded
+        resilience = ResilientAdapter(
+            api_client.adapter, max_retries=config.getoption('retries'),
+            backoff=config.getoption('retry_backoff'),
+            budget=RetryBudget(ratio=config.getoption('retry_budget')),
+            failure_threshold=config.getoption('breaker_threshold'),
+            reset_timeout=config.getoption('breaker_reset'))
+        api_client.mount(resilience)
+        config._resilience = resilience
+    cassette = None
+    if config.getoption('cassette'):
+        cassette = Cassette(config.getoption('cassette_file'),
+                            config.getoption('cassette'))
+        api_client.mount(CassetteAdapter(cassette, api_client.adapter))
+    for name in ('jsonplaceholder-timing', 'jsonplaceholder-budget'):
+        plugin = config.pluginmanager.get_plugin(name)
+        if plugin is not None:
+            api_client.add_timing_listener(plugin.record)
+    yield api_client
+    # NOTE: Pools are dropped on close, so keep stats for the summary
+    config._connection_stats = api_client.connection_stats()
+    if cache is not None:
+        config._cache_stats = cache.stats()
+    if resilience is not None:
+        config._retry_stats = resilience.retry_stats()
+    if limiter is not None:
+        config._concurrency_stats = limiter.stats()
+    config._coalesce_stats = api_client.coalesce_stats()
+    api_client.close()
+    if cassette is not None:
+        cassette.close()
+
+
+@pytest.fixture(autouse=True)
+def response_cache(request, client):
+    if client.cache is None or \
+            request.node.get_closest_marker('no_cache') is None:
+        yield client.cache
+        return
+    with client.cache.disabled() as cache:
+        yield cache
+
+
+@pytest.fixture(autouse=True)
+def retry_counters(request, client):
+    resilience = getattr(request.config, '_resilience', None)
+    if resilience is None:
+        yield None
+        return
+    before = resilience.retry_stats()
+    yield resilience
+    # NOTE: Tests of one process run one by one, so the difference is
+    #  made by calls of this test
+    after = resilience.retry_stats()
+    for name, value in sorted(after.items()):
+        if value != before[name]:
+            request.node.user_properties.append(
+                (name, value - before[name]))
+
+
+@pytest.fixture(scope='session')
+def snapshot(client):
+    return Snapshot.load(client)
+
+
+def pytest_terminal_summary(terminalreporter):
+    stats = getattr(terminalreporter.config, '_connection_stats', None)
+    if stats:
+        terminalreporter.write_line(
+            'HTTP connections: {connections} opened, {requests} requests, '
+            '{reused} reused'.format(**stats))
+    stats = getattr(terminalreporter.config, '_cache_stats', None)
+    if stats:
+        terminalreporter.write_line(
+            'Response cache: {hits} hits, {misses} misses, '
+            '{revalidations} revalidations, {invalidations} invalidations'
+            .format(**stats))
+    stats = getattr(terminalreporter.config, '_retry_stats', None)
+    if stats:
+        terminalreporter.write_line(
+            'Retries: {retries} retried, {budget_exhausted} refused by '
+            'budget, {failed} failed after retries, {breaker_opened} '
+            'circuits opened, {fast_failed} failed by open circuit'
+            .format(**stats))
+    stats = getattr(terminalreporter.config, '_coalesce_stats', None)
+    if stats and stats['coalesced']:
+        terminalreporter.write_line(
+            'Coalesced requests: {coalesced} waited for concurrent '
+            'identical ones'.format(**stats))
+    stats = getattr(terminalreporter.config, '_concurrency_stats', None)
+    if stats:
+        terminalreporter.write_line(
+            'Adaptive concurrency: limit {limit}, {completed} batched '
+            'requests, {failed} failed, {decreases} decreases'
+            .format(**stats))
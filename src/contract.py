@@ -0,0 +1,246 @@
+"""Integrity checks of whole resource collections.
+
+Collections of a Snapshot are checked column by column: ids are compared
+with the range 1..N at once, foreign keys are checked by one set
+difference with ids of the parent resource, and only when a check fails
+the column is scanned to report positions of the wrong values. Field
+types are expected to be checked before, e.g. by src.validation.
+"""
+import re
+from collections import namedtuple
+
+from src.dataset import PARENTS, RESOURCES
+from src.validation import SCHEMAS, json_type
+
+# NOTE: resource -> field -> pattern of the whole field value
+FORMATS = {
+    'comments': {'email': re.compile(r'[^@\s]+@[^@\s]+\.\w+')},
+    'photos': {'url': re.compile(r'https?://[^/\s]+/\S*'),
+               'thumbnailUrl': re.compile(r'https?://[^/\s]+/\S*')},
+    'users': {'email': re.compile(r'[^@\s]+@[^@\s]+\.\w+')}
+}
+
+Violation = namedtuple('Violation', 'path check detail')
+
+
+def _path(name, pos=None, field=None):
+    path = '$.{}'.format(name)
+    if pos is not None:
+        path += '[{}]'.format(pos)
+    if field is not None:
+        path += '.{}'.format(field)
+    return path
+
+
+def _sample(values, limit=5):
+    values = sorted(values)
+    text = ', '.join(map(str, values[:limit]))
+    if len(values) > limit:
+        text += ', ... {} more'.format(len(values) - limit)
+    return text
+
+
+def _not_string(collection, field, pos, value):
+    # NOTE: A missing field is None in a column
+    return Violation(_path(collection.name, pos, field), 'type',
+                     'expected string, got {}'.format(
+                         'null or missing' if value is None
+                         else json_type(value)))
+
+
+def check_ids(collection, count=None):
+    """Check ids are unique and go from 1 to number of resources in order.
+
+    :param collection: src.snapshot.Collection
+    :param count: int, expected number of resources
+    :return: list, Violation tuples
+    """
+    name = collection.name
+    ids = collection.column('id')
+    violations = []
+    if count is not None and len(ids) != count:
+        violations.append(Violation(_path(name), 'count', '{} != {}'.format(
+            len(ids), count)))
+    if ids == list(range(1, len(ids) + 1)):
+        return violations
+    seen = set()
+    for pos, resource_id in enumerate(ids):
+        if resource_id in seen:
+            violations.append(Violation(_path(name, pos, 'id'), 'unique',
+                                        'duplicate id {}'.format(
+                                            resource_id)))
+        seen.add(resource_id)
+    missing = set(range(1, len(ids) + 1)) - seen
+    if missing:
+        violations.append(Violation(_path(name), 'contiguous',
+                                    'missing ids {}'.format(
+                                        _sample(missing))))
+    elif len(seen) == len(ids):
+        violations.append(Violation(_path(name), 'ordered',
+                                    'resources are not ordered by id'))
+    return violations
+
+
+def check_references(snapshot, child):
+    """Check every foreign key of child resource refers to its parent.
+
+    :param snapshot: src.snapshot.Snapshot
+    :param child: str, child resource name like "comments"
+    :return: list, Violation tuples
+    """
+    parent, field = PARENTS[child]
+    column = snapshot[child].column(field)
+    orphans = set(column) - set(snapshot[parent].column('id'))
+    if not orphans:
+        return []
+    return [Violation(_path(child, pos, field), 'reference',
+                      '{} {} does not exist'.format(parent, value))
+            for pos, value in enumerate(column) if value in orphans]
+
+
+def check_not_empty(collection, field):
+    """Check string field is not empty in any resource.
+
+    A missing field or a value which is not a string is reported too.
+
+    :param collection: src.snapshot.Collection
+    :param field: str, field name
+    :return: list, Violation tuples
+    """
+    column = collection.column(field)
+    if set(map(type, column)) <= {str} and min(map(len, column), default=1):
+        return []
+    return [_not_string(collection, field, pos, value)
+            if not isinstance(value, str) else
+            Violation(_path(collection.name, pos, field), 'not_empty',
+                      'empty string')
+            for pos, value in enumerate(column)
+            if not isinstance(value, str) or not value]
+
+
+def check_format(collection, field, pattern):
+    """Check string field matches pattern in every resource.
+
+    Values which are not strings are skipped, check_not_empty reports
+    them.
+
+    :param collection: src.snapshot.Collection
+    :param field: str, field name
+    :param pattern: re.Pattern, pattern of the whole value
+    :return: list, Violation tuples
+    """
+    column = collection.column(field)
+    if set(map(type, column)) <= {str} and \
+            all(map(pattern.fullmatch, column)):
+        return []
+    return [Violation(_path(collection.name, pos, field), 'format',
+                      '{!r} does not match {!r}'.format(value,
+                                                        pattern.pattern))
+            for pos, value in enumerate(column)
+            if isinstance(value, str) and not pattern.fullmatch(value)]
+
+
+def check_embedded(parents, resource, child, snapshot=None):
+    """Check children embedded into parents of one expanded response.
+
+    A response of e.g. /posts?_embed=comments is checked at once instead
+    of requesting /posts/{id}/comments for every post.
+
+    :param parents: list, decoded parents with embedded children
+    :param resource: str, parent resource name like "posts"
+    :param child: str, embedded child resource name like "comments"
+    :param snapshot: src.snapshot.Snapshot, snapshot to check that every
+    child is embedded into its parent, optional
+    :return: list, Violation tuples
+    """
+    field = PARENTS[child][1]
+    violations = []
+    pairs = set()
+    for pos, parent in enumerate(parents):
+        children = parent.get(child)
+        if not isinstance(children, list):
+            violations.append(Violation(_path(resource, pos, child),
+                                        'embedded', 'no list of children'))
+            continue
+        for child_pos, item in enumerate(children):
+            if item.get(field) != parent['id']:
+                violations.append(Violation(
+                    _path(resource, pos,
+                          '{}[{}].{}'.format(child, child_pos, field)),
+                    'reference', '{!r} != parent id {!r}'.format(
+                        item.get(field), parent['id'])))
+            pairs.add((parent['id'], item.get('id')))
+    embedded = sum(len(parent.get(child) or ()) for parent in parents)
+    if embedded != len(pairs):
+        violations.append(Violation(_path(resource), 'unique',
+                                    '{} embedded more than once'.format(
+                                        child)))
+    if snapshot is not None:
+        parent_ids = set(parent['id'] for parent in parents)
+        collection = snapshot[child]
+        expected = set(pair for pair in zip(collection.column(field),
+                                            collection.column('id'))
+                       if pair[0] in parent_ids)
+        for check, ids in (('missing', expected - pairs),
+                           ('unexpected', pairs - expected)):
+            if ids:
+                violations.append(Violation(
+                    _path(resource), 'complete', '{} {} ids {}'.format(
+                        check, child, _sample(pair[1] for pair in ids))))
+    return violations
+
+
+def check_expanded(children, resource):
+    """Check parents expanded into children of one response.
+
+    :param children: list, decoded children of e.g. /comments?_expand=post
+    :param resource: str, child resource name like "comments"
+    :return: list, Violation tuples
+    """
+    field = PARENTS[resource][1]
+    name = field[:-2]
+    return [Violation(_path(resource, pos, name), 'expanded',
+                      'parent id {!r} != {} {!r}'.format(
+                          (item.get(name) or {}).get('id'), field,
+                          item.get(field)))
+            for pos, item in enumerate(children)
+            if not isinstance(item.get(name), dict) or
+            item[name].get('id') != item.get(field)]
+
+
+def check_integrity(snapshot, counts=None):
+    """Check all collections of snapshot and references between them.
+
+    :param snapshot: src.snapshot.Snapshot
+    :param counts: dict, resource name -> expected number of resources,
+    e.g. src.dataset.RESOURCES
+    :return: list, Violation tuples
+    """
+    counts = counts or {}
+    violations = []
+    for name in RESOURCES:
+        collection = snapshot[name]
+        violations.extend(check_ids(collection, counts.get(name)))
+        for field, expected in SCHEMAS[name].items():
+            if expected == 'string':
+                violations.extend(check_not_empty(collection, field))
+        for field, pattern in sorted(FORMATS.get(name, {}).items()):
+            violations.extend(check_format(collection, field, pattern))
+    for child in RESOURCES:
+        if child in PARENTS:
+            violations.extend(check_references(snapshot, child))
+    return violations
+
+
+def format_violations(violations, limit=10):
+    """Format violations for an assertion message.
+
+    :param violations: list, Violation tuples
+    :param limit: int, max number of listed violations
+    :return: str
+    """
+    lines = ['{}: {} check failed, {}'.format(*violation)
+             for violation in violations[:limit]]
+    if len(violations) > limit:
+        lines.append('... {} more'.format(len(violations) - limit))
+    return '\n'.join(lines)
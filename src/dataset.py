@@ -0,0 +1,145 @@
+import random
+from collections import OrderedDict
+
+
+# NOTE: Base url of the tested service
+REMOTE_URL = 'https://jsonplaceholder.typicode.com/'
+
+# NOTE: Cardinalities of its resources
+RESOURCES = OrderedDict([
+    ('posts', 100),
+    ('comments', 500),
+    ('albums', 100),
+    ('photos', 5000),
+    ('users', 10),
+    ('todos', 200)
+])
+
+# NOTE: Nested resources, child resource -> (parent resource, foreign key)
+PARENTS = {
+    'posts': ('users', 'userId'),
+    'comments': ('posts', 'postId'),
+    'albums': ('users', 'userId'),
+    'photos': ('albums', 'albumId'),
+    'todos': ('users', 'userId')
+}
+
+WORDS = (
+    'lorem ipsum dolor sit amet consectetur adipiscing elit sed do eiusmod '
+    'tempor incididunt ut labore et dolore magna aliqua enim ad minim '
+    'veniam quis nostrud exercitation ullamco laboris nisi aliquip ex ea '
+    'commodo consequat duis aute irure in reprehenderit voluptate velit '
+    'esse cillum fugiat nulla pariatur excepteur sint occaecat cupidatat '
+    'non proident sunt culpa qui officia deserunt mollit anim id est '
+    'laborum').split()
+
+
+def query_value(value):
+    """Convert field value to its query string representation.
+
+    :param value: field value of a resource
+    :return: str, value as it is passed to a filter, e.g. ?completed=true
+    """
+    if isinstance(value, bool):
+        return 'true' if value else 'false'
+    return str(value)
+
+
+def _sentence(rnd, min_words, max_words):
+    return ' '.join(rnd.choice(WORDS)
+                    for _ in range(rnd.randint(min_words, max_words)))
+
+
+def _text(rnd, lines):
+    return '\n'.join(_sentence(rnd, 6, 12) for _ in range(lines))
+
+
+def _make_user(rnd, user_id):
+    name = _sentence(rnd, 2, 2).title()
+    username = name.replace(' ', '.')
+    return {
+        'id': user_id,
+        'name': name,
+        'username': username,
+        'email': '{}@{}.biz'.format(username, rnd.choice(WORDS)),
+        'address': {
+            'street': _sentence(rnd, 2, 2).title(),
+            'suite': 'Apt. {}'.format(rnd.randint(100, 999)),
+            'city': rnd.choice(WORDS).title(),
+            'zipcode': '{:05d}-{:04d}'.format(rnd.randint(0, 99999),
+                                              rnd.randint(0, 9999)),
+            'geo': {
+                'lat': '{:.4f}'.format(rnd.uniform(-90, 90)),
+                'lng': '{:.4f}'.format(rnd.uniform(-180, 180))
+            }
+        },
+        'phone': '1-{}-{}-{}'.format(rnd.randint(200, 999),
+                                     rnd.randint(200, 999),
+                                     rnd.randint(1000, 9999)),
+        'website': '{}.org'.format(rnd.choice(WORDS)),
+        'company': {
+            'name': _sentence(rnd, 1, 2).title(),
+            'catchPhrase': _sentence(rnd, 3, 4).capitalize(),
+            'bs': _sentence(rnd, 3, 3)
+        }
+    }
+
+
+def _parent_id(child_id, child):
+    parent = PARENTS[child][0]
+    per_parent = RESOURCES[child] // RESOURCES[parent]
+    return (child_id - 1) // per_parent + 1
+
+
+def make_dataset(scale=1, seed=0):
+    """Make deterministic jsonplaceholder-like dataset.
+
+    Every resource has the same fields and the same number of children
+    per parent as the real service.
+
+    :param scale: int, multiplier of resource cardinalities
+    :param seed: int, seed of generated content
+    :return: dict, resource name -> list of resource dicts ordered by id
+    """
+    rnd = random.Random(seed)
+    count = {name: total * scale for name, total in RESOURCES.items()}
+    data = OrderedDict()
+    data['posts'] = [{
+        'userId': _parent_id(i, 'posts'),
+        'id': i,
+        'title': _sentence(rnd, 3, 8),
+        'body': _text(rnd, 4)
+    } for i in range(1, count['posts'] + 1)]
+    data['comments'] = [{
+        'postId': _parent_id(i, 'comments'),
+        'id': i,
+        'name': _sentence(rnd, 3, 6),
+        'email': '{}@{}.com'.format(rnd.choice(WORDS), rnd.choice(WORDS)),
+        'body': _text(rnd, 4)
+    } for i in range(1, count['comments'] + 1)]
+    data['albums'] = [{
+        'userId': _parent_id(i, 'albums'),
+        'id': i,
+        'title': _sentence(rnd, 2, 6)
+    } for i in range(1, count['albums'] + 1)]
+    photos = []
+    for i in range(1, count['photos'] + 1):
+        color = '{:06x}'.format(rnd.randint(0, 0xffffff))
+        photos.append({
+            'albumId': _parent_id(i, 'photos'),
+            'id': i,
+            'title': _sentence(rnd, 3, 8),
+            'url': 'https://via.placeholder.com/600/{}'.format(color),
+            'thumbnailUrl': 'https://via.placeholder.com/150/{}'.format(
+                color)
+        })
+    data['photos'] = photos
+    data['users'] = [_make_user(rnd, i)
+                     for i in range(1, count['users'] + 1)]
+    data['todos'] = [{
+        'userId': _parent_id(i, 'todos'),
+        'id': i,
+        'title': _sentence(rnd, 2, 6),
+        'completed': rnd.random() < 0.45
+    } for i in range(1, count['todos'] + 1)]
+    return data
@@ -0,0 +1,357 @@
+"""Distribution of test groups across pytest-xdist workers.
+
+Every worker is a separate process, so it gets its own session fixtures:
+its own pooled RESTAPIClient and, for --target local, its own stand-in
+server. Test reports are sent back to the master process which writes
+the single junit XML report.
+
+Duration of every test case and the cases failed in the last run are
+kept in the pytest cache. Work is handed out from the cases which failed
+last time, then from the longest ones (longest processing time first),
+so no worker is left with a long case at the end of the run.
+
+The master process does not collect tests, so the group markers of test
+functions are sent back by workers and kept in the cache as well. A test
+function not run before makes a work unit of its own until its group is
+known.
+"""
+import os
+from collections import OrderedDict, deque
+
+import pytest
+
+GROUP_MARKERS = ('default_endpoints', 'users', 'posts', 'comments',
+                 'albums', 'photos', 'todos')
+DURATIONS_KEY = 'jsonplaceholder/durations'
+FAILED_KEY = 'jsonplaceholder/failed'
+GROUPS_KEY = 'jsonplaceholder/groups'
+DESELECTED_KEY = 'jsonplaceholder/deselected'
+DEFAULT_COST = 0.01
+# NOTE: Test groups longer than total duration divided by number of
+#  workers times this are split, so there is enough work units to balance
+UNITS_PER_WORKER = 4
+
+
+def get_group(item):
+    """Get test group of collected test item.
+
+    :param item: pytest.Item, test item
+    :return: str, name of group marker or 'default'
+    """
+    for marker in item.iter_markers():
+        if marker.name in GROUP_MARKERS:
+            return marker.name
+    return 'default'
+
+
+def _function(nodeid):
+    # NOTE: All cases of a parametrized test share its function node id
+    return nodeid.split('[', 1)[0]
+
+
+def cost_key(nodeids, durations, failed):
+    """Get sort key putting failed and long tests first.
+
+    :param nodeids: iterable, node ids of tests run together
+    :param durations: dict, node id -> duration in seconds
+    :param failed: set, node ids of tests failed in the last run
+    :return: tuple, sort key
+    """
+    return (not any(nodeid in failed for nodeid in nodeids),
+            -sum(durations.get(nodeid, DEFAULT_COST) for nodeid in nodeids))
+
+
+def split_units(units, durations, workers):
+    """Split long work units into consecutive parts.
+
+    :param units: list, work units, lists of node ids
+    :param durations: dict, node id -> duration in seconds
+    :param workers: int, number of workers
+    :return: list, work units none of which is much longer than total
+    duration divided by workers times UNITS_PER_WORKER
+    """
+    costs = {nodeid: durations.get(nodeid, DEFAULT_COST)
+             for unit in units for nodeid in unit}
+    limit = sum(costs.values()) / (max(workers, 1) * UNITS_PER_WORKER)
+    parts = []
+    for unit in units:
+        part, cost = [], 0
+        for nodeid in unit:
+            if part and cost + costs[nodeid] > limit:
+                parts.append(part)
+                part, cost = [], 0
+            part.append(nodeid)
+            cost += costs[nodeid]
+        parts.append(part)
+    return parts
+
+
+def _is_worker(config):
+    return hasattr(config, 'workerinput') or hasattr(config, 'slaveinput')
+
+
+class GroupScheduling(object):
+    """xdist scheduler sending work units of tests to idle workers.
+
+    Every worker collects the same tests. Once all of them have, the
+    collection is split into work units by make_units and a worker gets
+    the next unit whenever at most two of its tests are left to run.
+    """
+
+    def __init__(self, config, make_units, log=None):
+        """Make scheduler.
+
+        :param config: pytest.Config
+        :param make_units: callable, takes list of collected node ids and
+        number of workers and returns work units, lists of node ids, in
+        the order they are handed out
+        :param log: xdist log producer
+        """
+        from xdist.remote import Producer
+        from xdist.workermanage import parse_tx_spec_config
+
+        self.config = config
+        self.make_units = make_units
+        self.log = log.groupsched if log is not None \
+            else Producer('groupsched')
+        self.numnodes = len(parse_tx_spec_config(config))
+        self.collection = None
+        self.collections = OrderedDict()
+        # NOTE: Node ids of tests sent to a worker and not run yet, in the
+        #  order they run
+        self.assigned = OrderedDict()
+        self.workqueue = deque()
+        self._indices = {}
+
+    @property
+    def nodes(self):
+        return list(self.assigned)
+
+    @property
+    def collection_is_completed(self):
+        return len(self.collections) >= self.numnodes
+
+    @property
+    def tests_finished(self):
+        # NOTE: A worker keeps its last test until it gets more or it is
+        #  shut down
+        return self.collection_is_completed and not self.workqueue and \
+            all(len(pending) < 2 for pending in self.assigned.values())
+
+    @property
+    def has_pending(self):
+        return bool(self.workqueue) or any(self.assigned.values())
+
+    def add_node(self, node):
+        assert node not in self.assigned
+        self.assigned[node] = []
+
+    def add_node_collection(self, node, collection):
+        from xdist.report import report_collection_diff
+
+        assert node in self.assigned
+        if self.collection_is_completed and collection != self.collection:
+            other = next(iter(self.collections))
+            self.log(report_collection_diff(
+                self.collection, collection, other.gateway.id,
+                node.gateway.id))
+            return
+        self.collections[node] = list(collection)
+
+    def mark_test_complete(self, node, item_index, duration=0):
+        self.assigned[node].remove(self.collections[node][item_index])
+        self._reschedule(node)
+
+    def mark_test_pending(self, item):
+        raise NotImplementedError()
+
+    def remove_pending_tests_from_node(self, node, indices):
+        raise NotImplementedError()
+
+    def remove_node(self, node):
+        """Remove worker which is shut down or crashed.
+
+        :return: str, node id of the test the worker crashed on or None
+        """
+        pending = self.assigned.pop(node)
+        if not pending:
+            return None
+        # NOTE: The other tests are run by other workers
+        if pending[1:]:
+            self.workqueue.appendleft(pending[1:])
+        for other in self.nodes:
+            self._reschedule(other)
+        return pending[0]
+
+    def _assign(self, node):
+        unit = self.workqueue.popleft()
+        self.assigned[node].extend(unit)
+        node.send_runtest_some([self._indices[nodeid] for nodeid in unit])
+
+    def _reschedule(self, node):
+        if node.shutting_down:
+            return
+        if not self.workqueue:
+            node.shutdown()
+            return
+        if len(self.assigned[node]) <= 2:
+            self._assign(node)
+
+    def _same_collections(self):
+        from xdist.report import report_collection_diff
+
+        collections = list(self.collections.items())
+        first, collection = collections[0]
+        same = True
+        for node, other in collections[1:]:
+            message = report_collection_diff(
+                collection, other, first.gateway.id, node.gateway.id)
+            if not message:
+                continue
+            same = False
+            self.log(message)
+            self.config.hook.pytest_collectreport(report=pytest.CollectReport(
+                nodeid=node.gateway.id, outcome='failed', longrepr=message,
+                result=[]))
+        return same
+
+    def schedule(self):
+        assert self.collection_is_completed
+        if self.collection is not None:
+            for node in self.nodes:
+                self._reschedule(node)
+            return
+        if not self._same_collections():
+            self.log('**Different tests collected, aborting run**')
+            return
+        self.collection = next(iter(self.collections.values()))
+        if not self.collection:
+            return
+        self._indices = {nodeid: index
+                         for index, nodeid in enumerate(self.collection)}
+        self.workqueue.extend(
+            self.make_units(self.collection, len(self.nodes)))
+        for node in self.nodes[len(self.workqueue):]:
+            self.log('Shutting down unused node {}'.format(node))
+            self.assigned.pop(node)
+            node.shutdown()
+        for node in self.nodes:
+            self._assign(node)
+        for node in self.nodes:
+            self._reschedule(node)
+
+
+class DistributePlugin(object):
+
+    def __init__(self, config):
+        self.config = config
+        self.shard_by = config.getoption('shard_by')
+        self.order = config.getoption('order')
+        self.cache = getattr(config, 'cache', None)
+        self.durations = {}
+        self.failed = set()
+        # NOTE: Function node id -> group, collected node ids and
+        #  deselected ones of this run
+        self.groups = {}
+        self.collected = set()
+        self.deselected = set()
+        if self.cache is not None:
+            self.durations = self.cache.get(DURATIONS_KEY, {})
+            self.failed = set(self.cache.get(FAILED_KEY, []))
+            self.groups = self.cache.get(GROUPS_KEY, {})
+
+    @pytest.hookimpl(tryfirst=True)
+    def pytest_collection_modifyitems(self, items):
+        if self.order == 'cost':
+            items.sort(key=lambda item: cost_key(
+                [item.nodeid], self.durations, self.failed))
+
+    def pytest_deselected(self, items):
+        self.deselected.update(item.nodeid for item in items)
+
+    def pytest_collection_finish(self, session):
+        self.collected.update(item.nodeid for item in session.items)
+        for item in session.items:
+            self.groups[_function(item.nodeid)] = get_group(item)
+
+    @pytest.hookimpl(optionalhook=True)
+    def pytest_xdist_node_collection_finished(self, node, ids):
+        self.collected.update(ids)
+
+    @pytest.hookimpl(optionalhook=True)
+    def pytest_testnodedown(self, node, error):
+        output = getattr(node, 'workeroutput', {})
+        self.groups.update(output.get(GROUPS_KEY, {}))
+        self.deselected.update(output.get(DESELECTED_KEY, []))
+
+    def make_units(self, nodeids, workers):
+        """Split collected tests into work units.
+
+        With shard_by='marker' a work unit is a test group, split if it
+        is too long for the number of workers, with shard_by='cost' it is
+        one test function with all its parameters, with shard_by='case'
+        it is one parametrized test case. Units are ordered from the ones
+        which failed last time, then from the longest one.
+
+        :param nodeids: list, collected node ids
+        :param workers: int, number of workers
+        :return: list, work units, lists of node ids
+        """
+        units = OrderedDict()
+        for nodeid in nodeids:
+            key = nodeid if self.shard_by == 'case' else _function(nodeid)
+            if self.shard_by == 'marker' and key in self.groups:
+                key = self.groups[key]
+            units.setdefault(key, []).append(nodeid)
+        units = list(units.values())
+        if self.shard_by == 'marker':
+            units = split_units(units, self.durations, workers)
+        return sorted(units, key=lambda unit: cost_key(
+            unit, self.durations, self.failed))
+
+    @pytest.hookimpl(tryfirst=True, optionalhook=True)
+    def pytest_xdist_make_scheduler(self, config, log):
+        if not self.shard_by:
+            return None
+        return GroupScheduling(config, self.make_units, log)
+
+    def pytest_runtest_logreport(self, report):
+        if _is_worker(self.config):
+            return
+        nodeid = report.nodeid
+        if report.when == 'setup':
+            self.durations[nodeid] = 0
+            self.failed.discard(nodeid)
+        self.durations[nodeid] = \
+            self.durations.get(nodeid, 0) + report.duration
+        if report.failed:
+            self.failed.add(nodeid)
+
+    def pytest_sessionfinish(self):
+        if _is_worker(self.config):
+            self.config.workeroutput[GROUPS_KEY] = self.groups
+            self.config.workeroutput[DESELECTED_KEY] = \
+                sorted(self.deselected)
+            return
+        if self.cache is None:
+            return
+        seen = self.collected | self.deselected
+        functions = set(map(_function, seen))
+        paths = {nodeid.split('::', 1)[0] for nodeid in seen}
+
+        def exists(nodeid):
+            # NOTE: A test not collected from a collected file is gone and
+            #  so is a test of a removed file
+            path = nodeid.split('::', 1)[0]
+            return path not in paths and os.path.exists(
+                os.path.join(str(self.config.rootpath), path))
+
+        self.cache.set(DURATIONS_KEY, {
+            nodeid: duration for nodeid, duration in self.durations.items()
+            if nodeid in seen or exists(nodeid)})
+        self.cache.set(FAILED_KEY, sorted(
+            nodeid for nodeid in self.failed
+            if nodeid in seen or exists(nodeid)))
+        self.cache.set(GROUPS_KEY, {
+            function: group for function, group in self.groups.items()
+            if function in functions or exists(function)})
@@ -0,0 +1,466 @@
+"""Generated requests checked against the expected response codes.
+
+Cases are derived from resource cardinalities and required fields the
+same way the parametrize tables are written: ids around the boundaries
+0, 1, N and N + 1, filters, nested resources and bodies with valid,
+missing or unknown foreign keys. Cases are generated lazily and sent by
+a bounded number of concurrent requests, so a run of any size takes
+constant memory. A failed case is shrunk to a smaller one which still
+fails, e.g.:
+
+    python -m src.fuzz --target local --cases 100000 --concurrency 64
+"""
+import argparse
+import asyncio
+import contextlib
+import json
+import random
+import string
+import time
+from collections import Counter, namedtuple
+from itertools import islice
+from urllib.parse import parse_qs, urlencode
+
+from src.async_client import AsyncRESTAPIClient
+from src.dataset import PARENTS, REMOTE_URL, RESOURCES
+from src.server import LocalServer
+from src.validation import SCHEMAS
+
+# NOTE: child -> path of nested resource is /<parent>/<id>/<child>
+CHILDREN = {parent: [child for child, (name, _) in sorted(PARENTS.items())
+                     if name == parent]
+            for parent in RESOURCES}
+
+Case = namedtuple('Case', 'method resource resource_id child query data')
+Case.__new__.__defaults__ = (None, None, None, None)
+
+Failure = namedtuple('Failure', 'case expected_code status shrunk')
+
+
+def _to_id(value):
+    try:
+        return int(value)
+    except (TypeError, ValueError):
+        return None
+
+
+def case_kind(case):
+    """Get kind of case named like test functions, e.g. "create"."""
+    if case.method == 'GET':
+        return 'get' if case.resource_id is not None and \
+            case.child is None else 'filter'
+    return {'POST': 'create', 'PUT': 'update', 'PATCH': 'update',
+            'DELETE': 'delete'}[case.method]
+
+
+def case_endpoint(case):
+    """Make endpoint of case, e.g. /users/1/posts?id=2."""
+    segments = [case.resource]
+    if case.resource_id is not None:
+        segments.append(str(case.resource_id))
+    if case.child is not None:
+        segments.append(case.child)
+    endpoint = '/' + '/'.join(segments)
+    if case.query:
+        endpoint += '?' + urlencode(case.query, doseq=True)
+    return endpoint
+
+
+def endpoint_case(method, endpoint, data=None):
+    """Make case of request, e.g. from a row of a parametrize table.
+
+    :param method: str, HTTP method
+    :param endpoint: str, endpoint like /users/1/posts?id=2
+    :param data: dict, body of request
+    :return: Case
+    """
+    path, _, query = endpoint.partition('?')
+    segments = path.strip('/').split('/') + [None, None]
+    return Case(method, segments[0], segments[1], segments[2],
+                parse_qs(query) or None, data)
+
+
+def expected_code(case, counts=RESOURCES):
+    """Get response code expected by the tests for case.
+
+    The rules generalize the rows of the parametrize tables of the
+    test_*_actions modules, e.g. ids 0 and N + 1 get 404 and a body with
+    an id gets 400, test_fuzz checks they agree with every row.
+
+    :param case: Case
+    :param counts: dict, resource name -> number of resources
+    :return: int
+    """
+    def exists(resource, value):
+        resource_id = _to_id(value)
+        return resource_id is not None and 1 <= resource_id <= \
+            counts[resource]
+
+    def valid_body(resource, data):
+        if not data or 'id' in data:
+            return False
+        parent, key = PARENTS.get(resource, (None, None))
+        return key not in data or exists(parent, data[key])
+
+    if case.resource_id is None:
+        if case.method == 'GET':
+            return 200
+        if case.method != 'POST':
+            return 404
+        key = PARENTS.get(case.resource, (None, None))[1]
+        if not valid_body(case.resource, case.data) or \
+                (key is not None and key not in case.data):
+            return 400
+        return 201
+    if case.child is not None:
+        if case.method not in ('GET', 'POST') or \
+                not exists(case.resource, case.resource_id):
+            return 404
+        if case.method == 'POST' and \
+                not valid_body(case.child, case.data):
+            return 400
+        return 201 if case.method == 'POST' else 200
+    if case.method == 'POST':
+        return 400
+    if not exists(case.resource, case.resource_id):
+        return 404
+    if case.method in ('PUT', 'PATCH') and \
+            not valid_body(case.resource, case.data):
+        return 400
+    return 200
+
+
+class CaseGenerator(object):
+
+    def __init__(self, seed=None, counts=RESOURCES):
+        """Make generator of random cases.
+
+        :param seed: int, seed of generated cases
+        :param counts: dict, resource name -> number of resources
+        """
+        self.rnd = random.Random(seed)
+        self.counts = counts
+
+    def __iter__(self):
+        while True:
+            yield self.case()
+
+    def resource_id(self, resource):
+        """Get id near a boundary of resource ids or any existing one."""
+        count = self.counts[resource]
+        return self.rnd.choice((
+            0, 1, count, count + 1, self.rnd.randint(1, count),
+            self.rnd.randint(count + 2, count * 10 + 2), -1))
+
+    def _value(self, expected):
+        if isinstance(expected, dict):
+            return {field: self._value(value)
+                    for field, value in expected.items()}
+        if expected == 'integer':
+            return self.rnd.randint(0, 1000)
+        if expected == 'boolean':
+            return self.rnd.random() < 0.5
+        return ''.join(self.rnd.choice(string.ascii_letters + ' ')
+                       for _ in range(self.rnd.randint(0, 12)))
+
+    def data(self, resource):
+        """Make body of resource: some of its fields, maybe invalid."""
+        rnd = self.rnd
+        data = {field: self._value(expected)
+                for field, expected in SCHEMAS[resource].items()
+                if field != 'id' and rnd.random() < 0.7}
+        parent, key = PARENTS.get(resource, (None, None))
+        if key in data:
+            # NOTE: Foreign keys are sent as numbers and strings
+            parent_id = self.resource_id(parent)
+            data[key] = str(parent_id) if rnd.random() < 0.5 else parent_id
+        if rnd.random() < 0.1:
+            data['id'] = self.resource_id(resource)
+        if rnd.random() < 0.05:
+            data = {}
+        return data
+
+    def case(self):
+        """Make random case."""
+        rnd = self.rnd
+        resource = rnd.choice(list(self.counts))
+        kind = rnd.choice(('get', 'filter', 'nested', 'create', 'update',
+                           'delete'))
+        if kind == 'nested' and CHILDREN[resource]:
+            child = rnd.choice(CHILDREN[resource])
+            method = rnd.choice(('GET', 'POST'))
+            return Case(method, resource, self.resource_id(resource), child,
+                        data=self.data(child) if method == 'POST' else None)
+        if kind == 'filter':
+            field = PARENTS[resource][1] if resource in PARENTS and \
+                rnd.random() < 0.7 else 'id'
+            target = PARENTS[resource][0] if field != 'id' else resource
+            values = [self.resource_id(target)
+                      for _ in range(rnd.randint(1, 3))]
+            return Case('GET', resource, query={field: values})
+        if kind == 'create':
+            if rnd.random() < 0.1:
+                return Case('POST', resource, self.resource_id(resource),
+                            data=self.data(resource))
+            return Case('POST', resource, data=self.data(resource))
+        if kind == 'update':
+            return Case(rnd.choice(('PUT', 'PATCH')), resource,
+                        self.resource_id(resource),
+                        data=self.data(resource))
+        method = 'DELETE' if kind == 'delete' else 'GET'
+        return Case(method, resource, self.resource_id(resource))
+
+
+def case_size(case):
+    """Get size of case, a shrunk case is strictly smaller."""
+    def size(value):
+        if isinstance(value, dict):
+            return sum(1 + size(item) for item in value.values())
+        if isinstance(value, str):
+            return len(value)
+        if isinstance(value, bool):
+            return 0
+        if isinstance(value, int):
+            return abs(value)
+        return 1
+    return (size(case.data or {}) + size(case.query or {}) +
+            (0 if case.child is None else 1) +
+            size(_to_id(case.resource_id) or 0))
+
+
+def shrink_candidates(case, counts=RESOURCES):
+    """Make cases simpler than case, simplest ones first."""
+    candidates = []
+    if case.child is not None:
+        candidates.append(case._replace(child=None, data=None))
+    for field in case.query or ():
+        values = case.query[field]
+        if len(values) > 1:
+            candidates.extend(
+                case._replace(query=dict(case.query, **{
+                    field: values[:pos] + values[pos + 1:]}))
+                for pos in range(len(values)))
+    for field, value in sorted((case.data or {}).items()):
+        rest = dict(case.data)
+        del rest[field]
+        candidates.append(case._replace(data=rest))
+        if isinstance(value, dict) and value:
+            candidates.append(case._replace(data=dict(case.data,
+                                                      **{field: {}})))
+        elif isinstance(value, str) and len(value) > 1:
+            candidates.append(case._replace(data=dict(
+                case.data, **{field: value[:len(value) // 2]})))
+    resource_id = _to_id(case.resource_id)
+    if resource_id is not None:
+        count = counts[case.resource]
+        # NOTE: Move id to the nearest boundary: 0, 1, N or N + 1
+        for boundary in (0, 1, count, count + 1):
+            if abs(boundary) < abs(resource_id):
+                candidates.append(case._replace(resource_id=boundary))
+                middle = (boundary + resource_id) // 2
+                if abs(boundary) < abs(middle) < abs(resource_id):
+                    candidates.append(case._replace(resource_id=middle))
+    size = case_size(case)
+    # NOTE: Different shrinks may give the same case, e.g. the middle id
+    #  between N and 2N is N as well
+    unique = []
+    seen = set()
+    for candidate in candidates:
+        key = (candidate.method, case_endpoint(candidate),
+               None if candidate.data is None
+               else json.dumps(candidate.data, sort_keys=True))
+        if case_size(candidate) < size and key not in seen:
+            seen.add(key)
+            unique.append(candidate)
+    return unique
+
+
+class Fuzzer(object):
+
+    def __init__(self, client, counts=RESOURCES, max_failures=10,
+                 max_shrinks=100):
+        """Send cases and shrink failed ones.
+
+        :param client: AsyncRESTAPIClient, client of the tested service
+        :param counts: dict, resource name -> number of resources
+        :param max_failures: int, max number of shrunk failures kept,
+        failures above it are only counted
+        :param max_shrinks: int, max number of shrink rounds per failure
+        """
+        self.client = client
+        self.counts = counts
+        self.max_failures = max_failures
+        self.max_shrinks = max_shrinks
+        self.failures = []
+        self.sent = 0
+        self.failed = 0
+        self.codes = Counter()
+        self.started = self.finished = None
+
+    async def send(self, case):
+        """Send case.
+
+        :return: int, response code or None if request failed
+        """
+        kwargs = {} if case.data is None else {'json': case.data}
+        self.sent += 1
+        try:
+            status, _ = await self.client._request(
+                case.method, case_endpoint(case), **kwargs)
+        except Exception:
+            status = None
+        return status
+
+    async def _fails(self, case):
+        return await self.send(case) != expected_code(case, self.counts)
+
+    async def shrink(self, case):
+        """Shrink failed case while it fails.
+
+        Candidates of every round are sent concurrently, the simplest
+        failing one is taken for the next round.
+
+        :param case: Case, failed case
+        :return: Case, the simplest found failed case
+        """
+        for _ in range(self.max_shrinks):
+            candidates = shrink_candidates(case, self.counts)
+            if not candidates:
+                break
+            results = await asyncio.gather(*map(self._fails, candidates))
+            failed = [candidate for candidate, fails
+                      in zip(candidates, results) if fails]
+            if not failed:
+                break
+            case = failed[0]
+        return case
+
+    async def check(self, case):
+        expected = expected_code(case, self.counts)
+        status = await self.send(case)
+        self.codes[expected] += 1
+        if status == expected:
+            return
+        self.failed += 1
+        if len(self.failures) >= self.max_failures:
+            return
+        failure = Failure(case, expected, status, None)
+        self.failures.append(failure)
+        shrunk = await self.shrink(case)
+        self.failures[self.failures.index(failure)] = failure._replace(
+            shrunk=shrunk)
+
+    async def run(self, cases, concurrency=64):
+        """Check cases keeping at most concurrency of them in flight.
+
+        :param cases: iterable, Case tuples, e.g. an endless CaseGenerator
+        sliced by itertools.islice
+        :param concurrency: int, max number of cases in flight
+        :return: list, Failure tuples
+        """
+        loop = asyncio.get_event_loop()
+        pending = set()
+        self.started = time.perf_counter()
+        try:
+            for case in cases:
+                if len(pending) >= concurrency:
+                    done, pending = await asyncio.wait(
+                        pending, return_when=asyncio.FIRST_COMPLETED)
+                    # NOTE: Raise an error of a check instead of losing it
+                    for task in done:
+                        task.result()
+                pending.add(loop.create_task(self.check(case)))
+            while pending:
+                done, pending = await asyncio.wait(
+                    pending, return_when=asyncio.FIRST_COMPLETED)
+                for task in done:
+                    task.result()
+        finally:
+            for task in pending:
+                task.cancel()
+            self.finished = time.perf_counter()
+        return self.failures
+
+    def report(self):
+        """Make report of the run.
+
+        :return: str, number of cases, throughput and shrunk failures
+        """
+        checked = sum(self.codes.values())
+        elapsed = (self.finished - self.started) or 1e-9
+        lines = ['{} cases, {} failed, {} requests, {:.1f} req/s'.format(
+            checked, self.failed, self.sent, self.sent / elapsed),
+            'expected codes: {}'.format(', '.join(
+                '{} x{}'.format(code, number)
+                for code, number in sorted(self.codes.items())))]
+        for failure in self.failures:
+            shrunk = failure.shrunk or failure.case
+            lines.append('{} {} {}: expected {}, got {} (shrunk from {} {} '
+                         '{})'.format(
+                             shrunk.method, case_endpoint(shrunk),
+                             shrunk.data if shrunk.data is not None else '',
+                             expected_code(shrunk, self.counts),
+                             failure.status, failure.case.method,
+                             case_endpoint(failure.case),
+                             failure.case.data
+                             if failure.case.data is not None else ''))
+        return '\n'.join(lines)
+
+
+def run_fuzz(url, cases, seed=None, concurrency=64, max_failures=10):
+    """Check generated cases from synchronous code.
+
+    :param url: str, base url of the REST API
+    :param cases: int, number of cases
+    :param seed: int, seed of generated cases
+    :param concurrency: int, max number of cases in flight
+    :param max_failures: int, max number of shrunk failures
+    :return: Fuzzer, finished fuzzer with failures and report
+    """
+    async def _run():
+        # NOTE: Every generated request must reach the service
+        async with AsyncRESTAPIClient(url, concurrency,
+                                      coalesce=False) as client:
+            fuzzer = Fuzzer(client, max_failures=max_failures)
+            await fuzzer.run(islice(CaseGenerator(seed), cases),
+                             concurrency)
+            return fuzzer
+
+    loop = asyncio.new_event_loop()
+    try:
+        return loop.run_until_complete(_run())
+    finally:
+        loop.close()
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(
+        description=__doc__.splitlines()[0],
+        formatter_class=argparse.RawDescriptionHelpFormatter,
+        epilog='\n'.join(__doc__.splitlines()[1:]))
+    parser.add_argument('--target', default='local',
+                        help='"local", "remote" or any base url')
+    parser.add_argument('--cases', type=int, default=10000,
+                        help='number of generated cases')
+    parser.add_argument('--concurrency', type=int, default=64,
+                        help='max number of cases in flight')
+    parser.add_argument('--max-failures', type=int, default=10,
+                        help='max number of shrunk failures')
+    parser.add_argument('--seed', type=int, default=None)
+    args = parser.parse_args(argv)
+
+    with contextlib.ExitStack() as stack:
+        if args.target == 'local':
+            url = stack.enter_context(LocalServer()).url
+        elif args.target == 'remote':
+            url = REMOTE_URL
+        else:
+            url = args.target
+        fuzzer = run_fuzz(url, args.cases, args.seed, args.concurrency,
+                          args.max_failures)
+    print(fuzzer.report())
+    return 1 if fuzzer.failed else 0
+
+
+if __name__ == '__main__':
+    raise SystemExit(main())
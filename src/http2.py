@@ -0,0 +1,218 @@
+"""HTTP/2 transport of RESTAPIClient.
+
+Concurrent requests, e.g. of RESTAPIClient.get_many, are multiplexed as
+streams of one connection instead of taking a connection each. Plain
+http urls are requested with prior knowledge (h2c), so the server must
+speak HTTP/2 without an upgrade, like src.server.H2Server does.
+"""
+import asyncio
+import io
+import os
+import ssl
+import threading
+import time
+
+import httpx
+from requests import ConnectionError, Response
+from requests.adapters import BaseAdapter
+from requests.structures import CaseInsensitiveDict
+from requests.utils import (DEFAULT_CA_BUNDLE_PATH,
+                            get_encoding_from_headers, select_proxy)
+
+from src.timing import current_timing
+
+# NOTE: Connection specific headers are not allowed in HTTP/2
+HOP_BY_HOP_HEADERS = ('connection', 'keep-alive', 'proxy-connection',
+                      'transfer-encoding', 'upgrade')
+
+# NOTE: httpcore trace events -> timing phases
+TRACE_PHASES = {
+    'connection.connect_tcp': 'connect',
+    'connection.start_tls': 'tls',
+    'http2.receive_response_headers': 'ttfb'
+}
+
+
+def _ssl_context(verify, cert):
+    """Make SSL context of requests verify and cert arguments."""
+    if verify is False:
+        context = ssl.create_default_context()
+        context.check_hostname = False
+        context.verify_mode = ssl.CERT_NONE
+    elif verify is True:
+        context = ssl.create_default_context(cafile=DEFAULT_CA_BUNDLE_PATH)
+    elif os.path.isdir(verify):
+        context = ssl.create_default_context(capath=verify)
+    else:
+        context = ssl.create_default_context(cafile=verify)
+    if isinstance(cert, str):
+        context.load_cert_chain(cert)
+    elif cert:
+        context.load_cert_chain(*cert)
+    return context
+
+
+class _ResponseStream(io.RawIOBase):
+    """File-like body of httpx response, read by requests.Response."""
+
+    def __init__(self, adapter, response):
+        self._adapter = adapter
+        self._response = response
+        self._chunks = response.aiter_bytes()
+        self._buffer = b''
+
+    def readable(self):
+        return True
+
+    def readinto(self, buffer):
+        while not self._buffer:
+            self._buffer = self._adapter._run(self._next_chunk())
+            if self._buffer is None:
+                self._buffer = b''
+                return 0
+        size = min(len(buffer), len(self._buffer))
+        buffer[:size] = self._buffer[:size]
+        self._buffer = self._buffer[size:]
+        return size
+
+    async def _next_chunk(self):
+        try:
+            return await self._chunks.__anext__()
+        except StopAsyncIteration:
+            return None
+
+    def close(self):
+        if not self.closed:
+            self._adapter._run(self._response.aclose())
+        super(_ResponseStream, self).close()
+
+
+class HTTP2Adapter(BaseAdapter):
+
+    def __init__(self, max_connections=1):
+        """Transport adapter sending requests over HTTP/2.
+
+        :param max_connections: int, max number of connections per host,
+        a new one is opened only when a server limits the number
+        of concurrent streams
+        """
+        super(HTTP2Adapter, self).__init__()
+        self.connections = self.requests = 0
+        self._lock = threading.Lock()
+        # NOTE: Requests of all threads are sent by the asyncio client from
+        #  one event loop, the sync client of httpx may send streams of
+        #  concurrent threads out of order which breaks the connection
+        self._loop = asyncio.new_event_loop()
+        self._thread = threading.Thread(target=self._loop.run_forever,
+                                        daemon=True)
+        self._thread.start()
+        self._limits = httpx.Limits(
+            max_connections=max_connections,
+            max_keepalive_connections=max_connections)
+        # NOTE: TLS settings and proxy are options of a httpx client, so
+        #  there is one per their combination
+        self._clients = {}
+        self._clients_lock = threading.Lock()
+
+    def get_client(self, verify=True, cert=None, proxy=None):
+        """Get httpx client of TLS settings and proxy.
+
+        :param verify: boolean or str, verify server certificate by
+        default CA bundle, skip verification or path of CA bundle file
+        or directory, like verify of requests
+        :param cert: str or tuple, path of client certificate file or
+        tuple of certificate and key paths
+        :param proxy: str, url of proxy
+        :return: httpx.AsyncClient
+        """
+        key = (verify, cert, proxy)
+        # NOTE: Not the lock of counters, traces take it in the loop thread
+        with self._clients_lock:
+            if key not in self._clients:
+                self._clients[key] = self._run(
+                    self._make_client(_ssl_context(verify, cert), proxy))
+            return self._clients[key]
+
+    async def _make_client(self, ssl_context, proxy):
+        # NOTE: requests has already merged proxies of the environment
+        return httpx.AsyncClient(http1=False, http2=True,
+                                 limits=self._limits, timeout=None,
+                                 verify=ssl_context, proxy=proxy,
+                                 trust_env=False)
+
+    def _run(self, coro):
+        return asyncio.run_coroutine_threadsafe(coro, self._loop).result()
+
+    def _trace(self, timing):
+        started = {}
+
+        async def trace(name, info):
+            event, _, stage = name.rpartition('.')
+            if stage == 'started':
+                started[event] = time.perf_counter()
+            elif stage == 'complete':
+                if event == 'connection.connect_tcp':
+                    with self._lock:
+                        self.connections += 1
+                phase = TRACE_PHASES.get(event)
+                if timing is not None and phase and event in started:
+                    timing.add(phase, time.perf_counter() - started[event])
+
+        return trace
+
+    def send(self, request, stream=False, timeout=None, verify=True,
+             cert=None, proxies=None):
+        headers = [(name, value) for name, value in request.headers.items()
+                   if name.lower() not in HOP_BY_HOP_HEADERS]
+        if isinstance(timeout, tuple):
+            timeout = httpx.Timeout(None, connect=timeout[0],
+                                    read=timeout[1])
+        client = self.get_client(verify, cert,
+                                 select_proxy(request.url, proxies or {}))
+        hx_request = client.build_request(
+            request.method, request.url, headers=headers,
+            content=request.body, timeout=timeout,
+            extensions={'trace': self._trace(current_timing())})
+        with self._lock:
+            self.requests += 1
+        try:
+            hx_response = self._run(self._send(client, hx_request, stream))
+        except httpx.TransportError as exc:
+            raise ConnectionError(exc, request=request)
+        return self.build_response(request, hx_response)
+
+    async def _send(self, client, hx_request, stream):
+        hx_response = await client.send(hx_request, stream=True)
+        if not stream:
+            # NOTE: Read the body within the same call to the loop thread
+            #  instead of chunk by chunk
+            await hx_response.aread()
+        return hx_response
+
+    def build_response(self, request, hx_response):
+        resp = Response()
+        resp.status_code = hx_response.status_code
+        resp.reason = hx_response.reason_phrase
+        resp.headers = CaseInsensitiveDict(hx_response.headers.items())
+        resp.encoding = get_encoding_from_headers(resp.headers)
+        if hx_response.is_stream_consumed:
+            resp.raw = io.BytesIO(hx_response.content)
+        else:
+            resp.raw = _ResponseStream(self, hx_response)
+        resp.url = request.url
+        resp.request = request
+        resp.connection = self
+        return resp
+
+    def connection_stats(self):
+        """Get number of opened connections and sent requests."""
+        return {'connections': self.connections, 'requests': self.requests}
+
+    def close(self):
+        if self._loop.is_closed():
+            return
+        for client in self._clients.values():
+            self._run(client.aclose())
+        self._loop.call_soon_threadsafe(self._loop.stop)
+        self._thread.join()
+        self._loop.close()
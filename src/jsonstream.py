@@ -0,0 +1,82 @@
+import codecs
+import json
+import re
+
+WHITESPACE = re.compile(r'[ \t\n\r]*')
+
+_START, _FIRST, _NEXT, _SEPARATOR, _END, _DOCUMENT = range(6)
+
+
+def iter_items(chunks):
+    """Decode JSON array incrementally.
+
+    Items are yielded as soon as they are received, so only one item
+    and the undecoded tail of the last chunk are kept in memory.
+    A document which is not an array is yielded as a single item.
+
+    :param chunks: iterable, chunks of UTF-8 encoded JSON document
+    :return: generator, decoded items
+    """
+    decoder = json.JSONDecoder()
+    text_decoder = codecs.getincrementaldecoder('utf-8')()
+    state = _START
+    buf = ''
+    for chunk in _with_end(chunks):
+        if chunk is None:
+            buf += text_decoder.decode(b'', final=True)
+        else:
+            buf += text_decoder.decode(chunk)
+        if state == _DOCUMENT:
+            continue
+        final = chunk is None
+        pos = 0
+        while True:
+            pos = WHITESPACE.match(buf, pos).end()
+            if pos == len(buf):
+                break
+            if state == _START:
+                if buf[pos] != '[':
+                    state = _DOCUMENT
+                    break
+                state = _FIRST
+                pos += 1
+            elif state == _SEPARATOR or (state == _FIRST and
+                                         buf[pos] == ']'):
+                if buf[pos] == ']':
+                    state = _END
+                elif buf[pos] == ',':
+                    state = _NEXT
+                else:
+                    raise ValueError(
+                        'Expecting "," or "]" at {!r}'.format(buf[pos:][:20]))
+                pos += 1
+            elif state in (_FIRST, _NEXT):
+                try:
+                    item, end = decoder.raw_decode(buf, pos)
+                except ValueError:
+                    if final:
+                        raise
+                    break
+                # NOTE: A number at the end of received data may continue
+                #  in the next chunk, e.g. 1 of 1.5
+                if not final and isinstance(item, (int, float)) and \
+                        (end == len(buf) or buf[end] not in ' \t\n\r,]'):
+                    break
+                yield item
+                state = _SEPARATOR
+                pos = end
+            else:
+                raise ValueError(
+                    'Extra data {!r} after JSON array'.format(buf[pos:][:20]))
+        buf = buf[pos:]
+    if state == _DOCUMENT:
+        yield json.loads(buf)
+    elif state != _END:
+        raise ValueError('JSON array is not complete')
+
+
+def _with_end(chunks):
+    for chunk in chunks:
+        if chunk:
+            yield chunk
+    yield None
@@ -0,0 +1,134 @@
+"""Adaptive limit of requests in flight.
+
+The limit grows while responses are as fast as usual and shrinks when
+they slow down or fail (AIMD like TCP congestion control), so concurrent
+requests keep the tested service busy without queueing in front of it
+whatever its capacity is. The usual latency is tracked per endpoint
+template, so a slow endpoint like /photos does not look like congestion
+next to a fast one.
+"""
+import threading
+import time
+from collections import deque
+
+# NOTE: Multiplier of the usual latency of an endpoint on each response
+DRIFT = 1.0002
+
+
+class AdaptiveLimiter(object):
+
+    def __init__(self, initial=4, min_limit=1, max_limit=64, backoff=0.9,
+                 tolerance=1.5, jitter=0.02, smoothing=0.1, window=1.0):
+        """Make limiter.
+
+        :param initial: int, limit of the first requests
+        :param min_limit: int, min limit
+        :param max_limit: int, max limit, should not exceed the number
+        of threads or connections sending requests
+        :param backoff: float, multiplier of the limit on congestion
+        :param tolerance: float, recent latency of an endpoint above its
+        usual latency times tolerance plus jitter means congestion
+        :param jitter: float, seconds of latency variation which is never
+        taken for congestion
+        :param smoothing: float, weight of a new latency in the moving
+        average of the recent latency
+        :param window: float, seconds throughput is measured over
+        """
+        self.limit = float(initial)
+        self.min_limit = min_limit
+        self.max_limit = max_limit
+        self.backoff = backoff
+        self.tolerance = tolerance
+        self.jitter = jitter
+        self.smoothing = smoothing
+        self.window = window
+        self.in_flight = 0
+        self.completed = self.failed = self.decreases = 0
+        # NOTE: endpoint template -> moving averages of its usual and
+        #  recent latency
+        self.baselines = {}
+        # NOTE: The limit is doubled every round trip until the first
+        #  congestion, then it grows by one per round trip
+        self._slow_start = True
+        self._last_decrease = 0.0
+        self._done = deque()
+        self._cond = threading.Condition()
+
+    def acquire(self):
+        """Wait until the number of requests in flight is below the limit.
+
+        :return: float, start time to pass to release
+        """
+        with self._cond:
+            while self.in_flight >= max(int(self.limit), self.min_limit):
+                self._cond.wait()
+            self.in_flight += 1
+        return time.perf_counter()
+
+    def release(self, start, failed=False, key=None):
+        """Count finished request and adjust the limit.
+
+        :param start: float, start time returned by acquire
+        :param failed: boolean, request failed because of the service,
+        e.g. by a connection error, 429 or 5xx response
+        :param key: str, endpoint template of the request
+        """
+        now = time.perf_counter()
+        latency = now - start
+        with self._cond:
+            self.in_flight -= 1
+            self.completed += 1
+            self._done.append(now)
+            while self._done[0] < now - self.window:
+                self._done.popleft()
+            # NOTE: A single slow response is jitter, congestion is when
+            #  the recent latency of an endpoint exceeds its usual one.
+            #  The usual latency is the lowest recent latency and drifts
+            #  up slowly, so it follows a service which has become slower
+            #  for good but not a queue building up in front of it.
+            baseline, recent = self.baselines.get(key, (latency, latency))
+            recent += self.smoothing * (latency - recent)
+            baseline = min(baseline * DRIFT, recent)
+            self.baselines[key] = baseline, recent
+            congested = baseline * self.tolerance + self.jitter
+            if failed:
+                self.failed += 1
+            if failed or recent > congested:
+                # NOTE: Requests sent before the decrease come back slow
+                #  as well, so the limit is decreased once per round trip
+                if now - self._last_decrease >= latency:
+                    # NOTE: The slower the response, the deeper the cut,
+                    #  at most by half
+                    factor = self.backoff if failed else min(
+                        self.backoff, congested / recent)
+                    self.limit = max(self.limit * max(factor, 0.5),
+                                     self.min_limit)
+                    self._last_decrease = now
+                    self._slow_start = False
+                    self.decreases += 1
+            elif self.in_flight + 1 >= self.limit / 2:
+                # NOTE: The limit grows only while it is used
+                self.limit = min(
+                    self.limit + (1 if self._slow_start else 1 / self.limit),
+                    self.max_limit)
+            self._cond.notify_all()
+
+    def stats(self):
+        """Get current limit and throughput.
+
+        :return: dict, limit, requests in flight, completed and failed
+        requests, number of decreases of the limit and completed
+        requests per second over the window
+        """
+        with self._cond:
+            now = time.perf_counter()
+            throughput = sum(1 for done in self._done
+                             if done >= now - self.window) / self.window
+            return {
+                'limit': int(self.limit),
+                'in_flight': self.in_flight,
+                'completed': self.completed,
+                'failed': self.failed,
+                'decreases': self.decreases,
+                'throughput': round(throughput, 1)
+            }
@@ -0,0 +1,272 @@
+"""Load generator driven by the test parametrizations.
+
+Requests are taken from parametrize tables of collected tests and sent
+at a target rate (open loop) or by a number of concurrent users (closed
+loop), e.g.:
+
+    python -m src.load --target local --rps 500 --duration 60 -m photos
+    python -m src.load --target local --concurrency 32 --duration 10
+"""
+import argparse
+import asyncio
+import contextlib
+import io
+import itertools
+import os
+import random
+import time
+from collections import defaultdict, namedtuple
+
+import pytest
+
+from src.async_client import AsyncRESTAPIClient
+from src.dataset import REMOTE_URL
+from src.server import LocalServer
+from src.utils import endpoint_template, percentile
+
+TESTS_DIR = os.path.join(os.path.dirname(__file__), 'tests')
+
+# NOTE: Kind of request is taken from the name of a test function
+KINDS = (
+    ('create', 'POST'),
+    ('update', 'PUT'),
+    ('delete', 'DELETE'),
+    ('allowed_methods', 'OPTIONS'),
+    ('filter', 'GET'),
+    ('get', 'GET')
+)
+
+Request = namedtuple('Request', 'kind method endpoint kwargs expected_code')
+
+
+def _make_request(item):
+    params = item.callspec.params
+    endpoint = params.get('endpoint') or params.get('filter_endpoint')
+    if endpoint is None:
+        return None
+    for kind, method in KINDS:
+        if kind in item.originalname:
+            break
+    kwargs = {}
+    if params.get('data') is not None:
+        kwargs['data'] = params['data']
+    return Request(kind, method, endpoint, kwargs,
+                   params.get('expected_code'))
+
+
+class _Collector(object):
+
+    def __init__(self):
+        self.requests = []
+
+    def pytest_collection_finish(self, session):
+        # NOTE: Items are taken after -m deselected the others
+        for item in session.items:
+            if hasattr(item, 'callspec'):
+                request = _make_request(item)
+                if request is not None:
+                    self.requests.append(request)
+
+
+def collect_workload(markexpr=None):
+    """Collect requests from parametrized tests.
+
+    :param markexpr: str, marker expression like for pytest -m
+    :return: list, Request tuples
+    """
+    collector = _Collector()
+    args = [TESTS_DIR, '--collect-only', '-q', '-p', 'no:cacheprovider']
+    if markexpr:
+        args.extend(['-m', markexpr])
+    with contextlib.redirect_stdout(io.StringIO()):
+        pytest.main(args, plugins=[collector])
+    return collector.requests
+
+
+class LoadStats(object):
+    """Latencies of sent requests per endpoint template."""
+
+    def __init__(self):
+        self.latencies = defaultdict(list)
+        self.errors = defaultdict(int)
+        self.dropped = 0
+        self.started = self.finished = None
+
+    def record(self, request, status, latency):
+        template = '{} {}'.format(request.method,
+                                  endpoint_template(request.endpoint))
+        self.latencies[template].append(latency)
+        expected = request.expected_code
+        if status is None or (expected is not None and status != expected):
+            self.errors[template] += 1
+
+    def report(self):
+        """Make report table.
+
+        :return: str, throughput and latency percentiles in ms
+        per endpoint template
+        """
+        elapsed = (self.finished - self.started) or 1e-9
+        header = '{:<40} {:>8} {:>7} {:>9} {:>8} {:>8} {:>8} {:>8}'.format(
+            'endpoint', 'requests', 'errors', 'req/s', 'p50', 'p95', 'p99',
+            'max')
+        lines = [header, '-' * len(header)]
+        rows = sorted(self.latencies.items())
+        rows.append(('total', [latency for _, latencies in rows
+                               for latency in latencies]))
+        for template, latencies in rows:
+            latencies = sorted(latencies)
+            errors = sum(self.errors.values()) if template == 'total' \
+                else self.errors[template]
+            lines.append(
+                '{:<40} {:>8} {:>7} {:>9.1f} {:>8.2f} {:>8.2f} {:>8.2f} '
+                '{:>8.2f}'.format(
+                    template, len(latencies), errors,
+                    len(latencies) / elapsed,
+                    *[percentile(latencies, percent) * 1000
+                      for percent in (50, 95, 99, 100)]))
+        if self.dropped:
+            lines.append('dropped (too many requests in flight): {}'.format(
+                self.dropped))
+        return '\n'.join(lines)
+
+
+async def _send(client, request, stats, start):
+    try:
+        status, _ = await client._request(request.method, request.endpoint,
+                                          **request.kwargs)
+    except Exception:
+        status = None
+    stats.record(request, status, time.perf_counter() - start)
+
+
+async def run_open_loop(client, pick, stats, rps, duration, max_in_flight):
+    """Send requests at a fixed rate whatever the response time is.
+
+    Latency is measured from the moment a request was due to be sent, so
+    a slow target can not hide its queueing delay (coordinated omission).
+    """
+    loop = asyncio.get_event_loop()
+    in_flight = set()
+    interval = 1.0 / rps
+    stats.started = time.perf_counter()
+    total = int(rps * duration)
+    for number in range(total):
+        due = stats.started + number * interval
+        delay = due - time.perf_counter()
+        if delay > 0:
+            await asyncio.sleep(delay)
+        if len(in_flight) >= max_in_flight:
+            stats.dropped += 1
+            continue
+        task = loop.create_task(_send(client, pick(), stats, due))
+        in_flight.add(task)
+        task.add_done_callback(in_flight.discard)
+    if in_flight:
+        await asyncio.wait(in_flight)
+    stats.finished = time.perf_counter()
+
+
+async def run_closed_loop(client, pick, stats, concurrency, duration):
+    """Send requests by a fixed number of users, each waits for response."""
+    stats.started = time.perf_counter()
+    deadline = stats.started + duration
+
+    async def user():
+        while time.perf_counter() < deadline:
+            await _send(client, pick(), stats, time.perf_counter())
+
+    await asyncio.gather(*[user() for _ in range(concurrency)])
+    stats.finished = time.perf_counter()
+
+
+def make_picker(workload, weights, seed=None):
+    """Make function choosing next request by weight of its kind.
+
+    :param workload: list, Request tuples
+    :param weights: dict, kind of request -> weight, 1 by default
+    :param seed: int, seed of random choice
+    :return: callable, returns Request
+    """
+    rnd = random.Random(seed)
+    cum_weights = list(itertools.accumulate(
+        weights.get(request.kind, 1.0) for request in workload))
+    if not cum_weights or not cum_weights[-1]:
+        raise ValueError('All requests have zero weight')
+
+    def pick():
+        return rnd.choices(workload, cum_weights=cum_weights)[0]
+
+    return pick
+
+
+def _parse_weights(value):
+    weights = {}
+    for pair in filter(None, value.split(',')):
+        kind, _, weight = pair.partition('=')
+        weights[kind.strip()] = float(weight)
+    return weights
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(
+        description=__doc__.splitlines()[0],
+        formatter_class=argparse.RawDescriptionHelpFormatter,
+        epilog='\n'.join(__doc__.splitlines()[1:]))
+    parser.add_argument('--target', default='local',
+                        help='"local", "remote" or any base url')
+    parser.add_argument('-m', dest='markexpr', default=None,
+                        help='take requests of tests matching marker '
+                             'expression, e.g. photos or "posts or users"')
+    parser.add_argument('--duration', type=float, default=10,
+                        help='seconds to generate load')
+    mode = parser.add_mutually_exclusive_group()
+    mode.add_argument('--rps', type=float, default=None,
+                      help='open loop: requests per second')
+    mode.add_argument('--concurrency', type=int, default=None,
+                      help='closed loop: number of concurrent users')
+    parser.add_argument('--max-in-flight', type=int, default=1000,
+                        help='open loop: drop requests above this number '
+                             'of unanswered ones')
+    parser.add_argument('--weights', type=_parse_weights, default={},
+                        help='weights of kinds of requests, e.g. '
+                             'get=5,filter=2,create=1 (create, update, '
+                             'delete, filter, get, allowed_methods)')
+    parser.add_argument('--seed', type=int, default=None)
+    args = parser.parse_args(argv)
+
+    workload = collect_workload(args.markexpr)
+    if not workload:
+        parser.error('No requests collected')
+    pick = make_picker(workload, args.weights, args.seed)
+    stats = LoadStats()
+
+    async def run(url):
+        concurrency = args.concurrency or args.max_in_flight
+        # NOTE: Every generated request must reach the service
+        async with AsyncRESTAPIClient(url, concurrency,
+                                      coalesce=False) as client:
+            if args.concurrency:
+                await run_closed_loop(client, pick, stats, args.concurrency,
+                                      args.duration)
+            else:
+                await run_open_loop(client, pick, stats, args.rps or 100,
+                                    args.duration, args.max_in_flight)
+
+    with contextlib.ExitStack() as stack:
+        if args.target == 'local':
+            url = stack.enter_context(LocalServer()).url
+        elif args.target == 'remote':
+            url = REMOTE_URL
+        else:
+            url = args.target
+        loop = asyncio.new_event_loop()
+        try:
+            loop.run_until_complete(run(url))
+        finally:
+            loop.close()
+    print(stats.report())
+
+
+if __name__ == '__main__':
+    main()
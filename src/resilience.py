@@ -0,0 +1,257 @@
+"""Retries of transient errors and circuit breaking of a failing host.
+
+ResilientAdapter wraps the transport adapter of RESTAPIClient:
+
+* idempotent requests failed by a connection error or 5xx response are
+  retried after a jittered exponential backoff;
+* retries are taken from a budget refilled by a share of requests, so
+  retries can not multiply the load of an overloaded service;
+* requests to a host whose circuit breaker is open fail at once with
+  CircuitOpen instead of waiting for timeouts.
+"""
+import random
+import threading
+import time
+from collections import defaultdict
+from urllib.parse import urlsplit
+
+from requests import ConnectionError
+from requests.adapters import BaseAdapter
+from requests.exceptions import Timeout
+
+# NOTE: Methods which may be sent twice without changing the result,
+#  see RFC 7231 4.2.2
+IDEMPOTENT_METHODS = frozenset(('GET', 'HEAD', 'OPTIONS', 'PUT', 'DELETE'))
+RETRY_STATUSES = frozenset((500, 502, 503, 504))
+
+
+class CircuitOpen(ConnectionError):
+    """Request is not sent as its host keeps failing."""
+
+
+class RetryBudget(object):
+
+    def __init__(self, ratio=0.2, min_per_second=5.0, max_tokens=None):
+        """Make token bucket of retries.
+
+        :param ratio: float, retries allowed per sent request
+        :param min_per_second: float, retries allowed per second whatever
+        the number of requests is, so a few requests still get retried
+        :param max_tokens: float, max number of retries saved up,
+        10 seconds of min_per_second by default
+        """
+        self.ratio = ratio
+        self.min_per_second = min_per_second
+        self.max_tokens = max_tokens or max(min_per_second * 10, 1.0)
+        self._tokens = self.max_tokens
+        self._updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def deposit(self):
+        """Count sent request."""
+        with self._lock:
+            self._tokens = min(self._tokens + self.ratio, self.max_tokens)
+
+    def withdraw(self):
+        """Take one retry.
+
+        :return: boolean, False if the budget is exhausted
+        """
+        with self._lock:
+            now = time.monotonic()
+            self._tokens = min(
+                self._tokens + (now - self._updated) * self.min_per_second,
+                self.max_tokens)
+            self._updated = now
+            if self._tokens < 1:
+                return False
+            self._tokens -= 1
+            return True
+
+
+class CircuitBreaker(object):
+
+    CLOSED = 'closed'
+    OPEN = 'open'
+    HALF_OPEN = 'half_open'
+
+    def __init__(self, failure_threshold=5, reset_timeout=30.0):
+        """Make breaker of one host.
+
+        :param failure_threshold: int, number of consecutive failures
+        opening the circuit
+        :param reset_timeout: float, seconds the circuit stays open before
+        one probe request is let through
+        """
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.state = self.CLOSED
+        self.failures = 0
+        self.opened = 0
+        self._opened_at = None
+        self._lock = threading.Lock()
+
+    def allow(self):
+        """Check whether a request may be sent."""
+        with self._lock:
+            if self.state == self.CLOSED:
+                return True
+            if self.state == self.OPEN and \
+                    time.monotonic() - self._opened_at >= self.reset_timeout:
+                # NOTE: Only the first request after the timeout probes
+                #  the host, the others fail until it has succeeded
+                self.state = self.HALF_OPEN
+                return True
+            return False
+
+    def record_success(self):
+        with self._lock:
+            self.failures = 0
+            self.state = self.CLOSED
+
+    def record_failure(self):
+        """Count failure.
+
+        :return: boolean, True if the failure opened the closed circuit
+        """
+        with self._lock:
+            self.failures += 1
+            opened = self.state == self.CLOSED and \
+                self.failures >= self.failure_threshold
+            if opened or self.state == self.HALF_OPEN:
+                self.state = self.OPEN
+                self._opened_at = time.monotonic()
+            if opened:
+                self.opened += 1
+            return opened
+
+
+class ResilientAdapter(BaseAdapter):
+
+    def __init__(self, adapter, max_retries=3, backoff=0.05,
+                 max_backoff=2.0, budget=None, failure_threshold=5,
+                 reset_timeout=30.0, methods=IDEMPOTENT_METHODS,
+                 statuses=RETRY_STATUSES):
+        """Wrap transport adapter with retries and circuit breakers.
+
+        :param adapter: requests.adapters.BaseAdapter, adapter sending
+        requests, e.g. RESTAPIClient.adapter
+        :param max_retries: int, max number of retries of one request
+        :param backoff: float, seconds of the first backoff, every next
+        one is up to twice as long
+        :param max_backoff: float, max seconds of one backoff
+        :param budget: RetryBudget, shared budget of retries,
+        RetryBudget() by default
+        :param failure_threshold: int, number of consecutive failures
+        opening the circuit of a host, 0 disables circuit breaking
+        :param reset_timeout: float, seconds a circuit stays open
+        :param methods: iterable, retried HTTP methods
+        :param statuses: iterable, retried response codes
+        """
+        super(ResilientAdapter, self).__init__()
+        self.adapter = adapter
+        self.max_retries = max_retries
+        self.backoff = backoff
+        self.max_backoff = max_backoff
+        self.budget = budget or RetryBudget()
+        self.methods = frozenset(methods)
+        self.statuses = frozenset(statuses)
+        self.failure_threshold = failure_threshold
+        self.breakers = defaultdict(
+            lambda: CircuitBreaker(failure_threshold, reset_timeout))
+        self.counters = defaultdict(int)
+        self._lock = threading.Lock()
+
+    def _count(self, name):
+        with self._lock:
+            self.counters[name] += 1
+
+    def _breaker(self, url):
+        if not self.failure_threshold:
+            return None
+        host = urlsplit(url).netloc
+        with self._lock:
+            return self.breakers[host]
+
+    def backoff_delay(self, attempt, resp=None):
+        """Get seconds to wait before retry.
+
+        :param attempt: int, number of the failed attempt from 0
+        :param resp: requests.Response, failed response
+        :return: float, random delay up to the exponential backoff
+        ("full jitter") or Retry-After of the response if it is longer
+        """
+        delay = random.uniform(0, min(self.max_backoff,
+                                      self.backoff * 2 ** attempt))
+        retry_after = resp.headers.get('Retry-After') \
+            if resp is not None else None
+        if retry_after and retry_after.isdigit():
+            delay = max(delay, min(float(retry_after), self.max_backoff))
+        return delay
+
+    def send(self, request, **kwargs):
+        breaker = self._breaker(request.url)
+        self.budget.deposit()
+        attempt = 0
+        while True:
+            if breaker is not None and not breaker.allow():
+                self._count('fast_failed')
+                raise CircuitOpen(
+                    'Circuit of {} is open after {} failures'.format(
+                        urlsplit(request.url).netloc, breaker.failures),
+                    request=request)
+            resp = error = None
+            failed = True
+            try:
+                resp = self.adapter.send(request, **kwargs)
+                failed = resp.status_code in self.statuses
+            except (ConnectionError, Timeout) as exc:
+                error = exc
+            except Exception:
+                self._count('failed')
+                raise
+            finally:
+                # NOTE: Other errors are not retried but fail the request
+                #  as well, so a probe of a half-open circuit never leaves
+                #  it half-open
+                if breaker is not None:
+                    if not failed:
+                        breaker.record_success()
+                    elif breaker.record_failure():
+                        self._count('breaker_opened')
+            if not failed:
+                return resp
+            if request.method not in self.methods or \
+                    attempt >= self.max_retries:
+                break
+            if not self.budget.withdraw():
+                self._count('budget_exhausted')
+                break
+            self._count('retries')
+            if resp is not None:
+                resp.close()
+            time.sleep(self.backoff_delay(attempt, resp))
+            attempt += 1
+        self._count('failed')
+        if error is not None:
+            raise error
+        return resp
+
+    def retry_stats(self):
+        """Get counters of retries and circuit breaking.
+
+        :return: dict, number of retries, retries refused by the budget,
+        opened circuits, requests failed by an open circuit and requests
+        failed after retries
+        """
+        with self._lock:
+            return {name: self.counters[name]
+                    for name in ('retries', 'budget_exhausted',
+                                 'breaker_opened', 'fast_failed', 'failed')}
+
+    def connection_stats(self):
+        """Get number of connections and requests of the wrapped adapter."""
+        return self.adapter.connection_stats()
+
+    def close(self):
+        self.adapter.close()
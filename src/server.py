@@ -0,0 +1,590 @@
+"""In-process stand-in of https://jsonplaceholder.typicode.com/
+
+Run it standalone, e.g. as a load-test target:
+
+    python -m src.server --port 3000
+    python -m src.server --port 3000 --http2
+"""
+import argparse
+import asyncio
+import math
+import random
+import threading
+import zlib
+from urllib.parse import parse_qs, urlencode
+
+from aiohttp import web
+from h2.config import H2Configuration
+from h2.connection import H2Connection
+from h2.events import (ConnectionTerminated, DataReceived, RequestReceived,
+                       StreamEnded, StreamReset, WindowUpdated)
+from h2.exceptions import ProtocolError
+
+from src.codec import get_codec
+from src.dataset import PARENTS, make_dataset, query_value
+
+ALLOWED_METHODS = 'GET,HEAD,PUT,PATCH,POST,DELETE'
+JSON_HEADERS = {'Content-Type': 'application/json; charset=utf-8'}
+
+
+_codec = get_codec()
+
+
+def _dumps(obj):
+    return _codec.dumps(obj)
+
+
+def _etag(body):
+    return 'W/"{:x}-{:x}"'.format(len(body), zlib.crc32(body))
+
+
+def _to_id(value):
+    try:
+        return int(value)
+    except (TypeError, ValueError):
+        return None
+
+
+class LocalApp(object):
+    """Transport independent request handler over an in-memory dataset.
+
+    Like the real service it does not persist writes, but it verifies
+    them the way the tests expect: a resource id must not be sent, body
+    must not be empty and a parent resource must exist.
+    """
+
+    def __init__(self, dataset=None, error_rate=0, seed=None):
+        """Make handler.
+
+        :param dataset: dict, resource name -> list of resource dicts,
+        src.dataset.make_dataset() by default
+        :param error_rate: float, share of requests answered by 503 to
+        emulate an overloaded service
+        :param seed: int, seed of emulated errors
+        """
+        self.data = dataset or make_dataset()
+        self.error_rate = error_rate
+        self._rnd = random.Random(seed)
+        self.by_id = {
+            name: {item['id']: item for item in items}
+            for name, items in self.data.items()
+        }
+        # NOTE: child resource -> parent id -> children ordered by id
+        self.children = {}
+        for child, (parent, key) in PARENTS.items():
+            index = {parent_id: [] for parent_id in self.by_id[parent]}
+            for item in self.data[child]:
+                index.setdefault(item[key], []).append(item)
+            self.children[child] = index
+        self._collection_bodies = {}
+        for name, items in self.data.items():
+            body = _dumps(items)
+            self._collection_bodies[name] = (body, _etag(body))
+
+    def handle(self, method, path, query_string='', body=b'', headers=None):
+        """Handle one request.
+
+        :param method: str, HTTP method
+        :param path: str, url path
+        :param query_string: str, url query string
+        :param body: bytes, request body
+        :param headers: dict, request headers with lowercase names
+        :return: tuple, status code, dict of headers and response body
+        """
+        if self.error_rate and self._rnd.random() < self.error_rate:
+            return self._respond(503, {})
+        if method == 'OPTIONS':
+            # NOTE: A path is looked up like by GET, without its filters
+            if self._route('GET', path, '', b'', '')[0] == 404:
+                return self._respond(404, {})
+            return 204, {'Access-Control-Allow-Methods': ALLOWED_METHODS}, b''
+        headers = headers or {}
+        status, resp_headers, resp_body = self._route(
+            method, path, query_string, body,
+            headers.get('content-type', ''))
+        if status == 200 and method in ('GET', 'HEAD'):
+            etag = resp_headers.get('ETag') or _etag(resp_body)
+            if etag == headers.get('if-none-match'):
+                return 304, {'ETag': etag}, b''
+            resp_headers = dict(resp_headers, ETag=etag)
+        if method == 'HEAD':
+            resp_body = b''
+        return status, resp_headers, resp_body
+
+    def _route(self, method, path, query_string, body, content_type):
+        segments = [segment for segment in path.split('/') if segment]
+        if not segments or segments[0] not in self.data:
+            return self._respond(404, {})
+        resource = segments[0]
+        if len(segments) == 1:
+            return self._handle_collection(method, resource, query_string,
+                                           body, content_type)
+        resource_id = _to_id(segments[1])
+        if len(segments) == 2:
+            return self._handle_item(method, resource, resource_id,
+                                     query_string, body, content_type)
+        if len(segments) == 3:
+            return self._handle_nested(method, resource, resource_id,
+                                       segments[2], query_string, body,
+                                       content_type)
+        return self._respond(404, {})
+
+    def _respond(self, status, obj=None, body=None, etag=None):
+        if body is None:
+            body = _dumps(obj)
+        if etag is None:
+            return status, JSON_HEADERS, body
+        return status, dict(JSON_HEADERS, ETag=etag), body
+
+    def _parse_body(self, body, content_type):
+        """Decode JSON or form encoded request body.
+
+        :return: dict or None if body can not be decoded
+        """
+        if not body:
+            return {}
+        if content_type.startswith('application/json'):
+            try:
+                data = _codec.loads(body)
+            except ValueError:
+                return None
+            return data if isinstance(data, dict) else None
+        form = parse_qs(body.decode('utf-8'), keep_blank_values=True)
+        return {key: values[0] if len(values) == 1 else values
+                for key, values in form.items()}
+
+    def _verify_body(self, resource, data):
+        """Verify sent data of a resource.
+
+        :return: int, 400 if data is not valid or None
+        """
+        if not data or 'id' in data:
+            return 400
+        if resource in PARENTS:
+            parent, key = PARENTS[resource]
+            if key in data and _to_id(data[key]) not in self.by_id[parent]:
+                return 400
+        return None
+
+    def _filter(self, items, resource, query_string):
+        query = parse_qs(query_string, keep_blank_values=True)
+        filters = {key: set(values) for key, values in query.items()
+                   if not key.startswith('_')}
+        if not filters:
+            return items
+        ids = filters.pop('id', None)
+        if ids is not None:
+            found = set(map(_to_id, ids))
+            items = [item for item in items if item['id'] in found]
+        key = PARENTS.get(resource, (None, None))[1]
+        if key in filters and items is self.data[resource]:
+            # NOTE: Take children of filtered parents from the index
+            #  instead of scanning the whole collection
+            values = filters.pop(key)
+            index = self.children[resource]
+            items = sorted(
+                (item for parent_id in set(map(_to_id, values))
+                 if str(parent_id) in values
+                 for item in index.get(parent_id, ())),
+                key=lambda item: item['id'])
+        return [item for item in items
+                if all(query_value(item.get(key)) in values
+                       for key, values in filters.items())]
+
+    def _paginate(self, path, items, query_string):
+        """Slice items by _page and _limit or by _start, _end and _limit.
+
+        Like json-server, a page is 10 items unless _limit is given and
+        a sliced response tells the number of all items by X-Total-Count
+        and, for pages, links the first, previous, next and last ones.
+
+        :return: tuple, slice of items and dict of additional headers
+        """
+        query = parse_qs(query_string, keep_blank_values=True)
+        page, limit, start, end = (
+            _to_id(query[name][0]) if name in query else None
+            for name in ('_page', '_limit', '_start', '_end'))
+        if page is None and limit is None and start is None and \
+                end is None:
+            return items, {}
+        headers = {'X-Total-Count': str(len(items)),
+                   'Access-Control-Expose-Headers': 'X-Total-Count, Link'}
+        if page is not None:
+            limit = limit if limit and limit > 0 else 10
+            page = max(page, 1)
+            last = max(int(math.ceil(len(items) / float(limit))), 1)
+            links = [('first', 1), ('prev', page - 1), ('next', page + 1),
+                     ('last', last)]
+            params = [(key, value) for key, values in query.items()
+                      for value in values if key != '_page']
+            headers['Link'] = ', '.join(
+                '<{}?{}>; rel="{}"'.format(
+                    path, urlencode(params + [('_page', number)]), rel)
+                for rel, number in links if 1 <= number <= last)
+            return items[(page - 1) * limit:page * limit], headers
+        start = start or 0
+        if end is None:
+            end = start + limit if limit is not None else len(items)
+        return items[start:end], headers
+
+    def _relate(self, resource, items, query_string):
+        """Add children named by _embed and parents named by _expand.
+
+        Like json-server, /posts?_embed=comments adds the comments of
+        every post as "comments" and /comments?_expand=post adds the post
+        of every comment as "post". Unknown names are ignored.
+
+        :return: list, copies of items with related resources or items
+        if nothing is related
+        """
+        query = parse_qs(query_string)
+        embeds = [name for value in query.get('_embed', ())
+                  for name in value.split(',')
+                  if PARENTS.get(name, (None,))[0] == resource]
+        key = PARENTS.get(resource, (None, None))[1]
+        expand = key is not None and \
+            any(key == name + 'Id' for value in query.get('_expand', ())
+                for name in value.split(','))
+        if not embeds and not expand:
+            return items
+        related = []
+        for item in items:
+            item = dict(item)
+            for name in embeds:
+                item[name] = self.children[name].get(item['id'], [])
+            if expand:
+                item[key[:-2]] = self.by_id[PARENTS[resource][0]].get(
+                    _to_id(item.get(key)))
+            related.append(item)
+        return related
+
+    def _respond_items(self, resource, path, items, query_string):
+        items, headers = self._paginate(path, items, query_string)
+        items = self._relate(resource, items, query_string)
+        status, resp_headers, body = self._respond(200, items)
+        return status, dict(resp_headers, **headers), body
+
+    def _handle_collection(self, method, resource, query_string, body,
+                           content_type):
+        if method in ('GET', 'HEAD'):
+            if not query_string:
+                body, etag = self._collection_bodies[resource]
+                return self._respond(200, body=body, etag=etag)
+            items = self._filter(self.data[resource], resource, query_string)
+            return self._respond_items(resource, '/' + resource, items,
+                                       query_string)
+        if method == 'POST':
+            data = self._parse_body(body, content_type)
+            error = 400 if data is None else self._verify_body(resource,
+                                                               data)
+            if error is None and resource in PARENTS:
+                # NOTE: A new resource must belong to an existing parent
+                if PARENTS[resource][1] not in data:
+                    error = 400
+            if error:
+                return self._respond(error, {})
+            return self._created(resource, data)
+        return self._respond(404, {})
+
+    def _handle_item(self, method, resource, resource_id, query_string,
+                     body, content_type):
+        item = self.by_id[resource].get(resource_id)
+        if method == 'POST':
+            return self._respond(400, {})
+        if item is None:
+            return self._respond(404, {})
+        if method in ('GET', 'HEAD'):
+            if query_string:
+                item = self._relate(resource, [item], query_string)[0]
+            return self._respond(200, item)
+        if method == 'DELETE':
+            return self._respond(200, {})
+        if method in ('PUT', 'PATCH'):
+            data = self._parse_body(body, content_type)
+            error = 400 if data is None else self._verify_body(resource,
+                                                               data)
+            if error:
+                return self._respond(error, {})
+            updated = dict(item) if method == 'PATCH' else {}
+            updated.update(data)
+            updated['id'] = resource_id
+            return self._respond(200, updated)
+        return self._respond(404, {})
+
+    def _handle_nested(self, method, parent, parent_id, resource,
+                       query_string, body, content_type):
+        if PARENTS.get(resource, (None,))[0] != parent:
+            return self._respond(404, {})
+        if parent_id not in self.by_id[parent]:
+            return self._respond(404, {})
+        if method in ('GET', 'HEAD'):
+            items = self._filter(self.children[resource][parent_id],
+                                 resource, query_string)
+            return self._respond_items(
+                resource, '/{}/{}/{}'.format(parent, parent_id, resource),
+                items, query_string)
+        if method == 'POST':
+            data = self._parse_body(body, content_type)
+            error = 400 if data is None else self._verify_body(resource,
+                                                               data)
+            if error:
+                return self._respond(error, {})
+            data[PARENTS[resource][1]] = str(parent_id)
+            return self._created(resource, data)
+        return self._respond(404, {})
+
+    def _created(self, resource, data):
+        data['id'] = len(self.data[resource]) + 1
+        return self._respond(201, data)
+
+
+def make_web_app(app, delay=0, capacity=0):
+    """Wrap LocalApp into an aiohttp application.
+
+    :param app: LocalApp
+    :param delay: float, seconds every response is delayed by to emulate
+    network latency
+    :param capacity: int, number of requests handled at once, the others
+    wait for their turn like in a service with a fixed number of
+    workers, 0 means no limit
+    """
+    workers = []
+
+    async def handler(request):
+        body = await request.read()
+        if capacity:
+            # NOTE: Semaphore is made in the loop of the server
+            if not workers:
+                workers.append(asyncio.Semaphore(capacity))
+            async with workers[0]:
+                return await handle(request, body)
+        return await handle(request, body)
+
+    async def handle(request, body):
+        if delay:
+            await asyncio.sleep(delay)
+        headers = {name.lower(): value
+                   for name, value in request.headers.items()}
+        status, headers, resp_body = app.handle(
+            request.method, request.path, request.query_string, body,
+            headers)
+        return web.Response(status=status, headers=headers, body=resp_body)
+
+    web_app = web.Application()
+    web_app.router.add_route('*', '/{tail:.*}', handler)
+    return web_app
+
+
+class LocalServer(object):
+    """Run LocalApp over HTTP in a background thread."""
+
+    def __init__(self, host='127.0.0.1', port=0, app=None, delay=0,
+                 capacity=0):
+        """Make server.
+
+        :param host: str, host to listen on
+        :param port: int, port to listen on, any free one by default
+        :param app: LocalApp, handler of requests
+        :param delay: float, seconds every response is delayed by to
+        emulate network latency
+        :param capacity: int, number of requests handled at once,
+        0 means no limit, not supported over HTTP/2
+        """
+        self.host = host
+        self.port = port
+        self.app = app or LocalApp()
+        self.delay = delay
+        self.capacity = capacity
+        self._loop = None
+        self._thread = None
+        self._runner = None
+
+    @property
+    def url(self):
+        return 'http://{}:{}/'.format(self.host, self.port)
+
+    def __enter__(self):
+        self.start()
+        return self
+
+    def __exit__(self, *exc_info):
+        self.stop()
+
+    def start(self):
+        """Start server and wait until it accepts connections."""
+        self._loop = asyncio.new_event_loop()
+        self._loop.run_until_complete(self._setup())
+        self._thread = threading.Thread(target=self._loop.run_forever,
+                                        daemon=True)
+        self._thread.start()
+
+    async def _setup(self):
+        self._runner = web.AppRunner(
+            make_web_app(self.app, self.delay, self.capacity),
+            access_log=None)
+        await self._runner.setup()
+        site = web.TCPSite(self._runner, self.host, self.port)
+        await site.start()
+        self.port = self._runner.addresses[0][1]
+
+    async def _cleanup(self):
+        await self._runner.cleanup()
+
+    def stop(self):
+        """Stop server and close its connections."""
+        self._loop.call_soon_threadsafe(self._loop.stop)
+        self._thread.join()
+        self._loop.run_until_complete(self._cleanup())
+        self._loop.close()
+
+
+class _H2Protocol(asyncio.Protocol):
+    """One HTTP/2 connection, requests of its streams are handled by app.
+
+    Response bodies are sent as flow control windows of the client allow,
+    so many streams are multiplexed over the connection.
+    """
+
+    def __init__(self, app, connections, delay=0):
+        self.app = app
+        self.connections = connections
+        self.delay = delay
+        self.conn = H2Connection(H2Configuration(client_side=False,
+                                                 header_encoding='utf-8'))
+        self.transport = None
+        self.requests = {}
+        self.pending = {}
+
+    def connection_made(self, transport):
+        self.transport = transport
+        self.connections.add(self)
+        self.conn.initiate_connection()
+        self.transport.write(self.conn.data_to_send())
+
+    def connection_lost(self, exc):
+        self.connections.discard(self)
+
+    def data_received(self, data):
+        try:
+            events = self.conn.receive_data(data)
+        except ProtocolError:
+            self.transport.write(self.conn.data_to_send())
+            self.transport.close()
+            return
+        for event in events:
+            if isinstance(event, RequestReceived):
+                self.requests[event.stream_id] = (dict(event.headers), [])
+            elif isinstance(event, DataReceived):
+                self.requests[event.stream_id][1].append(event.data)
+                self.conn.acknowledge_received_data(
+                    event.flow_controlled_length, event.stream_id)
+            elif isinstance(event, StreamEnded):
+                if self.delay:
+                    asyncio.get_event_loop().call_later(
+                        self.delay, self._respond, event.stream_id)
+                else:
+                    self._respond(event.stream_id)
+            elif isinstance(event, StreamReset):
+                self.requests.pop(event.stream_id, None)
+                self.pending.pop(event.stream_id, None)
+            elif isinstance(event, WindowUpdated):
+                self._send_pending()
+            elif isinstance(event, ConnectionTerminated):
+                self.transport.close()
+                return
+        self.transport.write(self.conn.data_to_send())
+
+    def _respond(self, stream_id):
+        if stream_id not in self.requests or self.transport.is_closing():
+            return
+        headers, chunks = self.requests.pop(stream_id)
+        path, _, query_string = headers[':path'].partition('?')
+        status, resp_headers, resp_body = self.app.handle(
+            headers[':method'], path, query_string, b''.join(chunks),
+            {name: value for name, value in headers.items()
+             if not name.startswith(':')})
+        response_headers = [(':status', str(status))]
+        response_headers.extend((name.lower(), value)
+                                for name, value in resp_headers.items())
+        response_headers.append(('content-length', str(len(resp_body))))
+        self.conn.send_headers(stream_id, response_headers,
+                               end_stream=not resp_body)
+        if resp_body:
+            self.pending[stream_id] = memoryview(resp_body)
+            self._send_pending()
+        self.transport.write(self.conn.data_to_send())
+
+    def _send_pending(self):
+        for stream_id, data in list(self.pending.items()):
+            size = min(self.conn.local_flow_control_window(stream_id),
+                       len(data))
+            while size > 0:
+                chunk = min(size, self.conn.max_outbound_frame_size)
+                self.conn.send_data(stream_id, data[:chunk].tobytes())
+                data = data[chunk:]
+                size -= chunk
+            if data:
+                self.pending[stream_id] = data
+            else:
+                del self.pending[stream_id]
+                self.conn.end_stream(stream_id)
+
+
+class H2Server(LocalServer):
+    """Run LocalApp over cleartext HTTP/2 in a background thread.
+
+    Clients connect with prior knowledge (h2c without upgrade).
+    """
+
+    def __init__(self, host='127.0.0.1', port=0, app=None, delay=0):
+        super(H2Server, self).__init__(host, port, app, delay)
+        self._server = None
+        self._connections = set()
+
+    async def _setup(self):
+        self._server = await self._loop.create_server(
+            lambda: _H2Protocol(self.app, self._connections, self.delay),
+            self.host, self.port)
+        self.port = self._server.sockets[0].getsockname()[1]
+
+    async def _cleanup(self):
+        self._server.close()
+        for protocol in list(self._connections):
+            protocol.transport.close()
+        await self._server.wait_closed()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=3000)
+    parser.add_argument('--scale', type=int, default=1,
+                        help='multiplier of resource cardinalities')
+    parser.add_argument('--http2', action='store_true',
+                        help='serve cleartext HTTP/2 (h2c with prior '
+                             'knowledge) instead of HTTP/1.1')
+    parser.add_argument('--error-rate', type=float, default=0,
+                        help='share of requests answered by 503')
+    parser.add_argument('--delay', type=float, default=0,
+                        help='seconds every response is delayed by')
+    parser.add_argument('--capacity', type=int, default=0,
+                        help='number of requests handled at once, HTTP/1.1 '
+                             'only')
+    args = parser.parse_args()
+    app = LocalApp(make_dataset(scale=args.scale), args.error_rate)
+    if args.http2:
+        server = H2Server(args.host, args.port, app, args.delay)
+        server.start()
+        print('Serving HTTP/2 on {}'.format(server.url))
+        try:
+            server._thread.join()
+        except KeyboardInterrupt:
+            server.stop()
+        return
+    web.run_app(make_web_app(app, args.delay, args.capacity),
+                host=args.host, port=args.port,
+                access_log=None)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,122 @@
+"""Coalescing of concurrent identical requests.
+
+While a request is in flight, identical requests from other threads or
+asyncio tasks wait for it and get its response (or its exception)
+instead of being sent. Unlike the response cache, nothing is kept once
+the request has finished.
+"""
+import asyncio
+import threading
+
+from src.cache import normalize_url
+
+# NOTE: Only safe methods are coalesced, two identical writes must both
+#  reach the service
+COALESCED_METHODS = ('GET', 'HEAD', 'OPTIONS')
+
+
+def make_key(method, url, params=None, headers=None):
+    """Make key of request, identical requests have equal keys.
+
+    :param method: str, HTTP method
+    :param url: str, full url
+    :param params: dict or list, additional query params
+    :param headers: dict, request headers
+    :return: tuple
+    """
+    return (method, normalize_url(url, params),
+            tuple(sorted((name.lower(), value)
+                         for name, value in (headers or {}).items())))
+
+
+class _Call(object):
+
+    __slots__ = ('event', 'result', 'error')
+
+    def __init__(self):
+        self.event = threading.Event()
+        self.result = self.error = None
+
+
+class SingleFlight(object):
+    """Coalescing of calls made from several threads."""
+
+    def __init__(self):
+        self.calls = self.coalesced = 0
+        self._calls = {}
+        self._lock = threading.Lock()
+
+    def do(self, key, func, *args, **kwargs):
+        """Call func unless a call with the same key is in flight.
+
+        :param key: hashable, key of the call
+        :param func: callable
+        :return: result of func, shared by all coalesced calls
+        """
+        with self._lock:
+            call = self._calls.get(key)
+            leader = call is None
+            if leader:
+                call = self._calls[key] = _Call()
+                self.calls += 1
+            else:
+                self.coalesced += 1
+        if not leader:
+            call.event.wait()
+            if call.error is not None:
+                raise call.error
+            return call.result
+        try:
+            call.result = func(*args, **kwargs)
+        except Exception as exc:
+            call.error = exc
+            raise
+        finally:
+            with self._lock:
+                del self._calls[key]
+            call.event.set()
+        return call.result
+
+    def stats(self):
+        """Get number of made calls and calls coalesced with them."""
+        with self._lock:
+            return {'calls': self.calls, 'coalesced': self.coalesced}
+
+
+class AsyncSingleFlight(object):
+    """Coalescing of calls made from several tasks of one event loop."""
+
+    def __init__(self):
+        self.calls = self.coalesced = 0
+        self._futures = {}
+
+    def _done(self, key, future):
+        if self._futures.get(key) is future:
+            del self._futures[key]
+        # NOTE: Mark exception as retrieved, waiters may have been
+        #  cancelled meanwhile
+        if not future.cancelled():
+            future.exception()
+
+    async def do(self, key, coro_func, *args, **kwargs):
+        """Await coro_func unless a call with the same key is in flight.
+
+        A cancelled waiter does not cancel the call of the others.
+
+        :param key: hashable, key of the call
+        :param coro_func: coroutine function
+        :return: result of the coroutine, shared by all coalesced calls
+        """
+        future = self._futures.get(key)
+        if future is None:
+            future = asyncio.ensure_future(coro_func(*args, **kwargs))
+            future.add_done_callback(lambda done: self._done(key, done))
+            self._futures[key] = future
+            self.calls += 1
+        else:
+            self.coalesced += 1
+        return await asyncio.shield(future)
+
+    def stats(self):
+        """Get number of made calls and calls coalesced with them."""
+        return {'calls': self.calls, 'coalesced': self.coalesced}
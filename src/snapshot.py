@@ -0,0 +1,171 @@
+from operator import itemgetter
+from urllib.parse import parse_qs, urlsplit
+
+from src.dataset import PARENTS, RESOURCES, query_value
+
+INDEXED_FIELDS = ('postId', 'userId', 'albumId')
+
+
+class Collection(object):
+    """Compact indexed copy of one resource collection.
+
+    Records are kept as tuples of field values, a dict is built only for
+    returned records, so every lookup costs O(k) of its result size.
+    """
+
+    __slots__ = ('name', 'fields', 'rows', 'by_id', 'indexes', '_columns')
+
+    def __init__(self, name, items):
+        """Build collection.
+
+        :param name: str, resource name
+        :param items: list, resource dicts ordered by id
+        """
+        self.name = name
+        self.fields = tuple(items[0]) if items else ('id',)
+        self.rows = [tuple(item.get(field) for field in self.fields)
+                     for item in items]
+        id_pos = self.fields.index('id')
+        self.by_id = {row[id_pos]: pos for pos, row in enumerate(self.rows)}
+        # NOTE: field -> value -> positions of rows ordered by id
+        self.indexes = {}
+        for field in INDEXED_FIELDS:
+            if field not in self.fields:
+                continue
+            field_pos = self.fields.index(field)
+            index = {}
+            for pos, row in enumerate(self.rows):
+                index.setdefault(row[field_pos], []).append(pos)
+            self.indexes[field] = index
+        self._columns = {}
+
+    def __len__(self):
+        return len(self.rows)
+
+    def column(self, field):
+        """Get values of one field of all resources ordered by id.
+
+        :param field: str, field name
+        :return: list, field values, None where resource has not the field
+        """
+        if field not in self._columns:
+            if field not in self.fields:
+                return [None] * len(self.rows)
+            self._columns[field] = list(map(
+                itemgetter(self.fields.index(field)), self.rows))
+        return self._columns[field]
+
+    def _record(self, pos):
+        return dict(zip(self.fields, self.rows[pos]))
+
+    def get(self, resource_id):
+        """Get resource by id.
+
+        :param resource_id: int, resource id
+        :return: dict or None if resource does not exist
+        """
+        pos = self.by_id.get(resource_id)
+        if pos is None:
+            return None
+        return self._record(pos)
+
+    def filter(self, **criteria):
+        """Filter resources like ?field=a&field=b does.
+
+        :param criteria: field name -> list of accepted values
+        :return: list, found resources ordered by id
+        """
+        positions = None
+        rest = {}
+        for field, values in criteria.items():
+            if field == 'id':
+                found = [self.by_id.get(value) for value in values]
+            elif field in self.indexes:
+                index = self.indexes[field]
+                found = [pos for value in values
+                         for pos in index.get(value, ())]
+            else:
+                rest[field] = {query_value(value) for value in values}
+                continue
+            found = {pos for pos in found if pos is not None}
+            positions = found if positions is None else positions & found
+        if positions is None:
+            positions = range(len(self.rows))
+        records = [self._record(pos) for pos in sorted(positions)]
+        if rest:
+            records = [record for record in records
+                       if all(query_value(record.get(field)) in values
+                              for field, values in rest.items())]
+        return records
+
+
+def _to_value(value):
+    try:
+        return int(value)
+    except ValueError:
+        return value
+
+
+class Snapshot(object):
+    """In-memory snapshot of all jsonplaceholder resources.
+
+    Used to compute expected bodies of filters and nested resources
+    locally instead of sending more requests.
+    """
+
+    def __init__(self, dataset):
+        """Build snapshot.
+
+        :param dataset: dict, resource name -> list of resource dicts
+        """
+        self.collections = {name: Collection(name, items)
+                            for name, items in dataset.items()}
+
+    @classmethod
+    def load(cls, client):
+        """Load snapshot of all resources from the tested service.
+
+        :param client: RESTAPIClient, client of the tested service
+        :return: Snapshot
+        """
+        names = list(RESOURCES)
+        results = client.get_many(['/{}'.format(name) for name in names])
+        dataset = {}
+        for name, (code, body) in zip(names, results):
+            if code != 200:
+                raise RuntimeError(
+                    'Can not load {!r} snapshot, response code {} != 200'
+                    .format(name, code))
+            dataset[name] = body
+        return cls(dataset)
+
+    def __getitem__(self, name):
+        return self.collections[name]
+
+    def expected(self, endpoint):
+        """Get expected body of resource endpoint.
+
+        :param endpoint: str, endpoint like /posts, /posts/1,
+        /users/1/posts or /posts?userId=1&userId=2
+        :return: list or dict, expected body
+        or None if resource does not exist
+        """
+        parts = urlsplit(endpoint)
+        segments = [segment for segment in parts.path.split('/') if segment]
+        criteria = {field: [_to_value(value) for value in values]
+                    for field, values in parse_qs(parts.query).items()}
+        if not segments or segments[0] not in self.collections:
+            return None
+        collection = self.collections[segments[0]]
+        if len(segments) == 1:
+            return collection.filter(**criteria)
+        resource_id = _to_value(segments[1])
+        if len(segments) == 2:
+            return collection.get(resource_id)
+        child = segments[2]
+        if len(segments) > 3 or \
+                PARENTS.get(child, (None,))[0] != collection.name or \
+                resource_id not in collection.by_id:
+            return None
+        criteria[PARENTS[child][1]] = [resource_id]
+        return self.collections[child].filter(**criteria)
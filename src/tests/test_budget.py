@@ -0,0 +1,8 @@
+import pytest
+
+
+@pytest.mark.default_endpoints
+@pytest.mark.latency_budget(ms=3000)
+def test_get_example_within_budget(client):
+    code, _ = client.get('/posts')
+    assert code == 200, 'Response code {} != 200 !'.format(code)
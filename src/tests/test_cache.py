@@ -0,0 +1,115 @@
+import pytest
+
+from src.cache import ResponseCache
+from src.client import RESTAPIClient
+
+
+class FakeClock(object):
+
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+
+@pytest.fixture
+def clock():
+    return FakeClock()
+
+
+@pytest.fixture
+def cached_client(local_url, clock):
+    client = RESTAPIClient(local_url, cache=ResponseCache(
+        maxsize=8, ttl=10, clock=clock))
+    yield client
+    client.close()
+
+
+def sent(client):
+    return client.connection_stats()['requests']
+
+
+def test_fresh_response_is_cached(cached_client, clock):
+    first = cached_client.get('/posts/1')
+    clock.now = 9
+    assert cached_client.get('/posts/1') == first, \
+        'Cached response should be returned!'
+    assert sent(cached_client) == 1, 'Fresh response should not be sent!'
+    assert cached_client.cache.stats()['hits'] == 1, \
+        'Cache stats: {}'.format(cached_client.cache.stats())
+
+
+def test_stale_response_is_revalidated(cached_client, clock):
+    first = cached_client.get('/posts/1')
+    clock.now = 11
+    assert cached_client.get('/posts/1') == first, \
+        'Revalidated response should be returned!'
+    assert sent(cached_client) == 2, 'Stale response should be revalidated!'
+    assert cached_client.cache.stats()['revalidations'] == 1, \
+        'Cache stats: {}'.format(cached_client.cache.stats())
+    clock.now = 20
+    cached_client.get('/posts/1')
+    assert sent(cached_client) == 2, \
+        'Revalidated response should be fresh for another ttl!'
+
+
+def test_stale_response_without_etag_is_fetched(cached_client, clock):
+    cached_client.get_allowed_methods('/posts')
+    clock.now = 11
+    cached_client.get_allowed_methods('/posts')
+    assert sent(cached_client) == 2, 'Stale response should be fetched!'
+    assert cached_client.cache.stats()['revalidations'] == 0, \
+        'Response without ETag can not be revalidated!'
+
+
+def test_least_recently_used_response_is_evicted(local_url, clock):
+    client = RESTAPIClient(local_url, cache=ResponseCache(
+        maxsize=2, ttl=10, clock=clock))
+    try:
+        for endpoint in ('/posts/1', '/posts/2', '/posts/1', '/posts/3'):
+            client.get(endpoint)
+        assert sent(client) == 3, 'Second /posts/1 should be cached!'
+        client.get('/posts/1')
+        assert sent(client) == 3, 'Recently used /posts/1 should be kept!'
+        client.get('/posts/2')
+        assert sent(client) == 4, \
+            'Least recently used /posts/2 should be evicted!'
+        assert len(client.cache) == 2, 'Cache should keep 2 responses!'
+    finally:
+        client.close()
+
+
+@pytest.mark.parametrize('written, dropped, kept', [
+    ('/comments/1',
+     ['/comments', '/comments?postId=1', '/posts/1/comments',
+      '/posts/2/comments', '/posts?_embed=comments'],
+     ['/posts/1', '/users?_embed=posts', '/albums/1/photos']),
+    ('/posts/1',
+     ['/posts/1', '/posts/1/comments', '/comments?_expand=post',
+      '/users/1/posts', '/posts?_embed=comments'],
+     ['/posts/2/comments', '/comments/1', '/users/1'])
+])
+def test_write_invalidates_dependent_responses(cached_client, written,
+                                               dropped, kept):
+    for endpoint in dropped + kept:
+        cached_client.get(endpoint)
+    cached_client.patch(written, json={'title': 'foo'})
+    before = sent(cached_client)
+    for endpoint in dropped:
+        cached_client.get(endpoint)
+    assert sent(cached_client) == before + len(dropped), \
+        'Responses depending on {} should be dropped!'.format(written)
+    for endpoint in kept:
+        cached_client.get(endpoint)
+    assert sent(cached_client) == before + len(dropped), \
+        'Responses not depending on {} should be kept!'.format(written)
+
+
+def test_write_invalidates_disabled_cache(cached_client):
+    cached_client.get('/posts/1')
+    with cached_client.cache.disabled():
+        cached_client.delete('/posts/1')
+    cached_client.get('/posts/1')
+    assert sent(cached_client) == 3, \
+        'Write bypassing the cache should invalidate it!'
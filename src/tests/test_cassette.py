@@ -0,0 +1,96 @@
+import json
+
+import pytest
+
+from src.cassette import FOOTER, Cassette, CassetteAdapter, CassetteMiss
+from src.client import RESTAPIClient
+
+EXCHANGES = [
+    ('GET', '/posts/1', {}),
+    ('GET', '/comments', {'params': {'postId': 1}}),
+    ('POST', '/posts', {'json': {'title': 'foo', 'body': 'bar',
+                                 'userId': 1}})
+]
+
+
+def run_exchanges(url, cassette, send=True):
+    client = RESTAPIClient(url)
+    adapter = client.adapter if send else None
+    client.mount(CassetteAdapter(cassette, adapter))
+    try:
+        return [client._request(method, endpoint, **kwargs)
+                for method, endpoint, kwargs in EXCHANGES]
+    finally:
+        client.close()
+
+
+def test_recorded_exchanges_are_replayed(local_url, tmp_path):
+    path = str(tmp_path / 'test.cassette')
+    with Cassette(path, 'record') as cassette:
+        recorded = run_exchanges(local_url, cassette)
+    with open(path, 'rb') as cassette_file:
+        data = cassette_file.read()
+    index_offset, = FOOTER.unpack(data[-FOOTER.size:])
+    index = json.loads(data[index_offset:-FOOTER.size])
+    assert len(index) == len(EXCHANGES), \
+        'Every exchange should be indexed: {}'.format(index)
+    for status, reason, headers, offset, length in index.values():
+        assert offset + length <= index_offset, \
+            'Bodies should be written before the index!'
+    # NOTE: Nothing listens on port 1, so responses come from the file
+    with Cassette(path, 'replay') as cassette:
+        assert len(cassette) == len(EXCHANGES)
+        replayed = run_exchanges('http://127.0.0.1:1/', cassette,
+                                 send=False)
+    for before, after in zip(recorded, replayed):
+        assert (after.status_code, after.reason, after.content) == \
+            (before.status_code, before.reason, before.content), \
+            'Replayed response of {} differs from the recorded one!'.format(
+                before.url)
+        assert after.headers['Content-Type'] == \
+            before.headers['Content-Type'], 'Headers should be replayed!'
+
+
+def test_missing_exchange_is_not_sent(local_url, tmp_path):
+    path = str(tmp_path / 'test.cassette')
+    with Cassette(path, 'record') as cassette:
+        run_exchanges(local_url, cassette)
+    with Cassette(path, 'replay') as cassette:
+        client = RESTAPIClient(local_url)
+        client.mount(CassetteAdapter(cassette))
+        try:
+            with pytest.raises(CassetteMiss):
+                client.get('/posts/2')
+        finally:
+            client.close()
+        assert len(cassette) == len(EXCHANGES), \
+            'Missing exchange should not be recorded!'
+
+
+def test_auto_mode_adds_new_exchanges(local_url, tmp_path):
+    path = str(tmp_path / 'test.cassette')
+    with Cassette(path, 'record') as cassette:
+        run_exchanges(local_url, cassette)
+    with Cassette(path, 'auto') as cassette:
+        client = RESTAPIClient(local_url)
+        client.mount(CassetteAdapter(cassette, client.adapter))
+        try:
+            code, body = client.get('/posts/2')
+            run_exchanges(local_url, cassette, send=False)
+        finally:
+            client.close()
+    with Cassette(path, 'replay') as cassette:
+        assert len(cassette) == len(EXCHANGES) + 1, \
+            'Saved cassette should keep old exchanges and add new ones!'
+        client = RESTAPIClient('http://127.0.0.1:1/')
+        client.mount(CassetteAdapter(cassette))
+        try:
+            assert client.get('/posts/2') == (code, body), \
+                'New exchange should be replayed!'
+        finally:
+            client.close()
+
+
+def test_replay_of_missing_cassette_fails(tmp_path):
+    with pytest.raises(IOError):
+        Cassette(str(tmp_path / 'missing.cassette'), 'replay')
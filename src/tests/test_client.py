@@ -0,0 +1,241 @@
+import asyncio
+
+import pytest
+from requests import ConnectionError, Request
+from requests.adapters import BaseAdapter
+from requests.exceptions import ChunkedEncodingError
+
+from src.async_client import AsyncRESTAPIClient, run_many
+from src.client import RESTAPIClient
+from src.limiter import AdaptiveLimiter
+from src.resilience import CircuitOpen, ResilientAdapter
+
+
+def test_get_examples_multiplexed(h2c_url):
+    endpoints = ['/{}/{}'.format(resource, resource_id)
+                 for resource in ('posts', 'comments', 'albums', 'photos',
+                                  'users', 'todos')
+                 for resource_id in range(1, 11)]
+    client = RESTAPIClient(h2c_url, http2=True, max_workers=20)
+    try:
+        codes = [code for code, body in client.get_many(endpoints)]
+        stats = client.connection_stats()
+    finally:
+        client.close()
+    assert codes == [200] * len(endpoints), \
+        'Response codes {} != 200 !'.format(codes)
+    assert stats['connections'] == 1, \
+        'Concurrent requests should share one connection: {}'.format(stats)
+
+
+def test_http2_honours_proxies(h2c_url):
+    client = RESTAPIClient(h2c_url, http2=True)
+    try:
+        code, _ = client.get('/posts/1')
+        # NOTE: Nothing listens on port 1, a request through it fails
+        client.session.proxies = {'http': 'http://127.0.0.1:1'}
+        with pytest.raises(ConnectionError):
+            client.get('/posts/2')
+    finally:
+        client.close()
+    assert code == 200, 'Response code {} != 200 !'.format(code)
+
+
+def test_get_many_keeps_order_and_errors(local_url):
+    post_ids = [7, 0, 3, 1000, 1, 42]
+    client = RESTAPIClient(local_url, max_workers=4)
+    try:
+        results = client.get_many(
+            ['/posts/{}'.format(post_id) for post_id in post_ids])
+    finally:
+        client.close()
+    codes = [code for code, body in results]
+    assert codes == [200, 404, 200, 404, 200, 200], \
+        'Missing posts should get 404 in place: {}'.format(codes)
+    ids = [body['id'] for code, body in results if code == 200]
+    assert ids == [7, 3, 1, 42], \
+        'Bodies should be in the order of endpoints: {}'.format(ids)
+
+
+def test_retries_transient_errors(flaky_url):
+    endpoints = ['/posts/{}'.format(post_id) for post_id in range(1, 51)]
+    client = RESTAPIClient(flaky_url)
+    resilience = ResilientAdapter(client.adapter, max_retries=5,
+                                  backoff=0.001, failure_threshold=0)
+    client.mount(resilience)
+    try:
+        codes = [code for code, body in client.get_many(endpoints)]
+    finally:
+        client.close()
+    assert codes == [200] * len(endpoints), \
+        'Transient errors should be retried: {}'.format(codes)
+    assert resilience.retry_stats()['retries'] > 0, \
+        'Some requests should be retried!'
+
+
+def test_circuit_breaker_fails_fast(flaky_url):
+    client = RESTAPIClient(flaky_url)
+    resilience = ResilientAdapter(client.adapter, max_retries=0,
+                                  failure_threshold=1, reset_timeout=60)
+    client.mount(resilience)
+    codes = []
+    try:
+        with pytest.raises(CircuitOpen):
+            for _ in range(100):
+                codes.append(client.get('/posts/1')[0])
+        with pytest.raises(CircuitOpen):
+            client.get('/posts/1')
+    finally:
+        client.close()
+    assert codes[-1] == 503, 'The circuit should open after 503!'
+    assert resilience.retry_stats()['fast_failed'] == 2, \
+        'Requests should fail while the circuit is open!'
+
+
+def test_failed_after_retries_counted(flaky_url):
+    endpoints = ['/posts/{}'.format(post_id) for post_id in range(1, 101)]
+    client = RESTAPIClient(flaky_url)
+    resilience = ResilientAdapter(client.adapter, max_retries=1,
+                                  backoff=0.001, failure_threshold=0)
+    client.mount(resilience)
+    try:
+        codes = [code for code, body in client.get_many(endpoints)]
+    finally:
+        client.close()
+    assert 503 in codes, 'Some requests should fail after a retry!'
+    assert resilience.retry_stats()['failed'] == codes.count(503), \
+        'Every 503 returned after retries should be counted!'
+
+
+class _BrokenBodyAdapter(BaseAdapter):
+
+    def send(self, request, **kwargs):
+        raise ChunkedEncodingError('Connection broken', request=request)
+
+    def close(self):
+        pass
+
+
+def test_circuit_breaker_reopens_on_any_error():
+    resilience = ResilientAdapter(_BrokenBodyAdapter(), max_retries=0,
+                                  failure_threshold=1, reset_timeout=0)
+    request = Request('GET', 'http://localhost/posts/1').prepare()
+    for _ in range(3):
+        # NOTE: The circuit is probed at once, the probe fails as well
+        with pytest.raises(ChunkedEncodingError):
+            resilience.send(request)
+    stats = resilience.retry_stats()
+    assert stats['failed'] == 3 and stats['fast_failed'] == 0, \
+        'A failed probe should open the circuit again: {}'.format(stats)
+
+
+def test_adaptive_limit_backs_off_on_errors(flaky_url):
+    endpoints = ['/posts/{}'.format(post_id) for post_id in range(1, 101)]
+    limiter = AdaptiveLimiter(initial=8, max_limit=16)
+    client = RESTAPIClient(flaky_url, pool_maxsize=16, limiter=limiter)
+    try:
+        codes = [code for code, body in client.get_many(endpoints)]
+    finally:
+        client.close()
+    stats = limiter.stats()
+    assert stats['completed'] == len(endpoints) and \
+        stats['failed'] == codes.count(503), \
+        'Every batched request should be counted: {}'.format(stats)
+    assert stats['decreases'] > 0 and stats['limit'] < 16, \
+        'The limit should decrease on errors: {}'.format(stats)
+
+
+def test_adaptive_limit_holds_on_healthy_server(local_url):
+    endpoints = ['/posts/{}'.format(post_id % 100 + 1)
+                 for post_id in range(200)]
+    limiter = AdaptiveLimiter(max_limit=8)
+    client = RESTAPIClient(local_url, pool_maxsize=8, limiter=limiter,
+                           coalesce=False)
+    try:
+        client.get_many(endpoints)
+    finally:
+        client.close()
+    stats = limiter.stats()
+    assert stats['failed'] == 0 and stats['limit'] == 8, \
+        'The limit should not shrink on a healthy server: {}'.format(stats)
+
+
+def test_concurrent_identical_gets_coalesced(slow_url):
+    client = RESTAPIClient(slow_url, max_workers=10)
+    try:
+        results = client.get_many(['/albums/1/photos'] * 10)
+        stats = client.coalesce_stats()
+        sent = client.connection_stats()['requests']
+    finally:
+        client.close()
+    assert [code for code, _ in results] == [200] * 10, \
+        'Response codes should be 200: {}'.format(results)
+    assert stats['coalesced'] > 0 and sent < 10, \
+        'Identical requests in flight should be sent once: {}, {} sent' \
+        .format(stats, sent)
+    assert results[0][1] == results[1][1] and \
+        results[0][1] is not results[1][1], \
+        'Every caller should get its own copy of the body!'
+
+
+def test_concurrent_identical_gets_coalesced_async(slow_url):
+    async def get_many():
+        async with AsyncRESTAPIClient(slow_url) as client:
+            results = await client.gather_many(['/posts/1/comments'] * 10)
+            return results, client.coalesce_stats()
+
+    loop = asyncio.new_event_loop()
+    try:
+        results, stats = loop.run_until_complete(get_many())
+    finally:
+        loop.close()
+    assert [code for code, _ in results] == [200] * 10, \
+        'Response codes should be 200: {}'.format(results)
+    assert stats == {'calls': 1, 'coalesced': 9}, \
+        'Identical requests in flight should be sent once: {}'.format(stats)
+
+
+def test_bulk_write_reports_connection_errors():
+    limiter = AdaptiveLimiter(initial=2, max_limit=4)
+    # NOTE: Nothing listens on port 1, every connection is refused
+    client = RESTAPIClient('http://127.0.0.1:1/', limiter=limiter)
+    try:
+        bulk = client.post_many([('/posts', {'title': 'foo'})] * 3)
+        results = bulk.results()
+    finally:
+        client.close()
+    assert results == [(None, None)] * 3, \
+        'Failed writes should have no response: {}'.format(results)
+    assert [failure[0] for failure in bulk.failures] == [0, 1, 2], \
+        'Every write should fail: {}'.format(bulk.report())
+    assert limiter.stats()['failed'] == 3, \
+        'Connection errors should count as failures: {}'.format(
+            limiter.stats())
+
+
+@pytest.mark.default_endpoints
+@pytest.mark.parametrize('endpoint, page_size', [
+    ('/comments', 100),
+    ('/photos', 333),
+    ('/albums/1/photos', 7),
+    ('/posts?userId=1', 3),
+    ('/posts?userId=11', 10)
+])
+def test_paginate_example(client, snapshot, endpoint, page_size):
+    items = list(client.paginate(endpoint, page_size=page_size, prefetch=2))
+    assert items == snapshot.expected(endpoint), \
+        'Paginated items of {!r} differ from the collection!'.format(
+            endpoint)
+
+
+@pytest.mark.default_endpoints
+def test_get_examples_concurrently(request, client):
+    if request.config.getoption('cassette') == 'replay':
+        pytest.skip('Requests of the asyncio client are not replayed')
+    if request.config.getoption('http2'):
+        pytest.skip('The asyncio client does not speak HTTP/2')
+    endpoints = ['/posts', '/comments', '/albums', '/photos', '/users',
+                 '/todos']
+    codes = [code for code, body in run_many(client.url, endpoints)]
+    assert codes == [200] * len(endpoints), \
+        'Response codes {} != 200 !'.format(codes)
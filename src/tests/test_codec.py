@@ -0,0 +1,17 @@
+import pytest
+
+from src.codec import CODECS
+
+
+@pytest.mark.parametrize('codec_cls', CODECS,
+                         ids=[codec_cls.name for codec_cls in CODECS])
+@pytest.mark.parametrize('data', [b'', b'{"id": ', b'[1,]', b'nul',
+                                  b'"\xff"'])
+def test_invalid_json_raises_value_error(codec_cls, data):
+    try:
+        codec = codec_cls()
+    except ImportError:
+        pytest.skip('{} is not installed'.format(codec_cls.name))
+    # NOTE: Callers catch ValueError whatever codec is used
+    with pytest.raises(ValueError):
+        codec.loads(data)
@@ -0,0 +1,44 @@
+import pytest
+
+from src.contract import (check_embedded, check_expanded, check_integrity,
+                          format_violations)
+from src.dataset import RESOURCES
+
+
+@pytest.mark.default_endpoints
+@pytest.mark.parametrize('resource, child', [
+    ('posts', 'comments'),
+    ('albums', 'photos'),
+    ('users', 'posts'),
+    ('users', 'albums'),
+    ('users', 'todos')
+])
+def test_embedded_children(client, snapshot, resource, child):
+    code, parents = client.get('/' + resource, embed=child)
+    assert code == 200, 'Response code {} != 200 !'.format(code)
+    violations = check_embedded(parents, resource, child, snapshot)
+    assert not violations, 'Embedded {} are not consistent:\n{}'.format(
+        child, format_violations(violations))
+
+
+@pytest.mark.default_endpoints
+@pytest.mark.parametrize('endpoint, parent', [
+    ('/comments', 'post'),
+    ('/photos?albumId=1', 'album'),
+    ('/users/1/todos', 'user')
+])
+def test_expanded_parents(client, endpoint, parent):
+    code, children = client.get(endpoint, expand=parent)
+    assert code == 200, 'Response code {} != 200 !'.format(code)
+    resource = endpoint.split('?')[0].rsplit('/', 1)[-1]
+    violations = check_expanded(children, resource)
+    assert children and not violations, \
+        'Expanded {}s are not consistent:\n{}'.format(
+            parent, format_violations(violations))
+
+
+@pytest.mark.default_endpoints
+def test_collections_integrity(snapshot):
+    violations = check_integrity(snapshot, counts=RESOURCES)
+    assert not violations, 'Collections are not consistent:\n{}'.format(
+        format_violations(violations))
@@ -0,0 +1,53 @@
+import pytest
+
+from src.fuzz import endpoint_case, expected_code, run_fuzz
+from src.tests import (test_album_actions, test_comment_actions,
+                       test_photo_actions, test_post_actions,
+                       test_todo_actions, test_user_actions)
+
+# NOTE: Kind of test function, e.g. test_create_post -> method
+METHODS = {'get': 'GET', 'create': 'POST', 'update': 'PUT',
+           'delete': 'DELETE'}
+
+
+def _table_rows():
+    for module in (test_album_actions, test_comment_actions,
+                   test_photo_actions, test_post_actions, test_todo_actions,
+                   test_user_actions):
+        for name, func in sorted(vars(module).items()):
+            kind = name.split('_')[1] if name.startswith('test_') else None
+            if kind not in METHODS:
+                continue
+            for mark in getattr(func, 'pytestmark', []):
+                if mark.name != 'parametrize':
+                    continue
+                names = [arg.strip() for arg in mark.args[0].split(',')]
+                for values in mark.args[1]:
+                    row = dict(zip(names, values))
+                    yield (METHODS[kind], row['endpoint'], row.get('data'),
+                           row['expected_code'])
+
+
+@pytest.mark.parametrize('method, endpoint, data, code', list(_table_rows()))
+def test_expected_code_follows_tables(method, endpoint, data, code):
+    expected = expected_code(endpoint_case(method, endpoint, data))
+    assert expected == code, \
+        'Fuzzer expects {} for {} {} {}, the tables {}'.format(
+            expected, method, endpoint, data, code)
+
+
+@pytest.mark.default_endpoints
+def test_generated_requests(request, base_url):
+    if request.config.getoption('cassette') == 'replay':
+        pytest.skip('Requests of the asyncio client are not replayed')
+    if request.config.getoption('http2'):
+        pytest.skip('The asyncio client does not speak HTTP/2')
+    # NOTE: A shared service gets a few requests at a time and a few
+    #  failures are shrunk
+    cases, concurrency, max_failures = (500, 16, 10) \
+        if request.config.getoption('target') == 'local' else (50, 2, 3)
+    fuzzer = run_fuzz(base_url, cases, seed=0, concurrency=concurrency,
+                      max_failures=max_failures)
+    assert not fuzzer.failed, \
+        'Generated requests got unexpected codes:\n{}'.format(
+            fuzzer.report())
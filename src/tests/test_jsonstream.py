@@ -0,0 +1,16 @@
+import pytest
+
+
+@pytest.mark.default_endpoints
+@pytest.mark.parametrize('endpoint', [
+    '/posts',
+    '/comments',
+    '/albums',
+    '/photos',
+    '/users',
+    '/todos'
+])
+def test_iter_get_example(client, snapshot, endpoint):
+    items = list(client.iter_get(endpoint))
+    assert items == snapshot.expected(endpoint), \
+        'Streamed items of {!r} differ from the collection!'.format(endpoint)
@@ -15,7 +15,7 @@ from src.utils import check_fields
         ('/albums/101/photos', 404)
     ])
 def test_get_photo(client, endpoint, expected_code):
-    code, body = client.get(endpoint)
+    code, _ = client.get(endpoint, status_only=True)
     assert code == expected_code, \
         'Actual response code does not equal expected code: {} != {}' \
         .format(code, expected_code)
@@ -156,7 +156,7 @@ def test_update_photo(client, endpoint, data, expected_code):
         ('/photos/5001', 404)
     ])
 def test_delete_photo(client, endpoint, expected_code):
-    code, body = client.delete(endpoint)
+    code, _ = client.delete(endpoint, status_only=True)
     assert code == expected_code, \
         'Actual response code does not equal expected code: {} != {}' \
         .format(code, expected_code)
@@ -176,7 +176,7 @@ def test_delete_photo(client, endpoint, expected_code):
         ('/photos?albumId=1&albumId=2',
          ['/albums/1/photos', '/albums/2/photos'])
     ])
-def test_filter_photos(client, filter_endpoint, check_endpoints):
+def test_filter_photos(client, snapshot, filter_endpoint, check_endpoints):
     code, body = client.get(filter_endpoint)
     assert code == 200, \
         'Actual response code does not equal expected code: {} != 200' \
@@ -185,8 +185,7 @@ def test_filter_photos(client, filter_endpoint, check_endpoints):
         return
 
     check_bodies = []
-    for check_endpoint in check_endpoints:
-        _, check_body = client.get(check_endpoint)
+    for check_body in map(snapshot.expected, check_endpoints):
         if isinstance(check_body, list):
             check_bodies.extend(check_body)
         else:
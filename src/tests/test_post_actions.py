@@ -15,7 +15,7 @@ from src.utils import check_fields
         ('/users/11/posts', 404)
     ])
 def test_get_post(client, endpoint, expected_code):
-    code, body = client.get(endpoint)
+    code, _ = client.get(endpoint, status_only=True)
     assert code == expected_code, \
         'Actual response code does not equal expected code: {} != {}' \
         .format(code, expected_code)
@@ -112,12 +112,32 @@ def test_update_post(client, endpoint, data, expected_code):
         ('/posts/101', 404)
     ])
 def test_delete_post(client, endpoint, expected_code):
-    code, body = client.delete(endpoint)
+    code, _ = client.delete(endpoint, status_only=True)
     assert code == expected_code, \
         'Actual response code does not equal expected code: {} != {}' \
         .format(code, expected_code)
 
 
+@pytest.mark.posts
+def test_write_posts_in_bulk(client):
+    data = {'title': 'foo', 'body': 'bar', 'userId': 1}
+    writes = [('/posts', data)] * 20 + [('/posts', {'id': 1})]
+    bulk = client.post_many(writes)
+    results = bulk.results()
+    assert [code for code, _ in results] == [201] * 20 + [400], \
+        'Response codes are not in the order of requests: {}'.format(
+            bulk.report())
+    assert all(check_fields(data, body) for _, body in results[:20]), \
+        'Received data should contain all fields of sent data!'
+    assert [index for index, _, _, _ in bulk.failures] == [20], \
+        'Only the invalid post should fail: {}'.format(bulk.report())
+    codes = [code for code, _ in client.delete_many(
+        ['/posts/{}'.format(post_id) for post_id in range(1, 102)],
+        status_only=True)]
+    assert codes == [200] * 100 + [404], \
+        'Response codes are not in the order of requests: {}'.format(codes)
+
+
 @pytest.mark.posts
 @pytest.mark.parametrize(
     'filter_endpoint, check_endpoints',
@@ -131,7 +151,7 @@ def test_delete_post(client, endpoint, expected_code):
         ('/posts?userId=1', ['/users/1/posts']),
         ('/posts?userId=1&userId=2', ['/users/1/posts', '/users/2/posts'])
     ])
-def test_filter_posts(client, filter_endpoint, check_endpoints):
+def test_filter_posts(client, snapshot, filter_endpoint, check_endpoints):
     code, body = client.get(filter_endpoint)
     assert code == 200, \
         'Actual response code does not equal expected code: {} != 200' \
@@ -140,8 +160,7 @@ def test_filter_posts(client, filter_endpoint, check_endpoints):
         return
 
     check_bodies = []
-    for check_endpoint in check_endpoints:
-        _, check_body = client.get(check_endpoint)
+    for check_body in map(snapshot.expected, check_endpoints):
         if isinstance(check_body, list):
             check_bodies.extend(check_body)
         else:
@@ -0,0 +1,23 @@
+import pytest
+
+from src.server import LocalApp
+
+
+@pytest.mark.parametrize(
+    'path, expected_code',
+    [
+        ('/posts', 204),
+        ('/posts/1', 204),
+        ('/users/1/posts', 204),
+        ('/unknown', 404),
+        ('/posts/101', 404),
+        ('/users/11/posts', 404),
+        ('/posts/1/comments/1', 404)
+    ])
+def test_options_of_path(path, expected_code):
+    code, headers, _ = LocalApp().handle('OPTIONS', path)
+    assert code == expected_code, \
+        'Response code of OPTIONS {} {} != {} !'.format(
+            path, code, expected_code)
+    assert ('Access-Control-Allow-Methods' in headers) == (code == 204), \
+        'Only known paths should list allowed methods!'
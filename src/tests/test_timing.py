@@ -0,0 +1,24 @@
+import pytest
+
+
+@pytest.mark.default_endpoints
+@pytest.mark.no_cache
+def test_get_example_timing(request, client):
+    timings = []
+    client.add_timing_listener(timings.append)
+    try:
+        code, _ = client.get('/posts')
+    finally:
+        client.remove_timing_listener(timings.append)
+    assert [(timing.method, timing.endpoint, timing.status)
+            for timing in timings] == [('GET', '/posts', code)], \
+        'Call should be timed once!'
+    phases = timings[0].phases()
+    expected_phases = {'download', 'decode', 'total'}
+    # NOTE: A response replayed from a cassette has not been waited for
+    if not request.config.getoption('cassette'):
+        expected_phases.add('ttfb')
+    assert expected_phases <= set(phases), \
+        'Phases {} should be timed!'.format(sorted(phases))
+    assert sum(phases.values()) - phases['total'] <= phases['total'], \
+        'Phases should take less time than the whole call!'
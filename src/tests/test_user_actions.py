@@ -13,12 +13,14 @@ from src.utils import check_fields
         ('/users/11', 404)
     ])
 def test_get_user(client, endpoint, expected_code):
-    code, body = client.get(endpoint)
+    # NOTE: Body is read only when there is a resource to check
+    result = client.get(endpoint, lazy=True)
+    code = result.status
     assert code == expected_code, \
         'Actual response code does not equal expected code: {} != {}'\
         .format(code, expected_code)
     if code == 200:
-        assert body.get('id'), 'The resource does not have ID!'
+        assert result.body.get('id'), 'The resource does not have ID!'
 
 
 @pytest.mark.users
@@ -52,9 +54,10 @@ def test_get_user(client, endpoint, expected_code):
         ('/users/1', {'id': 1}, 400)
     ])
 def test_create_user(client, endpoint, data, expected_code):
+    # NOTE: Nested address and company can not be form encoded
     code, body = client.post(
         endpoint,
-        data=data)
+        json=data)
     assert code == expected_code, \
         'Actual response code does not equal expected code: {} != {}'\
         .format(code, expected_code)
@@ -97,9 +100,10 @@ def test_create_user(client, endpoint, data, expected_code):
         ('/users/11', {}, 404)
     ])
 def test_update_user(client, endpoint, data, expected_code):
+    # NOTE: Nested address and company can not be form encoded
     code, body = client.put(
         endpoint,
-        data=data)
+        json=data)
     assert code == expected_code, \
         'Actual response code does not equal expected code: {} != {}'\
         .format(code, expected_code)
@@ -122,7 +126,7 @@ def test_update_user(client, endpoint, data, expected_code):
         ('/users/11', 404)
     ])
 def test_delete_user(client, endpoint, expected_code):
-    code, body = client.delete(endpoint)
+    code, _ = client.delete(endpoint, status_only=True)
     assert code == expected_code, \
         'Actual response code does not equal expected code: {} != {}' \
         .format(code, expected_code)
@@ -139,13 +143,14 @@ def test_delete_user(client, endpoint, expected_code):
         ('/users?id=11&id=1', ['/users/1']),
         ('/users?id=10&id=1', ['/users/1', '/users/10'])
     ])
-def test_filter_users_by_id(client, filter_endpoint, check_endpoints):
+def test_filter_users_by_id(client, snapshot, filter_endpoint,
+                            check_endpoints):
     code, body = client.get(filter_endpoint)
     assert code == 200, \
         'Actual response code does not equal expected code: {} != 200' \
         .format(code)
     if not check_endpoints:
         return
-    check_bodies = [client.get(check_endpoint)[1]
+    check_bodies = [snapshot.expected(check_endpoint)
                     for check_endpoint in check_endpoints]
     assert body == check_bodies, 'Filter does not work!'
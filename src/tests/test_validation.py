@@ -0,0 +1,20 @@
+import pytest
+
+from src.validation import format_mismatches, get_validator
+
+
+@pytest.mark.default_endpoints
+@pytest.mark.parametrize('endpoint', [
+    '/posts',
+    '/comments',
+    '/albums',
+    '/photos',
+    '/users',
+    '/todos'
+])
+def test_get_example_schema(client, endpoint):
+    code, body = client.get(endpoint)
+    assert code == 200, 'Response code {} != 200 !'.format(code)
+    mismatches = get_validator(endpoint.strip('/')).validate_many(body)
+    assert not mismatches, 'Resources of {!r} do not match schema:\n{}'\
+        .format(endpoint, format_mismatches(mismatches))
@@ -0,0 +1,232 @@
+"""Timing of requests sent by RESTAPIClient.
+
+A call is split into phases: DNS lookup, TCP connect, TLS handshake,
+time to first byte (from the request being sent to the response headers),
+body download and JSON decode. The first three are measured only when a
+new connection is opened, a call served from a kept-alive connection or
+from the response cache has no time for them.
+"""
+import bisect
+import socket
+import threading
+import time
+from contextlib import contextmanager
+
+from requests.adapters import HTTPAdapter
+from urllib3.connection import HTTPConnection, HTTPSConnection
+from urllib3.connectionpool import HTTPConnectionPool, HTTPSConnectionPool
+from urllib3.exceptions import ConnectTimeoutError, NewConnectionError
+from urllib3.util.connection import allowed_gai_family
+
+PHASES = ('dns', 'connect', 'tls', 'ttfb', 'download', 'decode')
+
+# NOTE: Upper bounds of histogram buckets in milliseconds
+BUCKETS = (1, 2, 5, 10, 20, 50, 100, 200, 500, 1000, 2000, 5000)
+_BUCKET_KEYS = ['le_{}'.format(bound) for bound in BUCKETS] + ['inf']
+
+_local = threading.local()
+
+
+class Timing(object):
+    """Timings of one client call in seconds, None if phase did not run."""
+
+    __slots__ = ('method', 'endpoint', 'status', 'total') + PHASES
+
+    def __init__(self):
+        self.method = self.endpoint = self.status = self.total = None
+        for phase in PHASES:
+            setattr(self, phase, None)
+
+    def add(self, phase, seconds):
+        """Add time to phase, e.g. of a repeated request.
+
+        :param phase: str, name of phase
+        :param seconds: float, time spent in the phase
+        """
+        setattr(self, phase, (getattr(self, phase) or 0) + seconds)
+
+    def phases(self):
+        """Get timings of phases which ran, including total.
+
+        :return: dict, name of phase -> seconds
+        """
+        timings = {phase: getattr(self, phase) for phase in PHASES
+                   if getattr(self, phase) is not None}
+        timings['total'] = self.total
+        return timings
+
+
+def current_timing():
+    """Get timing of the call being made in this thread.
+
+    :return: Timing or None if the call is not timed
+    """
+    return getattr(_local, 'timing', None)
+
+
+@contextmanager
+def timed(listeners):
+    """Time the call made within the context.
+
+    :param listeners: list, callables taking Timing, they are called when
+    the context exits without an error, the call is not timed if empty
+    :return: context manager, yields Timing or None if not timed
+    """
+    # NOTE: A call made within another one, e.g. get_allowed_methods
+    #  using _request, is timed once by the outer context
+    if not listeners or current_timing() is not None:
+        yield None
+        return
+    timing = _local.timing = Timing()
+    start = time.perf_counter()
+    try:
+        yield timing
+    finally:
+        timing.total = time.perf_counter() - start
+        _local.timing = None
+    for listener in list(listeners):
+        listener(timing)
+
+
+class _TimedConnectionMixin(object):
+
+    def _new_conn(self):
+        timing = current_timing()
+        if timing is None:
+            return super(_TimedConnectionMixin, self)._new_conn()
+        start = time.perf_counter()
+        host = self._dns_host
+        try:
+            addresses = [info[4][0] for info in socket.getaddrinfo(
+                host, self.port, allowed_gai_family(), socket.SOCK_STREAM)]
+        except socket.gaierror:
+            # NOTE: Let urllib3 resolve it again and raise its own error
+            addresses = [host]
+        resolved = time.perf_counter()
+        timing.add('dns', resolved - start)
+        # NOTE: Connect to the resolved addresses one by one like
+        #  urllib3.util.connection.create_connection, so the lookup is
+        #  not repeated, host name is still used for TLS
+        try:
+            for address in addresses:
+                self._dns_host = address
+                try:
+                    conn = super(_TimedConnectionMixin, self)._new_conn()
+                    break
+                except (ConnectTimeoutError, NewConnectionError) as e:
+                    error = e
+            else:
+                raise error
+        finally:
+            self._dns_host = host
+        timing.add('connect', time.perf_counter() - resolved)
+        return conn
+
+    def getresponse(self, *args, **kwargs):
+        timing = current_timing()
+        if timing is None:
+            return super(_TimedConnectionMixin, self).getresponse(
+                *args, **kwargs)
+        start = time.perf_counter()
+        resp = super(_TimedConnectionMixin, self).getresponse(
+            *args, **kwargs)
+        timing.add('ttfb', time.perf_counter() - start)
+        return resp
+
+
+class TimedHTTPConnection(_TimedConnectionMixin, HTTPConnection):
+    pass
+
+
+class TimedHTTPSConnection(_TimedConnectionMixin, HTTPSConnection):
+
+    def connect(self):
+        timing = current_timing()
+        if timing is None:
+            return super(TimedHTTPSConnection, self).connect()
+        dns, connect = timing.dns or 0, timing.connect or 0
+        start = time.perf_counter()
+        super(TimedHTTPSConnection, self).connect()
+        # NOTE: The socket is opened by _new_conn within connect, the rest
+        #  of it is the handshake
+        opened = (timing.dns or 0) - dns + (timing.connect or 0) - connect
+        timing.add('tls', time.perf_counter() - start - opened)
+
+
+class TimedHTTPConnectionPool(HTTPConnectionPool):
+    ConnectionCls = TimedHTTPConnection
+
+
+class TimedHTTPSConnectionPool(HTTPSConnectionPool):
+    ConnectionCls = TimedHTTPSConnection
+
+
+class TimedHTTPAdapter(HTTPAdapter):
+    """Transport adapter opening connections which time their phases."""
+
+    def init_poolmanager(self, *args, **kwargs):
+        super(TimedHTTPAdapter, self).init_poolmanager(*args, **kwargs)
+        self.poolmanager.pool_classes_by_scheme = {
+            'http': TimedHTTPConnectionPool,
+            'https': TimedHTTPSConnectionPool
+        }
+
+    def connection_stats(self):
+        """Get number of opened connections and sent requests."""
+        connections = requests_count = 0
+        for key in self.poolmanager.pools.keys():
+            pool = self.poolmanager.pools[key]
+            connections += pool.num_connections
+            requests_count += pool.num_requests
+        return {'connections': connections, 'requests': requests_count}
+
+
+class Histogram(object):
+    """Histogram of durations with buckets of BUCKETS milliseconds."""
+
+    def __init__(self):
+        self.counts = [0] * (len(BUCKETS) + 1)
+        self.count = 0
+        self.sum = 0.0
+        self.max = 0.0
+
+    def add(self, seconds):
+        milliseconds = seconds * 1000
+        self.counts[bisect.bisect_left(BUCKETS, milliseconds)] += 1
+        self.count += 1
+        self.sum += milliseconds
+        self.max = max(self.max, milliseconds)
+
+    def merge(self, other):
+        self.counts = [a + b for a, b in zip(self.counts, other.counts)]
+        self.count += other.count
+        self.sum += other.sum
+        self.max = max(self.max, other.max)
+
+    @property
+    def mean(self):
+        return self.sum / self.count if self.count else 0.0
+
+    def to_dict(self):
+        """Convert to dict with durations in milliseconds.
+
+        :return: dict, count, sum, max and counts of non-empty buckets
+        keyed by their upper bound like "le_5", the last one is "inf"
+        """
+        return {
+            'count': self.count,
+            'sum': round(self.sum, 3),
+            'max': round(self.max, 3),
+            'buckets': {key: count for key, count
+                        in zip(_BUCKET_KEYS, self.counts) if count}
+        }
+
+    @classmethod
+    def from_dict(cls, data):
+        histogram = cls()
+        histogram.counts = [data['buckets'].get(key, 0)
+                            for key in _BUCKET_KEYS]
+        histogram.count = data['count']
+        histogram.sum = data['sum']
+        histogram.max = data['max']
+        return histogram
@@ -0,0 +1,122 @@
+"""Report of request timings per test and per endpoint template.
+
+Histograms of the timing phases are written into junit XML properties
+of every test (and of the test suite for endpoint templates) and into
+a JSON report, so runs can be compared with each other.
+"""
+import json
+import threading
+from collections import defaultdict
+
+import pytest
+
+from src.distribute import _is_worker
+from src.timing import Histogram
+from src.utils import endpoint_template
+
+TIMINGS_KEY = 'timings'
+
+
+def _histograms():
+    return defaultdict(Histogram)
+
+
+class TimingReportPlugin(object):
+
+    def __init__(self, config, path):
+        """Collect timings of client calls.
+
+        :param config: pytest.Config
+        :param path: str, path of JSON report
+        """
+        self.config = config
+        self.path = path
+        self.by_test = defaultdict(_histograms)
+        self.by_template = defaultdict(_histograms)
+        self._nodeid = None
+        self._lock = threading.Lock()
+
+    def record(self, timing):
+        """Add timing of a call made by the test being run.
+
+        :param timing: src.timing.Timing
+        """
+        template = '{} {}'.format(timing.method,
+                                  endpoint_template(timing.endpoint or '/'))
+        phases = timing.phases()
+        with self._lock:
+            for key, histograms in ((self._nodeid, self.by_test),
+                                    (template, self.by_template)):
+                if key is None:
+                    continue
+                for phase, seconds in phases.items():
+                    histograms[key][phase].add(seconds)
+
+    @pytest.hookimpl(tryfirst=True)
+    def pytest_runtest_setup(self, item):
+        self._nodeid = item.nodeid
+
+    @pytest.hookimpl(hookwrapper=True)
+    def pytest_runtest_teardown(self, item):
+        yield
+        # NOTE: junit XML takes properties of the teardown report
+        histograms = self.by_test.get(self._nodeid, {})
+        for phase, histogram in sorted(histograms.items()):
+            item.user_properties.append(
+                ('timing_{}'.format(phase),
+                 json.dumps(histogram.to_dict(), sort_keys=True)))
+        self._nodeid = None
+
+    @pytest.fixture(scope='session', autouse=True)
+    def timing_suite_properties(self, record_testsuite_property):
+        yield
+        for template, histograms in sorted(self.by_template.items()):
+            record_testsuite_property(
+                'timing {} total'.format(template),
+                json.dumps(histograms['total'].to_dict(), sort_keys=True))
+
+    @pytest.hookimpl(optionalhook=True)
+    def pytest_testnodedown(self, node, error):
+        data = getattr(node, 'workeroutput', {}).get(TIMINGS_KEY)
+        if not data:
+            return
+        for name, target in (('tests', self.by_test),
+                             ('templates', self.by_template)):
+            for key, phases in data[name].items():
+                for phase, histogram in phases.items():
+                    target[key][phase].merge(Histogram.from_dict(histogram))
+
+    def to_dict(self):
+        """Convert timings to dict with histograms in milliseconds.
+
+        :return: dict, histograms of phases per test node id and per
+        endpoint template
+        """
+        return {
+            name: {key: {phase: histogram.to_dict()
+                         for phase, histogram in phases.items()}
+                   for key, phases in sorted(target.items())}
+            for name, target in (('tests', self.by_test),
+                                 ('templates', self.by_template))
+        }
+
+    def pytest_sessionfinish(self):
+        # NOTE: A worker passes its timings to the master which writes
+        #  the report
+        if _is_worker(self.config):
+            self.config.workeroutput[TIMINGS_KEY] = self.to_dict()
+            return
+        with open(self.path, 'w') as report:
+            json.dump(self.to_dict(), report, indent=2, sort_keys=True)
+
+    def pytest_terminal_summary(self, terminalreporter):
+        slowest = sorted(self.by_template.items(),
+                         key=lambda item: -item[1]['total'].mean)[:5]
+        if not slowest:
+            return
+        terminalreporter.write_line(
+            'Slowest endpoints (mean ms): {}'.format(', '.join(
+                '{} {:.2f}'.format(template, histograms['total'].mean)
+                for template, histograms in slowest)))
+        terminalreporter.write_line(
+            'Request timings are written to {}'.format(self.path))
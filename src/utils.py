@@ -1,3 +1,6 @@
+import math
+
+
 def check_fields(dict1, dict2):
     """Check all fields of dict1 is in dict2
 
@@ -9,7 +12,61 @@ def check_fields(dict1, dict2):
         if isinstance(value, dict):
             if not isinstance(dict2.get(key), dict):
                 return False
-            check_fields(value, dict2.get(key))
+            if not check_fields(value, dict2[key]):
+                return False
         elif value != dict2.get(key):
             return False
     return True
+
+
+def endpoint_template(endpoint):
+    """Make endpoint template by hiding resource ids and filter values.
+
+    For example /albums/1/photos -> /albums/{id}/photos and
+    /posts?userId=1&userId=2 -> /posts?userId={}&userId={}
+
+    :param endpoint: str, resource endpoint
+    :return: str, endpoint template
+    """
+    path, _, query = endpoint.partition('?')
+    segments = ['{id}' if segment.isdigit() else segment
+                for segment in path.split('/')]
+    template = '/'.join(segments)
+    if query:
+        fields = [param.split('=', 1)[0] for param in query.split('&')]
+        template += '?' + '&'.join('{}={{}}'.format(field)
+                                   for field in fields)
+    return template
+
+
+def percentile(values, percent):
+    """Get percentile of values by the nearest-rank method.
+
+    :param values: list, sorted values
+    :param percent: float, percent from 0 to 100
+    :return: value or None if values are empty
+    """
+    if not values:
+        return None
+    rank = max(int(math.ceil(percent / 100.0 * len(values))), 1)
+    return values[rank - 1]
+
+
+def relation_params(params=None, embed=None, expand=None):
+    """Add jsonplaceholder _embed and _expand params to query params.
+
+    For example embed='comments' gets posts with their comments and
+    expand='post' gets comments with their post.
+
+    :param params: dict or list, query params
+    :param embed: str or list, names of embedded child resources
+    :param expand: str or list, names of expanded parent resources
+    :return: list, tuples of query params
+    """
+    pairs = list(params.items() if isinstance(params, dict)
+                 else params or ())
+    for key, names in (('_embed', embed), ('_expand', expand)):
+        if isinstance(names, str):
+            names = [names]
+        pairs.extend((key, name) for name in names or ())
+    return pairs
@@ -0,0 +1,180 @@
+"""Validation of resource bodies against field types.
+
+A schema is compiled once into a function checking a whole list of
+resources in one comprehension, the expression checking one resource is
+inlined into it, so no Python function is called per resource or per
+field. Only resources failing the check are walked again to report
+every mismatch with its JSON path, e.g. $[12].address.geo.lat.
+"""
+from collections import namedtuple
+
+# NOTE: Schemas of https://jsonplaceholder.typicode.com/ resources,
+#  field -> JSON type or nested schema
+SCHEMAS = {
+    'posts': {'userId': 'integer', 'id': 'integer', 'title': 'string',
+              'body': 'string'},
+    'comments': {'postId': 'integer', 'id': 'integer', 'name': 'string',
+                 'email': 'string', 'body': 'string'},
+    'albums': {'userId': 'integer', 'id': 'integer', 'title': 'string'},
+    'photos': {'albumId': 'integer', 'id': 'integer', 'title': 'string',
+               'url': 'string', 'thumbnailUrl': 'string'},
+    'users': {
+        'id': 'integer', 'name': 'string', 'username': 'string',
+        'email': 'string',
+        'address': {
+            'street': 'string', 'suite': 'string', 'city': 'string',
+            'zipcode': 'string',
+            'geo': {'lat': 'string', 'lng': 'string'}
+        },
+        'phone': 'string', 'website': 'string',
+        'company': {'name': 'string', 'catchPhrase': 'string',
+                    'bs': 'string'}
+    },
+    'todos': {'userId': 'integer', 'id': 'integer', 'title': 'string',
+              'completed': 'boolean'}
+}
+
+# NOTE: JSON type -> Python types of decoded values, bool is not
+#  an integer here though it is a subclass of int
+TYPES = {
+    'string': (str,),
+    'integer': (int,),
+    'number': (int, float),
+    'boolean': (bool,),
+    'array': (list,),
+    'object': (dict,)
+}
+
+Mismatch = namedtuple('Mismatch', 'path expected actual')
+
+_MISSING = object()
+
+
+def json_type(value):
+    """Get JSON type name of decoded value."""
+    if value is _MISSING:
+        return 'missing'
+    for name, types in TYPES.items():
+        if type(value) in types:
+            return name
+    return type(value).__name__
+
+
+def _type_check(expr, expected):
+    types = TYPES[expected]
+    if len(types) == 1:
+        return 'type({}) is {}'.format(expr, types[0].__name__)
+    return 'type({}) in ({})'.format(
+        expr, ', '.join(cls.__name__ for cls in types))
+
+
+def _compile_expr(schema, expr, strict=False):
+    """Make expression checking that dict expr matches schema.
+
+    A nested schema is checked after the type of its field, so a nested
+    field is never looked up in a value which is not a dict.
+    """
+    # NOTE: A missing field is None which is not of any schema type, so
+    #  once all fields are checked, the dict has only schema fields
+    #  if its size is the schema size
+    checks = ['len({}) == {}'.format(expr, len(schema))] if strict else []
+    for field, expected in schema.items():
+        value = '{}.get({!r})'.format(expr, field)
+        if isinstance(expected, dict):
+            checks.append(_type_check(value, 'object'))
+            if expected or strict:
+                checks.append(_compile_expr(expected, '{}[{!r}]'.format(
+                    expr, field), strict))
+        else:
+            checks.append(_type_check(value, expected))
+    return ' and '.join(checks) or 'True'
+
+
+class Validator(object):
+
+    def __init__(self, schema, strict=False):
+        """Compile schema.
+
+        :param schema: dict, field -> JSON type name or nested schema
+        :param strict: bool, report fields which are not in the schema
+        """
+        self.schema = schema
+        self.strict = strict
+        source = 'def check_many(items):\n' \
+                 '    return [pos for pos, item in enumerate(items)\n' \
+                 '            if not (type(item) is dict and {})]\n'.format(
+                     _compile_expr(schema, 'item', strict))
+        namespace = {}
+        exec(compile(source, '<schema>', 'exec'), namespace)
+        self._check_many = namespace['check_many']
+
+    def _explain(self, schema, value, path):
+        if type(value) is not dict:
+            yield Mismatch(path, 'object', json_type(value))
+            return
+        for field, expected in schema.items():
+            field_path = '{}.{}'.format(path, field)
+            field_value = value.get(field, _MISSING)
+            if isinstance(expected, dict):
+                for mismatch in self._explain(expected, field_value,
+                                              field_path):
+                    yield mismatch
+            elif type(field_value) not in TYPES[expected]:
+                yield Mismatch(field_path, expected, json_type(field_value))
+        if self.strict and len(value) != len(schema):
+            for field in value:
+                if field not in schema:
+                    yield Mismatch('{}.{}'.format(path, field), 'missing',
+                                   json_type(value[field]))
+
+    def validate(self, item, path='$'):
+        """Validate one resource.
+
+        :param item: dict, decoded resource
+        :param path: str, JSON path of the resource
+        :return: list, Mismatch tuples
+        """
+        return self.validate_many([item], path=path, indexed=False)
+
+    def validate_many(self, items, path='$', indexed=True):
+        """Validate list of resources in one pass.
+
+        :param items: list, decoded resources
+        :param path: str, JSON path of the list
+        :param indexed: bool, add the position of a resource to its path
+        :return: list, Mismatch tuples of all resources ordered by path
+        """
+        mismatches = []
+        for pos in self._check_many(items):
+            item_path = '{}[{}]'.format(path, pos) if indexed else path
+            mismatches.extend(self._explain(self.schema, items[pos],
+                                            item_path))
+        return mismatches
+
+
+_validators = {}
+
+
+def get_validator(resource):
+    """Get compiled validator of jsonplaceholder resource.
+
+    :param resource: str, resource name like "photos"
+    :return: Validator
+    """
+    if resource not in _validators:
+        _validators[resource] = Validator(SCHEMAS[resource])
+    return _validators[resource]
+
+
+def format_mismatches(mismatches, limit=10):
+    """Format mismatches for an assertion message.
+
+    :param mismatches: list, Mismatch tuples
+    :param limit: int, max number of listed mismatches
+    :return: str
+    """
+    lines = ['{}: expected {}, got {}'.format(*mismatch)
+             for mismatch in mismatches[:limit]]
+    if len(mismatches) > limit:
+        lines.append('... {} more'.format(len(mismatches) - limit))
+    return '\n'.join(lines)